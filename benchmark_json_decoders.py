@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+#    benchmark_json_decoders.py compares the available json backends on a set of arcdps logs as parsed by Elite Insights.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import argparse
+import os.path
+from os import listdir
+import sys
+import time
+
+from json_loader import json_decoders, get_json_decode_function, load_json_file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='This decodes a set of arcdps reports in json format with all available json backends and compares the time needed.')
+    parser.add_argument('input_directory', help='Directory containing .json files from arcdps reports')
+    parser.add_argument('-r', '--repetitions', dest="repetitions", help="How often each file is decoded with each backend", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_directory):
+        print("Directory ",args.input_directory," is not a directory or does not exist!")
+        sys.exit()
+
+    file_paths = list()
+    for filename in sorted(listdir(args.input_directory)):
+        file_start, file_extension = os.path.splitext(filename)
+        if file_extension not in ['.json', '.gz'] or "top_stats" in file_start:
+            continue
+        file_paths.append("".join((args.input_directory,"/",filename)))
+    if not file_paths:
+        print("No .json files were found in "+args.input_directory)
+        sys.exit()
+
+    total_size = sum(os.path.getsize(file_path) for file_path in file_paths)
+    print("Decoding "+str(len(file_paths))+" files ("+str(round(total_size / 1e6, 1))+" MB) "+str(args.repetitions)+" times with each backend.")
+
+    for name in json_decoders:
+        decode = get_json_decode_function(name)
+        if decode is None:
+            print(name+": not installed")
+            continue
+        # use the best of all repetitions to reduce the influence of caching and other processes
+        best_time = None
+        for _ in range(args.repetitions):
+            start = time.perf_counter()
+            for file_path in file_paths:
+                load_json_file(file_path, decode)
+            duration = time.perf_counter() - start
+            if best_time is None or duration < best_time:
+                best_time = duration
+        print(name+": "+str(round(best_time, 3))+" s ("+str(round(total_size / 1e6 / best_time, 1))+" MB/s)")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+#    boon_coverage.py computes how many squad members had each boon in every second of a fight.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+# The 'states' of each entry in a player's 'buffUptimes' list the changes of the number of stacks as [time in ms, stacks].
+# The number of stacks is a step function of the time. The states of all squad members are merged into one step function
+# for the whole squad, whose integral is evaluated at the start of each second to get the average over each second.
+
+
+
+# get the changes of the number of stacks and of the presence of a buff from its states
+# Input:
+# states = list of [time in ms, stacks from this time on]; there are no stacks before the first state
+# Output:
+# numpy array of times in ms
+# numpy array of the change of the stacks at each time
+# numpy array of the change of the presence (1 if there is at least one stack, else 0) at each time
+def get_state_changes(states):
+    states = np.asarray(states, dtype = float).reshape(-1, 2)
+    presence = (states[:, 1] > 0).astype(float)
+    return states[:, 0], np.diff(states[:, 1], prepend = 0.), np.diff(presence, prepend = 0.)
+
+
+
+# get the average value of a step function in each second
+# Input:
+# times = sorted numpy array of the times in ms at which the value changes
+# values = numpy array of the value from each time on; the value is 0 before the first time
+# num_seconds = number of seconds to compute
+# Output:
+# numpy array with the average value in each second
+def get_average_per_second(times, values, num_seconds):
+    if len(times) == 0:
+        return np.zeros(num_seconds)
+    # integral of the step function from the first time up to each time
+    integral = np.concatenate(([0.], np.cumsum(values[:-1] * np.diff(times))))
+    second_starts = np.arange(num_seconds + 1) * 1000.
+    last_change = np.searchsorted(times, second_starts, side = 'right') - 1
+    before_first_change = last_change < 0
+    last_change = np.maximum(last_change, 0)
+    integral_at_second_starts = integral[last_change] + values[last_change] * (second_starts - times[last_change])
+    integral_at_second_starts[before_first_change] = 0.
+    return np.diff(integral_at_second_starts) / 1000.
+
+
+
+# get the number of squad members having a buff and their number of stacks in each second of a fight
+# Input:
+# players_json = the 'players' list of a log
+# buff_id = id of the buff as found in the buffMap, without the leading 'b'
+# num_seconds = duration of the fight in s
+# Output:
+# numpy array with the average number of squad members that had the buff in each second
+# numpy array with the average sum of the stacks of all squad members in each second
+# number of squad members
+def get_squad_buff_timeline(players_json, buff_id, num_seconds):
+    buff_id = int(buff_id)
+    times = list()
+    presence_changes = list()
+    stack_changes = list()
+    squad_size = 0
+    for player_json in players_json:
+        if player_json['notInSquad']:
+            continue
+        squad_size += 1
+        for buff in player_json.get('buffUptimes', []):
+            if buff.get('id') != buff_id or not buff.get('states'):
+                continue
+            player_times, player_stack_changes, player_presence_changes = get_state_changes(buff['states'])
+            times.append(player_times)
+            stack_changes.append(player_stack_changes)
+            presence_changes.append(player_presence_changes)
+            break
+
+    if not times:
+        return np.zeros(num_seconds), np.zeros(num_seconds), squad_size
+    # the squad value changes whenever the value of one squad member changes
+    times = np.concatenate(times)
+    order = np.argsort(times, kind = 'stable')
+    times = times[order]
+    presence = np.cumsum(np.concatenate(presence_changes)[order])
+    stacks = np.cumsum(np.concatenate(stack_changes)[order])
+    return get_average_per_second(times, presence, num_seconds), get_average_per_second(times, stacks, num_seconds), squad_size
+
+
+
+# get the lengths of all runs of True in a boolean array
+# Input:
+# values = 1d numpy array of bools
+# Output:
+# numpy array with the length of each run
+def get_run_lengths(values):
+    edges = np.diff(np.concatenate(([0], values.astype(np.int8), [0])))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+
+# summarize the squad coverage of one buff in a fight
+# Input:
+# members_with_buff, stacks = per second timelines as returned by get_squad_buff_timeline
+# squad_size = number of squad members
+# threshold = coverage in percent of the squad below which the squad counts as not covered
+# Output:
+# dictionary with
+#   'coverage' = percentage of the squad that had the buff in each second
+#   'stacks' = average number of stacks per squad member in each second
+#   'average_coverage' = average of 'coverage' over the fight
+#   'time_below_threshold' = time in s in which the coverage was below threshold
+#   'percentage_below_threshold' = percentage of the fight in which the coverage was below threshold
+#   'longest_below_threshold' = longest time in s in which the coverage was below threshold without interruption
+def get_buff_coverage(members_with_buff, stacks, squad_size, threshold):
+    coverage = 100 * members_with_buff / max(squad_size, 1)
+    below_threshold = coverage < threshold
+    run_lengths = get_run_lengths(below_threshold)
+    num_seconds = len(coverage)
+    return {'coverage': np.round(coverage, 1).tolist(),
+            'stacks': np.round(stacks / max(squad_size, 1), 2).tolist(),
+            'average_coverage': round(float(coverage.mean()), 2) if num_seconds > 0 else 0.,
+            'time_below_threshold': int(below_threshold.sum()),
+            'percentage_below_threshold': round(100 * float(below_threshold.sum()) / num_seconds, 2) if num_seconds > 0 else 0.,
+            'longest_below_threshold': int(run_lengths.max(initial = 0))}
+
+
+
+# compute the squad coverage of all configured buffs in one fight
+# Input:
+# players_json = the 'players' list of a log
+# fight = the Fight, with its duration. fight.boon_coverage is set.
+# config = the config used for top stats computation
+def compute_fight_boon_coverage(players_json, fight, config):
+    fight.boon_coverage = dict()
+    for buff in config.boon_coverage_buffs:
+        if buff not in config.squad_buff_ids:
+            continue
+        members_with_buff, stacks, squad_size = get_squad_buff_timeline(players_json, config.squad_buff_ids[buff], fight.duration)
+        fight.boon_coverage[buff] = get_buff_coverage(members_with_buff, stacks, squad_size, config.boon_coverage_threshold)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+#    bootstrap.py estimates how stable the totals, averages and ranks of the players are by resampling the fights.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+from ranking import low_values_are_good
+from stats_store import read_stats
+
+# Each bootstrap draw picks as many fights as were used, with replacement. A draw is stored as the number of times each fight was picked,
+# so the totals of all players in all draws are one matrix product of the draws with the players x fights matrix of the stat.
+
+# number of draws whose maximum values are computed at once, limits the memory needed for spike damage
+max_draws_per_chunk = 64
+
+
+
+# get the stats of all players in all used fights in which they were present
+# Input:
+# players = list of Players with their stats per fight
+# fights = list of Fights
+# Output:
+# number of used fights
+# numpy array of player indices, numpy array of used fight indices (0 to number of used fights - 1), allies in the fight, and list of stats of the player in the fight, one entry each per player and fight
+def get_fight_rows(players, fights):
+    used_fight_index = dict()
+    for fight_number, fight in enumerate(fights):
+        if not fight.skipped:
+            used_fight_index[fight_number] = len(used_fight_index)
+    player_indices = list()
+    fight_indices = list()
+    allies = list()
+    rows = list()
+    for player_index, player in enumerate(players):
+        # stats kept in a stats store are read once per player instead of value by value
+        for fight_number, player_stats in read_stats(player.stats_per_fight).items():
+            if fight_number not in used_fight_index or not player_stats['present_in_fight']:
+                continue
+            player_indices.append(player_index)
+            fight_indices.append(used_fight_index[fight_number])
+            allies.append(fights[fight_number].allies)
+            rows.append(player_stats)
+    return len(used_fight_index), np.array(player_indices, dtype = int), np.array(fight_indices, dtype = int), np.array(allies, dtype = float), rows
+
+
+
+# get how much each player and fight contributes to the total and to the normalization of the average of a stat,
+# in the same way as compute_total_values and compute_avg_values in parse_top_stats_tools
+# Input:
+# rows = stats of a player in a fight, as returned by get_fight_rows
+# allies = allies in the fight of each row
+# stat = stat that is considered
+# config = the config used for top stats computation
+# Output:
+# numpy array of the contribution to the total of each row, numpy array of the contribution to the normalization of the average of each row
+def get_contributions(rows, allies, stat, config):
+    duration = np.array([row['duration_present'][stat] for row in rows], dtype = float)
+    if stat in config.squad_buff_abbrev.values():
+        value = np.array([row[stat]['gen'] for row in rows], dtype = float)
+        # fights without generation data still count for the normalization of the averages
+        present = duration > 0
+    else:
+        value = np.array([row[stat] for row in rows], dtype = float)
+        present = (duration > 0) & (value >= 0)
+    valid = present & (value >= 0)
+    value = np.where(valid, value, 0.)
+
+    if stat in config.buffs_stacking_duration:
+        contribution = value / 100. * duration * (allies - 1)
+        normalization = duration * (allies - 1)
+    elif stat in config.buffs_stacking_intensity:
+        contribution = value * duration * (allies - 1)
+        normalization = duration * (allies - 1)
+    elif stat in config.buffs_not_stacking:
+        contribution = value / 100. * duration
+        normalization = duration
+    elif stat in config.squad_buff_abbrev.values():
+        contribution = value
+        normalization = duration
+    elif stat == 'dist' or 'dmg_taken' in stat:
+        contribution = value * duration
+        normalization = duration
+    elif stat in config.self_buff_ids or stat == 'spike_dmg':
+        # averages over the fights the player was present in
+        contribution = value
+        normalization = np.ones(len(rows))
+    elif stat == 'heal_from_regen':
+        contribution = value
+        normalization = np.array([row.get('hits_from_regen', 0) for row in rows], dtype = float)
+    elif stat in ['deaths', 'kills', 'downs', 'downstate', 'resurrects']:
+        # per minute
+        contribution = value
+        normalization = duration / 60
+    else:
+        contribution = value
+        normalization = duration
+    return np.where(valid, contribution, 0.), np.where(present, np.maximum(normalization, 0.), 0.)
+
+
+
+# get the rank of each player in each draw, starting at 0 for the best player
+# Input:
+# values = numpy array of shape (number of draws, number of players)
+# descending = are high values good?
+# missing = numpy array of bools of the same shape, True where a player wasn't present in the draw; they are ranked last
+# Output:
+# numpy array of ranks of the same shape
+def get_ranks(values, descending, missing):
+    keys = np.where(missing, np.inf, -values if descending else values)
+    order = np.argsort(keys, axis = 1, kind = 'stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(values.shape[1])[np.newaxis, :], axis = 1)
+    return ranks
+
+
+
+# get how often each player got each rank over all draws
+# Input:
+# ranks = numpy array of shape (number of draws, number of players), as returned by get_ranks
+# Output:
+# numpy array of shape (number of players, number of players) with the number of draws in which each player got each rank
+def get_rank_counts(ranks):
+    num_players = ranks.shape[1]
+    return np.bincount((np.arange(num_players)[np.newaxis, :] * num_players + ranks).ravel(), minlength = num_players * num_players).reshape(num_players, num_players)
+
+
+
+# get the confidence interval of the rank of each player from how often they got each rank
+# Input:
+# rank_counts = as returned by get_rank_counts
+# confidence = confidence level in percent
+# Output:
+# numpy array of shape (2, number of players) with the best and the worst rank of the interval, starting at 1
+def get_rank_intervals(rank_counts, confidence):
+    cumulative_share = np.cumsum(rank_counts, axis = 1) / np.maximum(rank_counts.sum(axis = 1, keepdims = True), 1)
+    lower = (cumulative_share < (100 - confidence) / 200).sum(axis = 1)
+    upper = (cumulative_share < (100 + confidence) / 200).sum(axis = 1)
+    return np.minimum(np.stack((lower, upper)), rank_counts.shape[1] - 1) + 1
+
+
+
+# get the confidence interval of values over all draws
+# Input:
+# values = numpy array of shape (number of draws, number of players)
+# confidence = confidence level in percent
+# Output:
+# numpy array of shape (2, number of players) with lower and upper bound, nan for players without a value in any draw
+def get_intervals(values, confidence):
+    if values.shape[0] == 0:
+        return np.zeros((2, values.shape[1]))
+    percentiles = [(100 - confidence) / 2, (100 + confidence) / 2]
+    nan_values = np.isnan(values)
+    if not nan_values.any():
+        return np.percentile(values, percentiles, axis = 0)
+    # nanpercentile is much slower, only use it if needed. Players that weren't present in any drawn fight have no interval.
+    intervals = np.full((2, values.shape[1]), np.nan)
+    has_value = ~nan_values.all(axis = 0)
+    if has_value.any():
+        intervals[:, has_value] = np.nanpercentile(values[:, has_value], percentiles, axis = 0)
+    return intervals
+
+
+
+# get the spike damage, i.e. the maximum over all drawn fights, of all players in all draws
+# Input:
+# draws = numpy array of shape (number of draws, number of fights) with the number of times each fight was drawn
+# values = numpy array of shape (number of players, number of fights)
+# present = numpy array of bools of the same shape
+# Output:
+# numpy array of shape (number of draws, number of players)
+def get_maximum_per_draw(draws, values, present):
+    values = np.where(present, values, -np.inf)
+    maximum = np.empty((draws.shape[0], values.shape[0]))
+    for start in range(0, draws.shape[0], max_draws_per_chunk):
+        drawn = draws[start:start + max_draws_per_chunk, np.newaxis, :] > 0
+        maximum[start:start + max_draws_per_chunk] = np.where(drawn, values[np.newaxis, :, :], -np.inf).max(axis = 2)
+    return np.maximum(maximum, 0.)
+
+
+
+# compute bootstrap confidence intervals of the totals and averages of all players, and the distribution of their ranks.
+# Input:
+# players = list of Players with their stats per fight; player.bootstrap is set for each stat the player was present for:
+#   'total_ci', 'average_ci' = [lower bound, upper bound] of the total and average with confidence config.bootstrap_confidence
+#   'total_rank_ci', 'average_rank_ci' = [lower bound, upper bound] of the rank by total and by average, starting at 1
+#   'total_rank_probabilities', 'average_rank_probabilities' = probability in % of each rank from 1 to config.num_players_listed[stat]
+# fights = list of Fights
+# config = the config used for top stats computation
+def compute_bootstrap(players, fights, config):
+    for player in players:
+        player.bootstrap = dict()
+    num_fights, player_indices, fight_indices, allies, rows = get_fight_rows(players, fights)
+    if num_fights == 0 or len(rows) == 0 or config.bootstrap_draws <= 0:
+        return
+    rng = np.random.default_rng(config.bootstrap_seed)
+    draws = rng.multinomial(num_fights, np.full(num_fights, 1. / num_fights), size = config.bootstrap_draws).astype(float)
+    num_players = len(players)
+
+    for stat in config.stats_to_compute:
+        contribution, normalization = get_contributions(rows, allies, stat, config)
+        contributions = np.zeros((num_players, num_fights))
+        contributions[player_indices, fight_indices] = contribution
+        normalizations = np.zeros((num_players, num_fights))
+        normalizations[player_indices, fight_indices] = normalization
+        present = normalizations > 0
+
+        # all draws at once
+        normalization_per_draw = draws @ normalizations.T
+        missing = normalization_per_draw <= 0
+        if stat == 'spike_dmg':
+            totals = get_maximum_per_draw(draws, contributions, present)
+        else:
+            totals = draws @ contributions.T
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            averages = np.where(missing, np.nan, totals / normalization_per_draw)
+        if stat in config.buffs_stacking_duration or stat in config.buffs_not_stacking:
+            averages *= 100
+
+        descending = not low_values_are_good(stat)
+        total_ranks = get_ranks(totals, descending, missing)
+        average_ranks = get_ranks(np.nan_to_num(averages), descending, missing)
+        total_intervals = get_intervals(totals, config.bootstrap_confidence)
+        average_intervals = get_intervals(averages, config.bootstrap_confidence)
+        total_rank_counts = get_rank_counts(total_ranks)
+        average_rank_counts = get_rank_counts(average_ranks)
+        total_rank_intervals = get_rank_intervals(total_rank_counts, config.bootstrap_confidence)
+        average_rank_intervals = get_rank_intervals(average_rank_counts, config.bootstrap_confidence)
+        num_ranks = config.num_players_listed.get(stat, 0)
+        total_rank_probabilities = total_rank_counts[:, :num_ranks] * 100 / config.bootstrap_draws
+        average_rank_probabilities = average_rank_counts[:, :num_ranks] * 100 / config.bootstrap_draws
+
+        for player_index in np.flatnonzero(present.any(axis = 1)).tolist():
+            players[player_index].bootstrap[stat] = {
+                'total_ci': [round(float(total_intervals[0, player_index]), 2), round(float(total_intervals[1, player_index]), 2)],
+                'average_ci': [round(float(average_intervals[0, player_index]), 2), round(float(average_intervals[1, player_index]), 2)],
+                'total_rank_ci': total_rank_intervals[:, player_index].tolist(),
+                'average_rank_ci': average_rank_intervals[:, player_index].tolist(),
+                'total_rank_probabilities': np.round(total_rank_probabilities[player_index], 1).tolist(),
+                'average_rank_probabilities': np.round(average_rank_probabilities[player_index], 1).tolist()}
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+#    buff_catalog.py stores the ids and stacking types of buffs found in arcdps logs between runs.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import os
+import os.path
+
+from io_helper import myprint
+
+# name of the directory in the user cache directory in which files are kept between runs
+cache_directory_name = "arcdps_top_stats_parser"
+
+
+
+# get the directory in which files are kept between runs: %LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache elsewhere
+# Output:
+# path of the directory; it might not exist yet
+def get_cache_directory():
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        base_directory = os.environ['LOCALAPPDATA']
+    else:
+        base_directory = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_directory, cache_directory_name)
+
+
+
+# get the path of the buff catalog. Relative paths are relative to the user cache directory.
+# Input:
+# config = the config used for top stats computation
+def get_buff_catalog_path(config):
+    if os.path.isabs(config.buff_catalog_file):
+        return config.buff_catalog_file
+    return os.path.join(get_cache_directory(), config.buff_catalog_file)
+
+
+
+# load the buff catalog
+# Input:
+# config = the config used for top stats computation
+# log = log file to write to
+# Output:
+# dictionary of buff name -> {'id': buff id, 'type': 'intensity', 'duration', 'not_stacking' or 'self'}. Empty if no catalog was stored yet.
+def load_buff_catalog(config, log):
+    catalog_path = get_buff_catalog_path(config)
+    if not os.path.isfile(catalog_path):
+        return {}
+    try:
+        with open(catalog_path, encoding = 'utf-8') as catalog_file:
+            return json.load(catalog_file)
+    except (OSError, ValueError):
+        myprint(log, "Could not read the buff catalog "+catalog_path+". Buff ids will be read from the logs again.", "info")
+        return {}
+
+
+
+# write the buff catalog to the file given in the config
+# Input:
+# catalog = dictionary as returned by load_buff_catalog
+# config = the config used for top stats computation
+# log = log file to write to
+def save_buff_catalog(catalog, config, log):
+    catalog_path = get_buff_catalog_path(config)
+    try:
+        os.makedirs(os.path.dirname(catalog_path), exist_ok = True)
+        with open(catalog_path, 'w', encoding = 'utf-8') as catalog_file:
+            json.dump(catalog, catalog_file, indent = 4, sort_keys = True)
+    except OSError:
+        myprint(log, "Could not write the buff catalog to "+catalog_path+".", "info")
+
+
+
+# fill the buff ids and stacking types in the config from the catalog
+# Input:
+# catalog = dictionary as returned by load_buff_catalog
+# config = the config used for top stats computation, changed inplace
+def apply_buff_catalog(catalog, config):
+    for buff_name, buff in catalog.items():
+        if buff_name in config.squad_buff_abbrev:
+            abbrev_name = config.squad_buff_abbrev[buff_name]
+            config.squad_buff_ids[abbrev_name] = buff['id']
+            if buff['type'] == 'intensity':
+                config.buffs_stacking_intensity.add(abbrev_name)
+            elif buff['type'] == 'not_stacking':
+                config.buffs_not_stacking.add(abbrev_name)
+            else:
+                config.buffs_stacking_duration.add(abbrev_name)
+        elif buff_name in config.self_buff_abbrev:
+            config.self_buff_ids[config.self_buff_abbrev[buff_name]] = buff['id']
+
+
+
+# add all buff ids found in the logs to the catalog
+# Input:
+# catalog = dictionary as returned by load_buff_catalog, changed inplace
+# config = the config used for top stats computation
+# Output:
+# True if the catalog changed
+def update_buff_catalog(catalog, config):
+    changed = False
+    for buff_name, abbrev_name in config.squad_buff_abbrev.items():
+        if abbrev_name not in config.squad_buff_ids:
+            continue
+        buff_type = 'duration'
+        if abbrev_name in config.buffs_stacking_intensity:
+            buff_type = 'intensity'
+        elif abbrev_name in config.buffs_not_stacking:
+            buff_type = 'not_stacking'
+        buff = {'id': config.squad_buff_ids[abbrev_name], 'type': buff_type}
+        if catalog.get(buff_name) != buff:
+            catalog[buff_name] = buff
+            changed = True
+    for buff_name, abbrev_name in config.self_buff_abbrev.items():
+        if abbrev_name not in config.self_buff_ids:
+            continue
+        buff = {'id': config.self_buff_ids[abbrev_name], 'type': 'self'}
+        if catalog.get(buff_name) != buff:
+            catalog[buff_name] = buff
+            changed = True
+    return changed
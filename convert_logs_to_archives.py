@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+#    convert_logs_to_archives.py converts a set of arcdps logs as parsed by Elite Insights into compact fight archives.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import argparse
+import os.path
+from os import listdir
+import sys
+
+from fight_archive import write_fight_archive
+from json_loader import get_json_decoder, open_log_file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='This converts a set of arcdps reports in json format into compact fight archives (.npz). The archives can be used as input for parse_top_stats_detailed.py instead of the json files.')
+    parser.add_argument('input_directory', help='Directory containing .json or .gz files from arcdps reports')
+    parser.add_argument('-o', '--output_directory', dest="output_directory", help="Directory to write the archives to. Defaults to input_directory/archives. Don't use the input directory, otherwise each fight is found twice.", default=None)
+    parser.add_argument('-f', '--force', dest="force", help="Also convert logs for which an archive already exists", action='store_true')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input_directory):
+        print("Directory ",args.input_directory," is not a directory or does not exist!")
+        sys.exit()
+    if args.output_directory is None:
+        args.output_directory = args.input_directory+"/archives"
+    os.makedirs(args.output_directory, exist_ok=True)
+
+    json_decoder, decode = get_json_decoder()
+    total_log_size = 0
+    total_archive_size = 0
+    for filename in sorted(listdir(args.input_directory)):
+        file_start, file_extension = os.path.splitext(filename)
+        if file_extension not in ['.json', '.gz'] or "top_stats" in file_start:
+            continue
+        if file_extension == '.gz':
+            file_start = os.path.splitext(file_start)[0]
+        file_path = "".join((args.input_directory,"/",filename))
+        archive_path = "".join((args.output_directory,"/",file_start,".npz"))
+        if os.path.exists(archive_path) and not args.force:
+            continue
+        print("converting "+filename)
+        with open_log_file(file_path) as data:
+            file_size = len(data)
+            json_data = decode(data)
+        write_fight_archive(json_data, archive_path, file_size)
+        total_log_size += os.path.getsize(file_path)
+        total_archive_size += os.path.getsize(archive_path)
+
+    if total_archive_size > 0:
+        print("Converted "+str(round(total_log_size / 1e6, 1))+" MB of logs into "+str(round(total_archive_size / 1e6, 1))+" MB of archives in "+args.output_directory)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+#    fight_archive.py converts the json files written by Elite Insights into compact binary archives and reads them.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+import mmap
+import os
+import struct
+import zipfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from json_helper import get_fight_header_from_json, player_json_fields_for_stat
+
+# An archive is an uncompressed .npz file. It contains
+# - 'header': the fight header as returned by json_helper.get_fight_header_from_json, as utf-8 encoded json. It only contains what is needed for skipping the fight
+#   and finding duplicate logs; the targets are reduced to the entries needed for counting enemies and kills.
+# - 'skeleton': the parts of the log that are read by the parser, as utf-8 encoded json. Long lists of numbers are replaced by {"__array__": name}.
+# - one typed array for each replaced list of numbers, e.g. the per second damage, positions and death and down events
+# The archive doesn't depend on the config, all entries that can be used for any stat are kept.
+
+# increase whenever the content of the archives changes in an incompatible way
+archive_version = 5
+
+# lists of numbers with fewer entries are kept in the skeleton
+min_array_size = 8
+
+# entries of each player json that are kept
+archived_player_fields = sorted(set(['account', 'name', 'profession', 'notInSquad', 'hasCommanderTag', 'squadBuffs', 'buffUptimes', 'selfBuffs', 'totalDamageDist', 'guildID']).union(
+    *player_json_fields_for_stat.values()))
+
+# top level entries of the log that are kept, in addition to all top level strings and numbers
+archived_fight_fields = ['buffMap', 'skillMap', 'usedExtensions', 'combatReplayMetaData', 'phases']
+
+# entries of each target json that are kept, in addition to all strings and numbers
+archived_target_fields = ['defenses']
+
+
+
+# is this file a fight archive?
+# Input:
+# file_path = path to a log file or archive
+def is_fight_archive(file_path):
+    return file_path.endswith('.npz')
+
+
+
+# get a typed array holding a nested list of numbers, if all numbers are ints or all are floats and the list is rectangular
+# Input:
+# values = list
+# Output:
+# numpy array with the same values, or None if the list can't be stored as a typed array without changing it
+def get_typed_array(values):
+    try:
+        array = np.array(values)
+    except ValueError:
+        # lists of different lengths
+        return None
+    if array.dtype.kind not in 'if' or array.size == 0:
+        return None
+    # 1 and 1.0 would both end up in a float array, but are written differently in the output
+    python_type = int if array.dtype.kind == 'i' else float
+    flat_values = values
+    for _ in range(array.ndim - 1):
+        flat_values = [value for sub_list in flat_values for value in sub_list]
+    if any(type(value) is not python_type for value in flat_values):
+        return None
+    if array.dtype.kind == 'i':
+        # use the smallest integer type holding all values
+        for dtype in (np.int8, np.int16, np.int32):
+            if np.iinfo(dtype).min <= array.min() and array.max() <= np.iinfo(dtype).max:
+                return array.astype(dtype)
+    return array
+
+
+
+# replace long lists of numbers in a json object by references to typed arrays
+# Input:
+# value = json object
+# arrays = dictionary of array name -> numpy array, changed inplace
+# Output:
+# json object with references to the arrays
+def pack_json(value, arrays):
+    if isinstance(value, dict):
+        return {key: pack_json(sub_value, arrays) for key, sub_value in value.items()}
+    if isinstance(value, list):
+        if len(value) > 0 and isinstance(value[0], (int, float, list)):
+            array = get_typed_array(value)
+            if array is not None and array.size >= min_array_size:
+                name = 'a'+str(len(arrays))
+                arrays[name] = array
+                return {'__array__': name}
+        return [pack_json(sub_value, arrays) for sub_value in value]
+    return value
+
+
+
+# replace references to typed arrays by lists again
+# Input:
+# value = json object as returned by pack_json
+# arrays = dictionary of array name -> numpy array
+# Output:
+# json object as given to pack_json
+def unpack_json(value, arrays):
+    if isinstance(value, dict):
+        if len(value) == 1 and '__array__' in value:
+            return arrays[value['__array__']].tolist()
+        return {key: unpack_json(sub_value, arrays) for key, sub_value in value.items()}
+    if isinstance(value, list):
+        return [unpack_json(sub_value, arrays) for sub_value in value]
+    return value
+
+
+
+# get the parts of a log that are kept in an archive
+# Input:
+# fight_json = json object including one fight
+# Output:
+# json object with only the kept entries
+def get_archived_json(fight_json):
+    archived_json = {key: value for key, value in fight_json.items() if not isinstance(value, (dict, list))}
+    for key in archived_fight_fields:
+        if key in fight_json:
+            archived_json[key] = fight_json[key]
+    archived_json['targets'] = [{key: value for key, value in target.items() if not isinstance(value, (dict, list)) or key in archived_target_fields}
+                                for target in fight_json['targets']]
+    archived_json['players'] = [{key: player[key] for key in archived_player_fields if key in player} for player in fight_json['players']]
+    return archived_json
+
+
+
+# write an archive for one log
+# Input:
+# fight_json = json object including one fight
+# archive_path = .npz file to write to
+# file_size = size of the original log file, stored in the header for choosing between duplicate logs
+def write_fight_archive(fight_json, archive_path, file_size):
+    header = get_fight_header_from_json(fight_json)
+    header['file_size'] = file_size
+    header['archive_version'] = archive_version
+    arrays = dict()
+    skeleton = pack_json(get_archived_json(fight_json), arrays)
+    members = {'header': np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8),
+               'skeleton': np.frombuffer(json.dumps(skeleton).encode('utf-8'), dtype=np.uint8)}
+    members.update(arrays)
+    # np.savez stores the arrays uncompressed, so they can be memory mapped when reading
+    with open(archive_path, 'wb') as archive_file:
+        np.savez(archive_file, **members)
+
+
+
+# open an archive and memory map the arrays in it. The arrays are only valid inside the with block.
+# Input:
+# archive_path = .npz file written by write_fight_archive
+# Output:
+# dictionary of member name -> numpy array
+@contextmanager
+def open_fight_archive(archive_path):
+    with open(archive_path, mode = "rb") as f:
+        with zipfile.ZipFile(f) as archive:
+            member_infos = archive.infolist()
+        mapped_file = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        members = dict()
+        array = None
+        try:
+            for info in member_infos:
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(archive_path+" is compressed and can't be memory mapped")
+                # the member data starts after the local file header, whose name and extra field lengths are at offset 26
+                name_length, extra_length = struct.unpack_from('<HH', mapped_file, info.header_offset + 26)
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+                array = np.frombuffer(mapped_file, dtype = dtype, count = int(np.prod(shape)), offset = f.tell())
+                members[os.path.splitext(info.filename)[0]] = array.reshape(shape, order = 'F' if fortran_order else 'C')
+            yield members
+        finally:
+            members.clear()
+            array = None
+            try:
+                mapped_file.close()
+            except BufferError:
+                # arrays still referenced by the caller keep the memory map open until they are deleted
+                pass
+
+
+
+# get the fight header of an opened archive
+# Input:
+# members = dictionary of member name -> numpy array as provided by open_fight_archive
+# archive_path = .npz file the members were read from
+# Output:
+# fight header as returned by json_helper.get_fight_header_from_json, with the size of the original log in 'file_size'
+def get_archive_header(members, archive_path):
+    header = json.loads(members['header'].tobytes())
+    if header.get('archive_version') != archive_version:
+        raise ValueError(archive_path+" was written by a different version of the parser. Please convert the logs again.")
+    return header
+
+
+
+# read the fight header from an archive without reading anything else
+# Input:
+# archive_path = .npz file written by write_fight_archive
+# Output:
+# fight header as returned by json_helper.get_fight_header_from_json, with the size of the original log in 'file_size'
+def read_fight_archive_header(archive_path):
+    with open_fight_archive(archive_path) as members:
+        return get_archive_header(members, archive_path)
+
+
+
+# read the log stored in an archive. Only the arrays of the requested player entries are read.
+# Input:
+# archive_path = .npz file written by write_fight_archive
+# player_fields = entries of the player json that are needed, e.g. ExtractionPlan.player_json_fields, or None for all
+# Output:
+# json object in the same format as the original log, with only the kept entries
+def load_fight_archive(archive_path, player_fields = None):
+    with open_fight_archive(archive_path) as members:
+        get_archive_header(members, archive_path)
+        skeleton = json.loads(members['skeleton'].tobytes())
+        if player_fields is not None:
+            skeleton['players'] = [{key: value for key, value in player.items() if key in player_fields} for player in skeleton['players']]
+        return unpack_json(skeleton, members)
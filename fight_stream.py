@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+#    fight_stream.py writes the results of each fight as one json line as soon as the fight is processed.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+
+from stat_classes import get_anonymous_player_names
+from stats_store import read_stats
+
+# The stream is a file with one json object per line (NDJSON), so it can be read line by line while it is written:
+# one line with 'type' = 'fight' per processed fight, in the order the logs are read, including skipped fights,
+# and one line with 'type' = 'aggregates' per config at the end, with the stats over all fights.
+# If a fight is read again from a duplicate log with more information, its line is written again and replaces the earlier one with the same fight_number.
+
+# entries of a Fight that are not written to the stream: they are large, or only filled after all fights were read
+stripped_fight_fields = ('heatmaps', 'target_damage', 'skill_names', 'total_stats', 'avg_stats')
+
+
+
+# write one line to the stream and make it visible to readers immediately
+# Input:
+# fight_stream = file opened for writing
+# entry = json object to write
+def write_stream_line(fight_stream, entry):
+    fight_stream.write(json.dumps(entry)+"\n")
+    fight_stream.flush()
+
+
+
+# get how a player is named in the stream
+# Input:
+# players = list of all Players read from the logs so far
+# player_index = index of the player in players
+# anonymize = replace account and character name with the same names as parse_top_stats_tools.get_anonymous_names
+# Output:
+# dictionary with 'account', 'name' and 'profession'
+def get_stream_player(players, player_index, anonymize):
+    player = players[player_index]
+    if anonymize:
+        # the players are anonymized by their index in the list of all players, which doesn't change while reading the logs
+        account, name = get_anonymous_player_names(player_index)
+        return {'account': account, 'name': name, 'profession': player.profession}
+    return {'account': player.account, 'name': player.name, 'profession': player.profession}
+
+
+
+# write the results of one fight to the stream
+# Input:
+# fight_stream = file opened for writing
+# fight_number = index of the fight
+# fight = the Fight
+# players = list of Players, with their stats in this fight if they were present
+# top_players = dictionary of stat -> list of (player index, value, rank) of the top players in this fight
+# config = the config used for top stats computation
+# anonymize = replace all account and character names (optional)
+def write_fight_to_stream(fight_stream, fight_number, fight, players, top_players, config, anonymize = False):
+    import jsons
+    entry = {'type': 'fight', 'fight_number': fight_number, 'fight': jsons.dump(fight, strip_attr = stripped_fight_fields)}
+    entry['players'] = list()
+    for player_index, player in enumerate(players):
+        if fight_number not in player.stats_per_fight:
+            continue
+        # stats kept in a stats store are read once instead of value by value
+        player_stats = read_stats(player.stats_per_fight[fight_number])
+        stream_player = get_stream_player(players, player_index, anonymize)
+        stream_player.update({'group': player_stats['group'], 'stats': {stat: player_stats[stat] for stat in config.stats_to_compute}})
+        entry['players'].append(stream_player)
+    entry['top_players'] = {stat: [dict(get_stream_player(players, player_index, anonymize), value = value, rank = rank) for player_index, value, rank in ranks]
+                            for stat, ranks in top_players.items()}
+    write_stream_line(fight_stream, entry)
+
+
+
+# write the stats over all fights of one config to the stream
+# Input:
+# fight_stream = file opened for writing
+# config_name = name of the config
+# overall_raid_stats = raid stats like start time, end time, total kills, etc.; output of get_overall_raid_stats
+# overall_squad_stats = overall stats of the whole squad; output of get_overall_squad_stats
+# players = list of Players with their total and average stats
+# top_players = dictionary of ranking name -> dictionary of stat -> list of indices in players, e.g. 'top_total_players' -> top_total_stat_players
+# anonymous_names = anonymous names of all players as returned by parse_top_stats_tools.get_anonymous_names, if the stream is anonymized (optional)
+def write_aggregates_to_stream(fight_stream, config_name, overall_raid_stats, overall_squad_stats, players, top_players, anonymous_names = None):
+    entry = {'type': 'aggregates', 'config': config_name, 'overall_raid_stats': overall_raid_stats, 'overall_squad_stats': overall_squad_stats}
+    entry['players'] = list()
+    for player in players:
+        account, name = player.account, player.name
+        # players that were anonymized for the output of this config already have their anonymous names
+        if anonymous_names is not None and (account, name, player.profession) in anonymous_names:
+            account, name = anonymous_names[(account, name, player.profession)]
+        entry['players'].append({'account': account, 'name': name, 'profession': player.profession, 'total_stats': player.total_stats,
+                                 'average_stats': player.average_stats, 'consistency_stats': player.consistency_stats})
+    entry.update(top_players)
+    write_stream_line(fight_stream, entry)
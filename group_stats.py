@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+#    group_stats.py computes total and average stats of groups of players, e.g. of all characters of an account or of all players of a profession.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+from bootstrap import get_contributions
+from stats_store import read_stats
+
+# The stats of the players are added to the groups fight by fight, so only the stats of one fight are read at once,
+# also if they are kept in a stats store (see stats_store.py).
+
+
+
+# get the stats of all players present in one fight
+# Input:
+# players = list of Players with their stats per fight
+# fight_number = index of the fight
+# Output:
+# list of player indices and list of stats of the player in the fight, one entry each per present player
+def get_rows_in_fight(players, fight_number):
+    player_indices = list()
+    rows = list()
+    for player_index, player in enumerate(players):
+        if fight_number not in player.stats_per_fight:
+            continue
+        # stats kept in a stats store are read once instead of value by value
+        player_stats = read_stats(player.stats_per_fight[fight_number])
+        if not player_stats['present_in_fight']:
+            continue
+        player_indices.append(player_index)
+        rows.append(player_stats)
+    return player_indices, rows
+
+
+
+# get the value of the grouping key for each player in a fight
+# Input:
+# players = list of Players
+# player_indices = index in players of each row, as returned by get_rows_in_fight
+# rows = stats of a player in the fight, as returned by get_rows_in_fight
+# key = one of stat_classes.group_keys
+# Output:
+# list with the value of the key for each row
+def get_group_labels(players, player_indices, rows, key):
+    if key == 'group':
+        return [str(row['group']) for row in rows]
+    return [getattr(players[player_index], key) for player_index in player_indices]
+
+
+
+# reduce the values of all rows in each group
+# Input:
+# group_ids = numpy array with the group of each row, from 0 to number of groups - 1
+# values = numpy array of shape (number of rows, number of stats)
+# reduce = numpy ufunc used for reducing, e.g. np.add for the sum or np.maximum for the maximum
+# Output:
+# numpy array of shape (number of groups, number of stats)
+def reduce_groups(group_ids, values, reduce = np.add):
+    order = np.argsort(group_ids, kind = 'stable')
+    starts = np.flatnonzero(np.diff(group_ids[order], prepend = -1))
+    return reduce.reduceat(values[order], starts, axis = 0)
+
+
+
+# compute the total and average values of all stats for each group of players. Totals and averages are computed in the same way as for single players.
+# Input:
+# players = list of Players with their stats per fight
+# fights = list of Fights
+# config = the config used for top stats computation; the players are grouped by each key in config.group_by
+# Output:
+# dictionary of grouping key -> list with one dictionary per group, sorted by the value of the key, with
+#   key = value of the key for this group, 'num_players' = number of players, 'num_fights' = number of fights with players of this group,
+#   'total' and 'average' = dictionary of stat -> value
+def get_group_stats(players, fights, config):
+    stats = list(config.stats_to_compute)
+    maximum_columns = [column for column, stat in enumerate(stats) if stat == 'spike_dmg']
+    percentage_columns = [column for column, stat in enumerate(stats) if stat in config.buffs_stacking_duration or stat in config.buffs_not_stacking]
+    # grouping key -> value of the key -> sums over all fights of the group
+    groups = {key: dict() for key in config.group_by}
+
+    for fight_number, fight in enumerate(fights):
+        if fight.skipped:
+            continue
+        player_indices, rows = get_rows_in_fight(players, fight_number)
+        if len(rows) == 0:
+            continue
+        # contribution of each row to the totals and to the normalization of the averages, for all stats at once
+        allies = np.full(len(rows), float(fight.allies))
+        contributions = np.empty((len(rows), len(stats)))
+        normalizations = np.empty((len(rows), len(stats)))
+        for column, stat in enumerate(stats):
+            contributions[:, column], normalizations[:, column] = get_contributions(rows, allies, stat, config)
+
+        for key in config.group_by:
+            labels, group_ids = np.unique(np.array(get_group_labels(players, player_indices, rows, key), dtype = str), return_inverse = True)
+            group_ids = group_ids.ravel()
+            totals = reduce_groups(group_ids, contributions)
+            normalization = reduce_groups(group_ids, normalizations)
+            maximum = reduce_groups(group_ids, contributions[:, maximum_columns], np.maximum)
+            for group, label in enumerate(labels.tolist()):
+                if label not in groups[key]:
+                    groups[key][label] = {'players': set(), 'num_fights': 0, 'total': np.zeros(len(stats)), 'normalization': np.zeros(len(stats)),
+                                          'maximum': np.zeros(len(maximum_columns))}
+                group_sums = groups[key][label]
+                group_sums['players'].update(player_index for player_index, group_id in zip(player_indices, group_ids.tolist()) if group_id == group)
+                group_sums['num_fights'] += 1
+                group_sums['total'] += totals[group]
+                group_sums['normalization'] += normalization[group]
+                group_sums['maximum'] = np.maximum(group_sums['maximum'], maximum[group])
+
+    group_stats = dict()
+    for key in config.group_by:
+        group_stats[key] = list()
+        for label in sorted(groups[key]):
+            group_sums = groups[key][label]
+            totals = group_sums['total'].copy()
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                averages = np.where(group_sums['normalization'] > 0, totals / group_sums['normalization'], 0.)
+            averages[percentage_columns] *= 100
+            # the total of the spike damage is the maximum, its average is the average over all fights of the group
+            totals[maximum_columns] = group_sums['maximum']
+            group_stats[key].append({key: label, 'num_players': len(group_sums['players']), 'num_fights': group_sums['num_fights'],
+                                     'total': dict(zip(stats, np.round(totals, 2).tolist())),
+                                     'average': dict(zip(stats, np.round(averages, 2).tolist()))})
+    return group_stats
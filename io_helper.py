@@ -1,22 +1,13 @@
 #!/usr/bin/env python3
 
 from stat_classes import *
-import xlrd
-from xlutils.copy import copy
-import jsons
+from target_damage import get_damage_matrices
+from skill_breakdown import get_skill_breakdown
+from quantile_sketch import get_percentile_name
+from stats_store import get_values_per_fight
 import json
-import pandas as pd
-from openpyxl.styles import colors
-from openpyxl.styles import Font, Color
-from openpyxl.worksheet.filters import (
-    FilterColumn,
-    CustomFilter,
-    CustomFilters,
-    DateGroupItem,
-    Filters,
-    )
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.dimensions import ColumnDimension, DimensionHolder
+# pandas, openpyxl and jsons take long to import. They are only imported by the writers that need them,
+# so runs that don't write these files start faster.
 
 # get the professions of all players indicated by the indices. Additionally, get the length of the longest profession name.
 # Input:
@@ -71,6 +62,19 @@ def is_string_column(column_name):
         return False
 
     
+# get the time windows that are shown as extra columns in the xls sheet of a stat
+# Input:
+# stat = which stat are we considering
+# config = the config used for stats computation
+def get_xls_time_windows(stat, config):
+    # json_helper imports io_helper, so it can't be imported at the top
+    from json_helper import player_json_fields_for_timeline_stat
+    if stat not in player_json_fields_for_timeline_stat:
+        return []
+    return list(config.time_windows.keys())
+
+
+
 # Write the top x people who achieved top total stat.
 # Input:
 # players = list of Players
@@ -78,8 +82,39 @@ def is_string_column(column_name):
 # stat = which stat are we considering
 # xls_output_filename = where to write to
 def write_stats_xls(players, top_players, stat, xls_output_filename, config):
+    import pandas as pd
     writer = pd.ExcelWriter(xls_output_filename, engine = "openpyxl", mode = 'a')
+    write_stats_sheet(writer, players, top_players, stat, config)
+    writer.book.save(xls_output_filename)
+
 
+
+# Write xls sheets for all stats to compute. The file is only opened and saved once.
+# Input:
+# players = list of Players
+# top_players = dictionary stat -> list of indices in players that are considered as top
+# xls_output_filename = where to write to
+# config = the config used for stats computation
+# rankings (optional) = dictionary stat -> ranking.StatRanking, used for sorting the players in each sheet
+def write_all_stats_xls(players, top_players, xls_output_filename, config, rankings = None):
+    import pandas as pd
+    with pd.ExcelWriter(xls_output_filename, engine = "openpyxl", mode = 'a') as writer:
+        for stat in config.stats_to_compute:
+            write_stats_sheet(writer, players, top_players[stat], stat, config, rankings[stat] if rankings is not None else None)
+
+
+
+# Write the top stats of one stat to a new sheet of an open xls file. The file is written when the writer is closed.
+# Input:
+# writer = pandas ExcelWriter using the openpyxl engine
+# players = list of Players
+# top_players = list of indices in players that are considered as top
+# stat = which stat are we considering
+# config = the config used for stats computation
+# ranking (optional) = ranking.StatRanking of stat, used for sorting the players
+def write_stats_sheet(writer, players, top_players, stat, config, ranking = None):
+    from openpyxl.styles import Font, Alignment
+    from openpyxl.utils import get_column_letter
     sorting_columns = config.sort_xls_by[stat]
 
     # sort in descending order, unless it's a stat where low values are good and total or avg are sorted
@@ -93,7 +128,7 @@ def write_stats_xls(players, top_players, stat, xls_output_filename, config):
         if is_string_column(val):
             sort_ascending[i] = True
 
-    df = create_panda_dataframe(players, top_players, stat, sorting_columns, sort_ascending, config)
+    df = create_panda_dataframe(players, top_players, stat, sorting_columns, sort_ascending, config, ranking)
 
     df.to_excel(writer, sheet_name = config.stat_names[stat], startrow = 3, index = False, header = False)
     book = writer.book
@@ -122,19 +157,27 @@ def write_stats_xls(players, top_players, stat, xls_output_filename, config):
         column_names.append("Average "+stat+" per s "+config.duration_for_averages[stat])
     if stat in config.squad_buff_ids:
         column_names.append(stat+" Uptime in %")
+    for window_name in get_xls_time_windows(stat, config):
+        column_names.append("Total "+stat+" "+window_name)
+    for percentile in config.stat_quantiles:
+        column_names.append(get_percentile_name(percentile).capitalize()+" "+stat+" per fight")
+    # styles are shared by all cells instead of copying them for each cell
+    left_alignment = Alignment(horizontal="left")
+    header_alignment = Alignment(horizontal="left", vertical="top", wrapText=True)
     for i in range(len(column_names)):
         header_cell = sheet.cell(row=3, column=(i+1))
         header_cell.value = column_names[i]
         header_cell.font = bold
-        header_cell.alignment = header_cell.alignment.copy(wrapText=True)
-        header_cell.alignment = header_cell.alignment.copy(vertical="top")
 
     # adjust the width of the columns
     for col in sheet.columns:
         length = max((len(str(cell.value)) for cell in col[4:]), default = 9)
         sheet.column_dimensions[col[0].column_letter].width = max(length + 3, 12)
         for cell in col:
-            cell.alignment = cell.alignment.copy(horizontal="left")
+            if cell.row == 3 and cell.column <= len(column_names):
+                cell.alignment = header_alignment
+            else:
+                cell.alignment = left_alignment
 
     # make relevant classes bold
     (max_row, max_col) = df.shape
@@ -159,8 +202,6 @@ def write_stats_xls(players, top_players, stat, xls_output_filename, config):
     filters = sheet.auto_filter
     filters.ref = "A3:" + get_column_letter(sheet.max_column) + str(sheet.max_row)
 
-    book.save(xls_output_filename)
-
 
     
 # Write xls fight overview
@@ -171,6 +212,7 @@ def write_stats_xls(players, top_players, stat, xls_output_filename, config):
 # config = the config to use for stats computation
 # xls_output_filename = where to write to
 def write_fights_overview_xls(fights, overall_squad_stats, overall_raid_stats, config, xls_output_filename):
+    import pandas as pd
     writer = pd.ExcelWriter(xls_output_filename, engine = "openpyxl")
 
     df = create_panda_dataframe_overview(fights, overall_squad_stats, overall_raid_stats, config)
@@ -181,6 +223,44 @@ def write_fights_overview_xls(fights, overall_squad_stats, overall_raid_stats, c
 
 
 
+# Write one xls sheet for each key the players are grouped by, with the total and average values of each group
+# Input:
+# group_stats = stats of groups of players; output of group_stats.get_group_stats
+# config = the config used for stats computation
+# xls_output_filename = where to write to
+def write_group_stats_xls(group_stats, config, xls_output_filename):
+    import pandas as pd
+    with pd.ExcelWriter(xls_output_filename, engine = "openpyxl", mode = 'a') as writer:
+        for key, groups in group_stats.items():
+            data = {key.capitalize(): [group[key] for group in groups],
+                    "Num. Players": [group['num_players'] for group in groups],
+                    "Num. Fights": [group['num_fights'] for group in groups]}
+            for stat in config.stats_to_compute:
+                data["Total "+config.stat_names[stat]] = [group['total'][stat] for group in groups]
+                data["Average "+config.stat_names[stat]] = [group['average'][stat] for group in groups]
+            pd.DataFrame(data).to_excel(writer, sheet_name = "By "+key, index = False)
+
+
+
+# list whose entries are only converted while json.dump writes them, so not all converted entries have to be in memory at once.
+# Only works with the pure python json encoder, which json.dump uses when writing with indentation.
+class LazyJsonList(list):
+    # Input:
+    # items = entries to write
+    # convert = function converting an entry to a json object
+    def __init__(self, items, convert):
+        super().__init__()
+        self.items = items
+        self.convert = convert
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return (self.convert(item) for item in self.items)
+
+
+
 # write all stats to a json file
 # Input:
 # overall_raid_stats = raid stats like start time, end time, total kills, etc.; output of get_overall_raid_stats
@@ -188,17 +268,51 @@ def write_fights_overview_xls(fights, overall_squad_stats, overall_raid_stats, c
 # fights = list of Fights
 # config = the config used for stats computation
 # output = file to write to
+# times_top_per_num_top = times top of each player for each number of players considered top; output of get_times_top_for_all_num_top (optional)
+# num_top_skills = number of skills written for each account and profession in the skill breakdown, None for all (optional)
+# group_stats = stats of groups of players; output of group_stats.get_group_stats (optional)
+# config = the config used for stats computation. The fields of analyses it doesn't use are not written. (optional)
+
+def write_to_json(overall_raid_stats, overall_squad_stats, fights, players, top_total_stat_players, top_average_stat_players, top_consistent_stat_players, top_percentage_stat_players, stat_names, stat_descriptions, output_file, times_top_per_num_top = None, num_top_skills = None, group_stats = None, config = None):
+    import jsons
+    # heatmaps are written to their own file, the damage on each target and of each skill to their own sections
+    fight_fields_not_written = ['heatmaps', 'target_damage', 'skill_names']
+    # the percentiles of the quantile sketches are written instead of the sketches, the top rank histogram as times_top_per_num_top
+    player_fields_not_written = ['target_damage_per_fight', 'skill_damage_per_fight', 'quantile_sketches', 'top_rank_histogram']
+    if config is not None:
+        if 'cohesion' not in config.position_analyses:
+            fight_fields_not_written.append('cohesion')
+            player_fields_not_written += ['cohesion_per_fight', 'cohesion']
+        if not config.boon_coverage_buffs:
+            fight_fields_not_written.append('boon_coverage')
+        if not config.time_windows:
+            player_fields_not_written += ['window_stats_per_fight', 'window_stats']
+        if config.bootstrap_draws <= 0:
+            player_fields_not_written.append('bootstrap')
+        if not config.stat_quantiles:
+            player_fields_not_written.append('quantiles')
+        if 'guild' not in config.group_by:
+            player_fields_not_written.append('guild')
 
-def write_to_json(overall_raid_stats, overall_squad_stats, fights, players, top_total_stat_players, top_average_stat_players, top_consistent_stat_players, top_percentage_stat_players, stat_names, stat_descriptions, output_file):
     json_dict = {}
     json_dict["overall_raid_stats"] = {key: value for key, value in overall_raid_stats.items()}
     json_dict["overall_squad_stats"] = {key: value for key, value in overall_squad_stats.items()}
-    json_dict["fights"] = [jsons.dump(fight) for fight in fights]
-    json_dict["players"] = [jsons.dump(player) for player in players]
+    json_dict["fights"] = [jsons.dump(fight, strip_attr = tuple(fight_fields_not_written)) for fight in fights]
+    # the stats per fight of each player are only read while the player is written, e.g. from the stats store in low memory mode
+    json_dict["players"] = LazyJsonList(players, lambda player: jsons.dump(player, strip_attr = tuple(player_fields_not_written)))
+    if any(fight.target_damage for fight in fights):
+        json_dict["damage_matrices"] = get_damage_matrices(fights, players)
+        json_dict["focus_fire"] = [dict(fight = fight_number, **fight.target_damage) for fight_number, fight in enumerate(fights) if fight.target_damage]
+    if any(player.skill_damage_per_fight for player in players):
+        json_dict["skill_breakdown"] = get_skill_breakdown(players, fights, num_top_skills)
+    if group_stats:
+        json_dict["group_stats"] = group_stats
     json_dict["top_total_players"] =  {key: value for key, value in top_total_stat_players.items()}
     json_dict["top_average_players"] =  {key: value for key, value in top_average_stat_players.items()}
     json_dict["top_consistent_players"] =  {key: value for key, value in top_consistent_stat_players.items()}
     json_dict["top_percentage_players"] =  {key: value for key, value in top_percentage_stat_players.items()}
+    if times_top_per_num_top is not None:
+        json_dict["times_top_per_num_top"] = {key: value for key, value in times_top_per_num_top.items()}
     json_dict["stat_names"] =  {key: value for key, value in stat_names.items()}
     json_dict["stat_descriptions"] =  {key: value for key, value in stat_descriptions.items()}
 
@@ -209,6 +323,7 @@ def write_to_json(overall_raid_stats, overall_squad_stats, fights, players, top_
 
 # Create a panda dataframe for a fights overview
 def create_panda_dataframe_overview(fights, overall_squad_stats, overall_raid_stats, config):
+    import pandas as pd
     first_col = ["" for i in range(len(fights))]
     fight_num = [i for i in range(len(fights))]
     start_date = [fight.start_time.split()[0] for fight in fights]
@@ -268,9 +383,11 @@ def create_panda_dataframe_overview(fights, overall_squad_stats, overall_raid_st
 # sorting_column = which column to sort by
 # sort_ascending = are we sorting in ascending order
 # config = config of how the stats are computed
+# ranking (optional) = ranking.StatRanking of stat, used for sorting if it contains all sorting columns
 # Output:
 # panda data frame containing data to be written to an excel sheet
-def create_panda_dataframe(players, top_players, stat, sorting_columns, sort_ascending, config):
+def create_panda_dataframe(players, top_players, stat, sorting_columns, sort_ascending, config, ranking = None):
+    import pandas as pd
     accounts = (players[top_players[i]].account for i in range(len(top_players)))
     names = (players[top_players[i]].name for i in range(len(top_players)))
     professions = (players[top_players[i]].profession for i in range(len(top_players)))
@@ -292,8 +409,9 @@ def create_panda_dataframe(players, top_players, stat, sorting_columns, sort_asc
     fights_present = list()
     groups = list()
     for i in range(len(top_players)):
-        fights_present.append((fight_number for fight_number in range(len(players[top_players[i]].stats_per_fight)) if players[top_players[i]].stats_per_fight[fight_number]['present_in_fight']))
-        groups.append(",".join(list(set(str(players[top_players[i]].stats_per_fight[fight_number]['group']) for fight_number in fights_present[i]))))
+        # only fights the player was present in are stored
+        fights_present.append(players[top_players[i]].stats_per_fight.keys())
+        groups.append(",".join(list(set(str(group) for group in get_values_per_fight(players[top_players[i]].stats_per_fight, 'group').values()))))
     data = {"account": accounts,
             "name": names,
             "profession": professions,
@@ -307,9 +425,21 @@ def create_panda_dataframe(players, top_players, stat, sorting_columns, sort_asc
         data["avg"] = average_stats
     if stat in config.squad_buff_abbrev.values():
         data["uptime"] = uptime_stats
+    for window_name in get_xls_time_windows(stat, config):
+        data["window_"+window_name] = [players[i].window_stats.get(window_name, {}).get(stat, 0) for i in top_players]
+    for percentile in config.stat_quantiles:
+        percentile_name = get_percentile_name(percentile)
+        data[percentile_name] = [players[i].quantiles.get(stat, {}).get(percentile_name, 0) for i in top_players]
     
     df = pd.DataFrame(data)
     print(stat)
 
-    df.sort_values(sorting_columns, ascending=sort_ascending, inplace=True)
+    # use the values of the ranking if all sorting columns are contained in it
+    order = None
+    if ranking is not None:
+        order = ranking.get_xls_order(top_players, sorting_columns, sort_ascending)
+    if order is not None:
+        df = df.iloc[order]
+    else:
+        df.sort_values(sorting_columns, ascending=sort_ascending, inplace=True)
     return df
@@ -1,50 +1,180 @@
 #!/usr/bin/env python3
 import math
 
-from stat_classes import Fight, Config
+from stat_classes import Fight, Config, ExtractionPlan
 from io_helper import myprint
 
-# get ids of buffs in the log from the buff map
+# entries of the player json that are read for each stat and duration type
+player_json_fields_for_stat = {
+    'active': ['activeTimes'],
+    'in_combat': ['activeTimes', 'damage1S', 'powerDamage1S', 'healthPercents', 'combatReplayData'],
+    'not_running_back': ['combatReplayData', 'statsAll'],
+    'group': ['group'],
+    'cleanses': ['support'],
+    'deaths': ['defenses'],
+    'downstate': ['defenses'],
+    'dodges': ['defenses'],
+    'blocks': ['defenses'],
+    'dist': ['combatReplayData', 'statsAll'],
+    'dmg_taken_total': ['defenses'],
+    'dmg_taken_absorbed': ['defenses'],
+    'dmg_taken_hp_lost': ['defenses'],
+    'condi_dmg_taken_total': ['defenses'],
+    'power_dmg_taken_total': ['defenses'],
+    'dmg_total': ['dpsAll'],
+    'dmg_players': ['targetDamage1S'],
+    'dmg_other': ['dpsAll', 'targetDamage1S'],
+    'condi_dmg_total': ['dpsAll'],
+    'condi_dmg_players': ['targetConditionDamage1S'],
+    'condi_dmg_other': ['dpsAll', 'targetConditionDamage1S'],
+    'power_dmg_total': ['dpsAll'],
+    'power_dmg_players': ['targetPowerDamage1S'],
+    'power_dmg_other': ['dpsAll', 'targetPowerDamage1S'],
+    'spike_dmg': ['targetDamage1S'],
+    'kills': ['statsTargets'],
+    'downs': ['statsAll'],
+    'dmg_against_downed': ['statsAll'],
+    'down_contrib': ['statsTargets'],
+    'strips': ['support'],
+    'stripped': ['defenses'],
+    'interrupts': ['statsTargets'],
+    'heal_total': ['extHealingStats'],
+    'heal_players': ['extHealingStats'],
+    'heal_other': ['extHealingStats'],
+    'barrier': ['extBarrierStats'],
+    'heal_from_regen': ['extHealingStats'],
+    'hits_from_regen': ['extHealingStats'],
+    'resurrects': ['support'],
+}
+
+# stats that can be computed for time windows, with the entries of the player json they are read from
+player_json_fields_for_timeline_stat = {
+    'dmg_total': ['damage1S'],
+    'power_dmg_total': ['powerDamage1S'],
+    'condi_dmg_total': ['damage1S', 'powerDamage1S'],
+    'dmg_players': ['targetDamage1S'],
+    'power_dmg_players': ['targetPowerDamage1S'],
+    'condi_dmg_players': ['targetConditionDamage1S'],
+    'heal_players': ['extHealingStats'],
+    'barrier': ['extBarrierStats'],
+}
+
+
+
+# work out which durations, buff ids, derived values and json entries are needed to compute the stats in config.stats_to_compute
 # Input:
-# player_json: json data with the player info. In a json file as parsed by Elite Insights, one entry of the 'players' list.
+# config = the config used for top stats computation
+# Output:
+# ExtractionPlan for this config
+def get_extraction_plan(config):
+    plan = ExtractionPlan()
+    plan.durations.add('total')
+    plan.player_json_fields.update(['account', 'name', 'profession', 'notInSquad', 'hasCommanderTag'])
+    plan.player_json_fields.update(player_json_fields_for_stat['group'])
+    for stat in config.stats_to_compute:
+        duration_type = config.duration_for_averages[stat]
+        plan.durations.add(duration_type)
+        if duration_type in player_json_fields_for_stat:
+            plan.player_json_fields.update(player_json_fields_for_stat[duration_type])
+        if stat in player_json_fields_for_stat:
+            plan.player_json_fields.update(player_json_fields_for_stat[stat])
+        if stat in config.squad_buff_abbrev.values():
+            plan.buffs.add(stat)
+            plan.player_json_fields.update(['squadBuffs', 'buffUptimes'])
+        elif stat in config.self_buff_abbrev.values():
+            plan.buffs.add(stat)
+            plan.player_json_fields.add('selfBuffs')
+        elif stat == 'heal_from_regen' or stat == 'hits_from_regen':
+            plan.buffs.add('regen')
+    if config.position_analyses:
+        plan.player_json_fields.add('combatReplayData')
+    # the boon coverage is computed from the buff states in buffUptimes
+    if config.boon_coverage_buffs:
+        plan.buffs.update(config.boon_coverage_buffs)
+        plan.player_json_fields.add('buffUptimes')
+    if config.target_damage:
+        plan.player_json_fields.add('targetDamage1S')
+    # stats in time windows are computed from the per second values
+    if config.time_windows:
+        for stat in config.stats_to_compute:
+            plan.player_json_fields.update(player_json_fields_for_timeline_stat.get(stat, []))
+        if any(bound == 'tag_death' for bounds in config.time_windows.values() for bound in bounds):
+            plan.player_json_fields.add('combatReplayData')
+    # the damage distribution is the largest part of the player json, it is only read from archives if it is needed
+    if config.skill_breakdown:
+        plan.player_json_fields.add('totalDamageDist')
+    if 'guild' in config.group_by:
+        plan.player_json_fields.add('guildID')
+    # the distance to tag and the time not running back are computed from the tag positions
+    plan.needs_tag_positions = 'dist' in config.stats_to_compute or 'not_running_back' in plan.durations
+    return plan
+
+
+
+# get the extraction plan of the config, computing it the first time it is needed
+# Input:
+# config = the config used for top stats computation
+def get_config_extraction_plan(config):
+    if config.extraction_plan is None:
+        config.extraction_plan = get_extraction_plan(config)
+    return config.extraction_plan
+
+# check whether the ids of all buffs needed for the stats to compute are known
+# Input:
+# config = config to use in top stats computation
+# log = log file to write missing buffs to, or None if they shouldn't be reported
+def found_all_needed_buff_ids(config, log = None):
+    needed_buffs = get_config_extraction_plan(config).buffs
+    found_all_ids = True
+    for buff, abbrev in config.self_buff_abbrev.items():
+        if abbrev in needed_buffs and abbrev not in config.self_buff_ids:
+            if log is not None:
+                myprint(log, "id for buff "+buff+" could not be found. This is not necessarily an error, the buff might just not be present in this log.", "info", config)
+            found_all_ids = False
+    for buff, abbrev in config.squad_buff_abbrev.items():
+        if abbrev in needed_buffs and abbrev not in config.squad_buff_ids:
+            if log is not None:
+                myprint(log, "id for buff "+buff+" could not be found. This is not necessarily an error, the buff might just not be present in this log.", "info", config)
+            found_all_ids = False
+    return found_all_ids
+
+
+
+# get ids of buffs in the log from the buff map. Only buffs whose ids are not known yet are considered.
+# Input:
+# json_data: json data of the whole log, as parsed by Elite Insights
 # config: config to use in top stats computation
-# changes config.buffs_stacking_intensity and config.buffs_stacking_duration inplace
+# log: log file to write to
+# changes config.squad_buff_ids, config.self_buff_ids, config.buffs_stacking_intensity, config.buffs_stacking_duration and config.buffs_not_stacking inplace
 def get_buff_ids_from_json(json_data, config, log):
     buffs = json_data['buffMap']
     for buff_id, buff in buffs.items():
         if buff['name'] in config.squad_buff_abbrev:
             abbrev_name = config.squad_buff_abbrev[buff['name']]
+            if abbrev_name in config.squad_buff_ids:
+                continue
             config.squad_buff_ids[abbrev_name] = buff_id[1:]
             if buff['stacking']:
-                config.buffs_stacking_intensity.append(abbrev_name)
+                config.buffs_stacking_intensity.add(abbrev_name)
             elif 'aura' in abbrev_name:
-                config.buffs_not_stacking.append(abbrev_name)
+                config.buffs_not_stacking.add(abbrev_name)
             else:
-                config.buffs_stacking_duration.append(abbrev_name)
-        if buff['name'] in config.self_buff_abbrev:
+                config.buffs_stacking_duration.add(abbrev_name)
+        elif buff['name'] in config.self_buff_abbrev:
             abbrev_name = config.self_buff_abbrev[buff['name']]
-            config.self_buff_ids[abbrev_name] = buff_id[1:]
-    # check that all buff ids were found
-    found_all_ids = True
-    for buff, abbrev in config.self_buff_abbrev.items():
-        if abbrev not in config.self_buff_ids:
-            myprint(log, "id for buff "+buff+" could not be found. This is not necessarily an error, the buff might just not be present in this log.", "info", config)
-            found_all_ids = False
-    for buff, abbrev in config.squad_buff_abbrev.items():
-        if abbrev not in config.squad_buff_ids:
-            myprint(log, "id for buff "+buff+" could not be found. This is not necessarily an error, the buff might just not be present in this log.", "info", config)
-            found_all_ids = False
-    return found_all_ids
+            if abbrev_name not in config.self_buff_ids:
+                config.self_buff_ids[abbrev_name] = buff_id[1:]
+    # check that all buff ids needed for the stats to compute were found
+    return found_all_needed_buff_ids(config, log)
 
 
-# get stats for this fight from fight_json
+
+# get hours, minutes and seconds from the duration string in the json
 # Input:
-# fight_json = json object including one fight
-# config = the config to use for top stat computation
-# log = log file to write to
-def get_stats_from_fight_json(fight_json, config, log):
-    # get fight duration in min and sec
-    fight_duration_json = fight_json['duration']
+# fight_duration_json = duration as written by Elite Insights, e.g. "02m 35s 417ms"
+# Output:
+# hours, minutes, seconds
+def get_duration_from_json(fight_duration_json):
     split_duration = fight_duration_json.split('h ', 1)
     hours = 0
     mins = 0
@@ -57,18 +187,74 @@ def get_stats_from_fight_json(fight_json, config, log):
     split_duration = split_duration[1].split('s', 1)
     if len(split_duration) > 1:
         secs = int(split_duration[0])
-    myprint(log, "duration: "+str(hours)+"h "+str(mins)+"m "+str(secs)+"s", "debug", config)
-    duration = hours*3600 + mins*60 + secs
+    return hours, mins, secs
+
 
-    num_allies = len(fight_json['players'])
+
+# get the number of enemy players and the number of times they died from the targets in the json
+# Input:
+# targets_json = the 'targets' list in a json file as parsed by Elite Insights
+# Output:
+# number of enemies, number of kills
+def get_enemies_and_kills_from_json(targets_json):
     num_enemies = 0
     num_kills = 0
-    for enemy in fight_json['targets']:
+    for enemy in targets_json:
         if 'enemyPlayer' in enemy and enemy['enemyPlayer'] == True:
             num_enemies += 1
             # if combat replay data is there, add number of times this player died to total num kills
             if 'defenses' in enemy:
                 num_kills += enemy['defenses'][0]['deadCount']
+    return num_enemies, num_kills
+
+
+
+# get the entries of a target that are needed for counting enemies and kills
+# Input:
+# target_json = one entry of the 'targets' list in a json file as parsed by Elite Insights
+# Output:
+# dictionary with name, enemyPlayer and the deadCount in the first entry of defenses, as far as they are there
+def get_header_target(target_json):
+    target = {key: target_json[key] for key in ['name', 'enemyPlayer'] if key in target_json}
+    if 'defenses' in target_json:
+        target['defenses'] = [{'deadCount': target_json['defenses'][0]['deadCount']}]
+    return target
+
+
+
+# get the fields needed for skipping a fight from the decoded json. Same format as the header from json_loader.get_fight_header,
+# but only with the entries of the targets needed for counting enemies and kills.
+# Input:
+# fight_json = json object including one fight
+def get_fight_header_from_json(fight_json):
+    header = {}
+    header['duration'] = fight_json['duration']
+    header['time_start'] = fight_json['timeStartStd']
+    header['time_end'] = fight_json['timeEndStd']
+    header['allies'] = len(fight_json['players'])
+    header['targets'] = [get_header_target(target) for target in fight_json['targets']]
+    header['fight_name'] = fight_json.get('fightName', "")
+    header['recorded_by'] = fight_json.get('recordedBy', "")
+    header['accounts'] = [player['account'] for player in fight_json['players']]
+    header['has_healing_extension'] = any(extension['name'] == "Healing Stats" for extension in fight_json.get('usedExtensions', []))
+    header['has_combat_replay'] = 'combatReplayMetaData' in fight_json
+    return header
+
+
+
+# initialize a fight from the fight header and check whether it should be skipped
+# Input:
+# header = fight header as returned by get_fight_header_from_json or json_loader.get_fight_header
+# config = the config to use for top stat computation
+# log = log file to write to
+def get_fight_from_header(header, config, log):
+    # get fight duration in min and sec
+    hours, mins, secs = get_duration_from_json(header['duration'])
+    myprint(log, "duration: "+str(hours)+"h "+str(mins)+"m "+str(secs)+"s", "debug", config)
+    duration = hours*3600 + mins*60 + secs
+
+    num_allies = header['allies']
+    num_enemies, num_kills = get_enemies_and_kills_from_json(header['targets'])
 
     # initialize fight         
     fight = Fight()
@@ -76,29 +262,52 @@ def get_stats_from_fight_json(fight_json, config, log):
     fight.enemies = num_enemies
     fight.allies = num_allies
     fight.kills = num_kills
-    fight.start_time = fight_json['timeStartStd']
-    fight.end_time = fight_json['timeEndStd']        
+    fight.start_time = header['time_start']
+    fight.end_time = header['time_end']
     fight.total_stats = {key: 0 for key in config.stats_to_compute}
     fight.avg_stats = {key: 0 for key in config.stats_to_compute}    
         
+    check_fight_requirements(fight, config, log)
+    return fight
+
+
+
+# mark a fight as skipped if it doesn't fulfill the requirements of the config
+# Input:
+# fight = the Fight, changed inplace
+# config = the config to use for top stat computation
+# log = log file to write to
+def check_fight_requirements(fight, config, log):
     # skip fights that last less than min_fight_duration seconds
-    if(duration < config.min_fight_duration):
+    if(fight.duration < config.min_fight_duration):
         fight.skipped = True
+        mins, secs = divmod(fight.duration, 60)
+        hours, mins = divmod(mins, 60)
         print_string = "\nFight only took "+str(hours)+"h "+str(mins)+"m "+str(secs)+"s. Skipping fight."
         myprint(log, print_string, "info")
         
     # skip fights with less than min_allied_players allies
-    if num_allies < config.min_allied_players:
+    if fight.allies < config.min_allied_players:
         fight.skipped = True
-        print_string = "\nOnly "+str(num_allies)+" allied players involved. Skipping fight."
+        print_string = "\nOnly "+str(fight.allies)+" allied players involved. Skipping fight."
         myprint(log, print_string, "info")
 
     # skip fights with less than min_enemy_players enemies
-    if num_enemies < config.min_enemy_players:
+    if fight.enemies < config.min_enemy_players:
         fight.skipped = True
-        print_string = "\nOnly "+str(num_enemies)+" enemies involved. Skipping fight."
+        print_string = "\nOnly "+str(fight.enemies)+" enemies involved. Skipping fight."
         myprint(log, print_string, "info")
 
+
+
+# get stats for this fight from fight_json
+# Input:
+# fight_json = json object including one fight
+# config = the config to use for top stat computation
+# log = log file to write to
+def get_stats_from_fight_json(fight_json, config, log):
+    fight = get_fight_from_header(get_fight_header_from_json(fight_json), config, log)
+
     # get players using healing addon, if the addon was used
     if 'usedExtensions' not in fight_json:
         fight.players_running_healing_addon = []
@@ -112,8 +321,10 @@ def get_stats_from_fight_json(fight_json, config, log):
     fight.polling_rate = fight_json['combatReplayMetaData']['pollingRate']
     fight.inch_to_pixel = fight_json['combatReplayMetaData']['inchToPixel']
 
-    # get commander positions
+    # get commander positions, only needed for distance to tag and time not running back
     tag_positions = list()
+    if not get_config_extraction_plan(config).needs_tag_positions:
+        return fight
     commander_found = False
     i = 0
     for player in fight_json['players']:
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+#    json_loader.py contains tools for reading and decoding the json files written by Elite Insights.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# json backends that can be used for decoding, ordered from fastest to slowest
+json_decoders = ['orjson', 'simdjson', 'json']
+
+
+# get a function that decodes json from bytes-like data with the given backend
+# Input:
+# name = name of the json backend, one of json_decoders
+# Output:
+# decoding function, or None if the backend is not installed
+def get_json_decode_function(name):
+    if name == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            return None
+        # orjson can read directly from the memory mapped file
+        return orjson.loads
+    if name == 'simdjson':
+        try:
+            import simdjson
+        except ImportError:
+            return None
+        return lambda data: simdjson.loads(bytes(data))
+    if name == 'json':
+        return lambda data: json.loads(bytes(data))
+    return None
+
+
+
+# get the fastest available json decoder
+# Input:
+# preferred = name of the backend that should be used if it is installed (optional)
+# Output:
+# name of the backend, decoding function
+def get_json_decoder(preferred = None):
+    candidates = list(json_decoders)
+    if preferred is not None:
+        candidates.insert(0, preferred)
+    for name in candidates:
+        decode = get_json_decode_function(name)
+        if decode is not None:
+            return name, decode
+    # stdlib json is always available, this is never reached
+    return 'json', get_json_decode_function('json')
+
+
+
+# open a log file and provide its content as bytes-like data. Uncompressed files are memory mapped instead of read.
+# The data is only valid inside the with block.
+# Input:
+# file_path = path to a .json or .gz file
+# prefetched_data = content of the file if it was already read by read_log_files_ahead, otherwise None
+@contextmanager
+def open_log_file(file_path, prefetched_data = None):
+    if prefetched_data is not None:
+        yield prefetched_data
+        return
+    if file_path.endswith('.gz'):
+        with gzip.open(file_path, mode = "rb") as f:
+            yield f.read()
+        return
+    with open(file_path, mode = "rb") as f:
+        # empty files can't be memory mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mapped_file:
+            data = memoryview(mapped_file)
+            try:
+                yield data
+            finally:
+                data.release()
+
+
+
+# read the whole content of a log file, decompressing .gz files
+# Input:
+# file_path = path to a .json or .gz file
+# Output:
+# content of the file as bytes
+def read_log_file(file_path):
+    if file_path.endswith('.gz'):
+        with gzip.open(file_path, mode = "rb") as f:
+            return f.read()
+    with open(file_path, mode = "rb") as f:
+        return f.read()
+
+
+
+# Read log files in a background thread while the previous ones are decoded and processed, so reading from disk and computing overlap.
+# A file is only read while less than max_bytes are in flight, i.e. read but not processed yet, including the file currently processed.
+# So at most max_bytes plus the size of one file are kept in memory. Files that are not .json or .gz files are not read.
+# Input:
+# log_files = list of (filename, file path)
+# max_bytes = maximum number of bytes in flight, 0 to read each file only when it is processed
+# Output:
+# generator of (filename, file path, content of the file or None if it wasn't read), in the order of log_files
+def read_log_files_ahead(log_files, max_bytes):
+    if max_bytes <= 0:
+        for filename, file_path in log_files:
+            yield filename, file_path, None
+        return
+
+    condition = threading.Condition()
+    read_files = deque()    # (filename, file path, content or the error raised while reading) in the order they were read
+    bytes_in_flight = 0
+    stopped = False
+
+    def read_all_files():
+        nonlocal bytes_in_flight
+        for filename, file_path in log_files:
+            with condition:
+                condition.wait_for(lambda: stopped or bytes_in_flight < max_bytes)
+                if stopped:
+                    return
+            data = None
+            if os.path.splitext(file_path)[1] in ['.json', '.gz']:
+                try:
+                    data = read_log_file(file_path)
+                except (OSError, EOFError) as error:
+                    data = error
+            with condition:
+                if isinstance(data, bytes):
+                    bytes_in_flight += len(data)
+                read_files.append((filename, file_path, data))
+                condition.notify_all()
+
+    reader = threading.Thread(target = read_all_files, daemon = True)
+    reader.start()
+    try:
+        for _ in range(len(log_files)):
+            with condition:
+                condition.wait_for(lambda: read_files)
+                filename, file_path, data = read_files.popleft()
+            if isinstance(data, Exception):
+                raise data
+            yield filename, file_path, data
+            # the file was processed, its memory can be used for the next files
+            with condition:
+                if data is not None:
+                    bytes_in_flight -= len(data)
+                condition.notify_all()
+    finally:
+        with condition:
+            stopped = True
+            condition.notify_all()
+
+
+
+# read and decode a log file
+# Input:
+# file_path = path to a .json or .gz file
+# decode = decoding function as returned by get_json_decoder
+# Output:
+# json data of the log
+def load_json_file(file_path, decode):
+    with open_log_file(file_path) as data:
+        return decode(data)
+
+
+
+# patterns for the top level fields needed to decide whether a fight is skipped or a duplicate
+duration_pattern = re.compile(rb'"duration"\s*:\s*"([^"]*)"')
+time_start_pattern = re.compile(rb'"timeStartStd"\s*:\s*"([^"]*)"')
+time_end_pattern = re.compile(rb'"timeEndStd"\s*:\s*"([^"]*)"')
+fight_name_pattern = re.compile(rb'"fightName"\s*:\s*"((?:[^"\\]|\\.)*)"')
+recorded_by_pattern = re.compile(rb'"recordedBy"\s*:\s*"((?:[^"\\]|\\.)*)"')
+account_pattern = re.compile(rb'"account"\s*:\s*"((?:[^"\\]|\\.)*)"')
+healing_extension_pattern = re.compile(rb'"Healing Stats"')
+combat_replay_pattern = re.compile(rb'"combatReplayMetaData"\s*:')
+# every entry in the players list has a commander tag field, targets don't
+player_pattern = re.compile(rb'"hasCommanderTag"\s*:')
+targets_pattern = re.compile(rb'"targets"\s*:\s*\[')
+players_pattern = re.compile(rb'"players"\s*:\s*\[')
+# top level fields that come after the players list in EI json files
+after_players_pattern = re.compile(rb'"(?:phases|mechanics|uploadLinks|skillMap|buffMap)"\s*:')
+
+
+
+# decode a json string value found by one of the patterns above
+# Input:
+# match = regex match whose first group is the content of a json string
+# Output:
+# decoded string, or "" if nothing was found
+def decode_json_string(match):
+    if match is None:
+        return ""
+    return json.loads(b'"' + match.group(1) + b'"')
+
+
+
+# get the json list starting at the given position in data without decoding anything after it
+# Input:
+# data = bytes-like content of the log file
+# start = position of the opening bracket of the list
+# Output:
+# decoded list and the position in data after it, or None, None if it could not be decoded
+def decode_json_list_at(data, start):
+    decoder = json.JSONDecoder()
+    chunk_size = 1 << 20
+    while True:
+        end = min(start + chunk_size, len(data))
+        # a multibyte character cut at the end of the chunk is dropped; that is only after the list if decoding succeeds
+        text = bytes(data[start:end]).decode('utf-8', errors='ignore')
+        try:
+            json_list, list_end = decoder.raw_decode(text)
+            return json_list, start + len(text[:list_end].encode('utf-8'))
+        except json.JSONDecodeError:
+            if end == len(data):
+                return None, None
+        chunk_size *= 4
+
+
+
+# get the fields needed for skipping a fight from the raw content of a log file, without decoding the whole file.
+# Only the part of the file up to the end of the players list is searched, and for duplicate logs the part after it.
+# Input:
+# data = bytes-like content of the log file as provided by open_log_file
+# with_fingerprint = also get the fields needed for get_fight_fingerprint and for choosing between duplicate logs (optional)
+# Output:
+# dictionary with duration, time_start, time_end, allies, targets and, if requested, the fields needed for get_fight_fingerprint,
+# has_healing_extension and has_combat_replay, or None if the fields could not be found
+def get_fight_header(data, with_fingerprint = False):
+    targets_start = targets_pattern.search(data)
+    if targets_start is None:
+        return None
+    # the top level fields of the fight come before the targets list in EI json files
+    header_end = targets_start.start()
+    duration = duration_pattern.search(data, 0, header_end)
+    time_start = time_start_pattern.search(data, 0, header_end)
+    time_end = time_end_pattern.search(data, 0, header_end)
+    if duration is None or time_start is None or time_end is None:
+        return None
+
+    # the top level targets list comes before the players and phases lists in EI json files.
+    # if something else was found, let the caller fall back to decoding the whole file.
+    targets, targets_end = decode_json_list_at(data, targets_start.end() - 1)
+    if targets is None or any(not isinstance(target, dict) for target in targets):
+        return None
+    players_start = players_pattern.search(data, targets_end)
+    if players_start is None:
+        return None
+    players_end = after_players_pattern.search(data, players_start.end())
+    players_end = len(data) if players_end is None else players_end.start()
+
+    header = {}
+    header['duration'] = duration.group(1).decode('utf-8')
+    header['time_start'] = time_start.group(1).decode('utf-8')
+    header['time_end'] = time_end.group(1).decode('utf-8')
+    header['allies'] = sum(1 for _ in player_pattern.finditer(data, players_start.end(), players_end))
+    header['targets'] = targets
+    if with_fingerprint:
+        header['fight_name'] = decode_json_string(fight_name_pattern.search(data, 0, header_end))
+        header['recorded_by'] = decode_json_string(recorded_by_pattern.search(data, 0, header_end))
+        header['accounts'] = [decode_json_string(account) for account in account_pattern.finditer(data, players_start.end(), players_end)]
+        # the used extensions and the combat replay meta data come after the players list in EI json files
+        header['has_healing_extension'] = healing_extension_pattern.search(data, players_end) is not None
+        header['has_combat_replay'] = combat_replay_pattern.search(data, players_end) is not None
+    return header
+
+
+
+# get a fingerprint identifying the fight in a log. Logs of the same fight have the same fingerprint.
+# Input:
+# header = fight header as returned by get_fight_header or json_helper.get_fight_header_from_json
+# Output:
+# fingerprint string
+def get_fight_fingerprint(header):
+    fingerprint_fields = [header['time_start'], header['time_end'], header['fight_name'], header['recorded_by'], sorted(header['accounts'])]
+    return hashlib.sha1(json.dumps(fingerprint_fields).encode('utf-8')).hexdigest()
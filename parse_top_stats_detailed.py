@@ -23,18 +23,28 @@ from os import listdir
 import sys
 from enum import Enum
 import importlib
-import openpyxl
 
 from parse_top_stats_tools import *
 from io_helper import *
+from json_loader import json_decoders
+from snapshot import write_snapshot, read_snapshot, get_snapshot_stats, restore_snapshot
+from position_analysis import get_raid_heatmaps, write_heatmaps, write_heatmap_pngs
+from group_stats import get_group_stats
+from fight_stream import write_aggregates_to_stream
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='This reads a set of arcdps reports in json format and generates top stats.')
-    parser.add_argument('input_directory', help='Directory containing .json files from arcdps reports')
+    parser.add_argument('input_directory', help='Directory containing .json files from arcdps reports or fight archives (.npz) written by convert_logs_to_archives.py')
     parser.add_argument('-x', '--xls_output', dest="xls_output_filename", help="xls file to write the computed top stats")    
     parser.add_argument('-j', '--json_output', dest="json_output_filename", help="json file to write the computed top stats to")    
     parser.add_argument('-l', '--log_file', dest="log_file", help="Logging file with all the output")
-    parser.add_argument('-c', '--config_file', dest="config_file", help="Config file with all the settings", default="parser_config_detailed")
+    parser.add_argument('-c', '--config_file', dest="config_file", help="Config file with all the settings. Several comma separated config files can be given to compute top stats for each of them while reading the logs only once; the config names are then appended to the output file names.", default="parser_config_detailed")
+    parser.add_argument('--json_decoder', dest="json_decoder", help="json backend to use for reading the logs. By default, the fastest installed one is used.", choices=json_decoders, default=None)
+    parser.add_argument('-s', '--stats', dest="stats", help="Comma separated list of stats to compute instead of the ones in the config file, e.g. dmg_players,strips,stab", default=None)
+    parser.add_argument('--overview_only', dest="overview_only", help="Only read the fight headers and write the fights overview, without computing any player stats.", default=False, action='store_true')
+    parser.add_argument('--snapshot', dest="snapshot_filename", help="File to write the computed stats to, so the top stats can be recomputed with --rerank without parsing the logs again", default=None)
+    parser.add_argument('--rerank', dest="rerank", help="Don't parse the logs, but recompute the top stats from the snapshot of an earlier run using the current config.", default=False, action='store_true')
+    parser.add_argument('--low_memory', dest="low_memory", help="Keep the stats per fight of all players in a temporary file instead of in memory. No snapshot is written.", default=False, action='store_true')
     parser.add_argument('-a', '--anonymized', dest="anonymize", help="Create an anonymized version of the top stats. All account and character names will be replaced.", default=False, action='store_true')
     args = parser.parse_args()
 
@@ -47,71 +57,160 @@ if __name__ == '__main__':
         args.json_output_filename = args.input_directory+"/top_stats_detailed.json"                
     if args.log_file is None:
         args.log_file = args.input_directory+"/log_detailed.txt"
+    if args.snapshot_filename is None:
+        args.snapshot_filename = args.input_directory+"/top_stats_detailed.pickle"
 
     log = open(args.log_file, "w")
 
-    parser_config = importlib.import_module("parser_configs."+args.config_file , package=None) 
-    config = fill_config(parser_config, log)
-    if 'xls' not in config.files_to_write and 'json' not in config.files_to_write:
-        myprint("You didn't choose to write the output to an xls or a json file. It will be lost! Consider changing the configuration.")
+    config_names = [config_name.strip() for config_name in args.config_file.split(",") if config_name.strip()]
+    parser_configs = [importlib.import_module("parser_configs."+config_name , package=None) for config_name in config_names]
+    selected_stats = None
+    if args.stats is not None:
+        selected_stats = [stat.strip() for stat in args.stats.split(",") if stat.strip()]
+
+    # each config gets its own output files
+    profiles = list()
+    for config_name, parser_config in zip(config_names, parser_configs):
+        output_files = {'xls': args.xls_output_filename, 'json': args.json_output_filename, 'snapshot': args.snapshot_filename,
+                        'heatmaps': os.path.splitext(args.json_output_filename)[0]+"_heatmaps.npz"}
+        if len(config_names) > 1:
+            output_files = {key: get_profile_output_filename(filename, config_name) for key, filename in output_files.items()}
+        profile_stats = selected_stats
+        snapshot = None
+        if args.rerank:
+            snapshot = read_snapshot(output_files['snapshot'], log)
+            if snapshot is None:
+                myprint(log, "Aborting!", "info")
+                exit(1)
+            # only the stats contained in the snapshot can be ranked
+            profile_stats = get_snapshot_stats(snapshot, selected_stats, log)
+        config = fill_config(parser_config, log, profile_stats)
+        if 'xls' not in config.files_to_write and 'json' not in config.files_to_write:
+            myprint(log, "You didn't choose to write the output of "+config_name+" to an xls or a json file. It will be lost! Consider changing the configuration.", "info")
+        profiles.append({'name': config_name, 'config': config, 'output_files': output_files, 'snapshot': snapshot})
 
     print_string = "Using input directory "+args.input_directory
-    if 'xls' in config.files_to_write:
-        print_string = print_string+", writing xls output to "+args.xls_output_filename
-    if 'json' in config.files_to_write:
-        print_string = print_string+", writing json output to "+args.json_output_filename
+    for profile in profiles:
+        if 'xls' in profile['config'].files_to_write:
+            print_string = print_string+", writing xls output to "+profile['output_files']['xls']
+        if 'json' in profile['config'].files_to_write:
+            print_string = print_string+", writing json output to "+profile['output_files']['json']
     print_string = print_string+" and writing log to "+args.log_file
     print(print_string)
-    print_string = "Considering fights with at least "+str(config.min_allied_players)+" allied players and at least "+str(config.min_enemy_players)+" enemies that took longer than "+str(config.min_fight_duration)+" s."
-    myprint(log, print_string, "info")
-
-    players, fights, found_healing, found_barrier = collect_stat_data(args, config, log, args.anonymize)
-    if (not fights) or all(fight.skipped for fight in fights):
-        myprint(log, "Aborting!", "info")
-        exit(1)
-
-    # print overall stats
-    overall_squad_stats = get_overall_squad_stats(fights, config)
-    overall_raid_stats = get_overall_raid_stats(fights)
-    total_fight_duration = get_total_fight_duration_in_hms(overall_raid_stats['used_fights_duration'])
-
-    if 'xls' in config.files_to_write:
-        write_fights_overview_xls(fights, overall_squad_stats, overall_raid_stats, config, args.xls_output_filename)
-
-    # print top x players for all stats. If less then x
-    # players, print all. If x-th place doubled, print all with the
-    # same amount of top x achieved.
-    num_used_fights = overall_raid_stats['num_used_fights']
-        
-    top_total_stat_players = {key: list() for key in config.stats_to_compute}
-    top_average_stat_players = {key: list() for key in config.stats_to_compute}
-    top_consistent_stat_players = {key: list() for key in config.stats_to_compute}
-    top_percentage_stat_players = {key: list() for key in config.stats_to_compute}
-    percentage_comparison_val = {key: 0 for key in config.stats_to_compute}
-    
-    for stat in config.stats_to_compute:
-        if (stat == 'heal' and not found_healing) or (stat == 'barrier' and not found_barrier):
-            continue
+    for profile in profiles:
+        config = profile['config']
+        print_string = "Considering fights with at least "+str(config.min_allied_players)+" allied players and at least "+str(config.min_enemy_players)+" enemies that took longer than "+str(config.min_fight_duration)+" s"
+        if len(profiles) > 1:
+            print_string = print_string+" for "+profile['name']
+        myprint(log, print_string+".", "info")
+
+    # the logs are only read once with a config containing everything needed by all configs
+    extraction_config = fill_extraction_config(parser_configs, [profile['config'] for profile in profiles], log)
+
+    if args.overview_only:
+        # no stats are computed, the overview only contains the fight information
+        extraction_config.stats_to_compute = []
+        fights = collect_fight_overview(args, extraction_config, log)
+        for profile in profiles:
+            config = profile['config']
+            config.stats_to_compute = []
+            _, profile_fights = get_profile_data([], fights, config, log)
+            if (not profile_fights) or all(fight.skipped for fight in profile_fights):
+                myprint(log, "\n No valid fights were found in "+args.input_directory+" for "+profile['name'], "info")
+                continue
+            overall_squad_stats = get_overall_squad_stats(profile_fights, config)
+            overall_raid_stats = get_overall_raid_stats(profile_fights)
+            if 'xls' in config.files_to_write:
+                write_fights_overview_xls(profile_fights, overall_squad_stats, overall_raid_stats, config, profile['output_files']['xls'])
+            if 'json' in config.files_to_write:
+                write_to_json(overall_raid_stats, overall_squad_stats, profile_fights, [], {}, {}, {}, {}, config.stat_names, config.stat_descriptions, profile['output_files']['json'], config = config)
+        sys.exit()
 
-        top_consistent_stat_players[stat] = get_top_players(players, config, stat, StatType.CONSISTENT)
-        top_total_stat_players[stat] = get_top_players(players, config, stat, StatType.TOTAL)
-        top_average_stat_players[stat] = get_top_players(players, config, stat, StatType.AVERAGE)            
-        top_percentage_stat_players[stat],percentage_comparison_val[stat] = get_top_percentage_players(players, config, stat, num_used_fights, top_consistent_stat_players[stat])
-
-    if 'json' in config.files_to_write:
-        write_to_json(overall_raid_stats, overall_squad_stats, fights, players, top_total_stat_players, top_average_stat_players, top_consistent_stat_players, top_percentage_stat_players, config.stat_names, config.stat_descriptions, args.json_output_filename)
-
-    if 'xls' in config.files_to_write:
-        for stat in config.stats_to_compute:
-            if stat == 'dist':
-                write_stats_xls(players, top_average_stat_players[stat], stat, args.xls_output_filename, config)
-            elif 'dmg_taken' in stat:
-                write_stats_xls(players, top_average_stat_players[stat], stat, args.xls_output_filename, config)
-            elif 'heal' in stat and stat != 'heal_from_regen' and found_healing:
-                write_stats_xls(players, top_average_stat_players[stat], stat, args.xls_output_filename, config)            
-            elif stat == 'barrier' and found_barrier:
-                write_stats_xls(players, top_average_stat_players[stat], stat, args.xls_output_filename, config)
-            elif stat == 'deaths':
-                write_stats_xls(players, top_average_stat_players[stat], stat, args.xls_output_filename, config)
-            else:
-                write_stats_xls(players, top_average_stat_players[stat], stat, args.xls_output_filename, config)
+    # the anonymous names are given by the list of all players read from the logs, so they are the same for all configs and the stream
+    anonymous_names = None
+    if args.rerank:
+        for profile in profiles:
+            print("Recomputing top stats from "+profile['output_files']['snapshot'])
+            profile['players'], profile['fights'], profile['found_healing'], profile['found_barrier'] = restore_snapshot(profile['snapshot'], profile['config'], log)
+    else:
+        # the fights are read once for all configs, so there is one stream for all of them
+        fight_stream = None
+        if any('ndjson' in profile['config'].files_to_write for profile in profiles):
+            fight_stream_filename = os.path.splitext(args.json_output_filename)[0]+"_fights.ndjson"
+            myprint(log, "Writing the results of each fight to "+fight_stream_filename, "info")
+            fight_stream = open(fight_stream_filename, 'w')
+        players, fights, found_healing, found_barrier = collect_fight_data(args, extraction_config, log, fight_stream)
+        if fights is None:
+            myprint(log, "Aborting!", "info")
+            exit(1)
+        anonymous_names = get_anonymous_names(players)
+        for profile in profiles:
+            config = profile['config']
+            # buff ids found in the logs and the durations used for the stats per fight
+            for field in parsed_config_fields:
+                setattr(config, field, getattr(extraction_config, field))
+            profile['players'], profile['fights'] = get_profile_data(players, fights, config, log)
+            profile['found_healing'], profile['found_barrier'] = found_healing, found_barrier
+            get_overall_stats(profile['players'], profile['fights'], config, log)
+            if 'snapshot' in config.files_to_write and not all(fight.skipped for fight in profile['fights']):
+                if args.low_memory or extraction_config.low_memory:
+                    # pickling all stats per fight would need them all in memory at once
+                    myprint(log, "No snapshot is written in low memory mode.", "info")
+                else:
+                    write_snapshot(profile['players'], profile['fights'], found_healing, found_barrier, config, profile['output_files']['snapshot'])
+
+    for profile in profiles:
+        config = profile['config']
+        players = profile['players']
+        fights = profile['fights']
+        found_healing = profile['found_healing']
+        found_barrier = profile['found_barrier']
+        output_files = profile['output_files']
+        if all(fight.skipped for fight in fights):
+            myprint(log, "\n No valid fights were found in "+args.input_directory+" for "+profile['name'], "info")
+            continue
+        if args.anonymize or config.anonymize:
+            # a snapshot only contains the players of its config
+            anonymize_players(players, anonymous_names if anonymous_names is not None else get_anonymous_names(players))
+
+        # print overall stats
+        overall_squad_stats = get_overall_squad_stats(fights, config)
+        overall_raid_stats = get_overall_raid_stats(fights)
+        total_fight_duration = get_total_fight_duration_in_hms(overall_raid_stats['used_fights_duration'])
+
+        if 'xls' in config.files_to_write:
+            write_fights_overview_xls(fights, overall_squad_stats, overall_raid_stats, config, output_files['xls'])
+
+        # print top x players for all stats. If less then x
+        # players, print all. If x-th place doubled, print all with the
+        # same amount of top x achieved.
+        num_used_fights = overall_raid_stats['num_used_fights']
+        # the players are sorted once per stat and ranking type, for all awards and the xls
+        rankings = get_stat_rankings(players, config)
+        # groups are computed after anonymizing, so accounts are anonymized in the group stats, too
+        group_stats = get_group_stats(players, fights, config) if config.group_by else None
+        top_total_stat_players, top_average_stat_players, top_consistent_stat_players, top_percentage_stat_players, percentage_comparison_val = get_top_stat_players(players, config, num_used_fights, found_healing, found_barrier, rankings)
+
+        if 'json' in config.files_to_write:
+            write_to_json(overall_raid_stats, overall_squad_stats, fights, players, top_total_stat_players, top_average_stat_players, top_consistent_stat_players, top_percentage_stat_players, config.stat_names, config.stat_descriptions, output_files['json'], get_times_top_for_all_num_top(players, config), config.skill_breakdown_top, group_stats, config)
+
+        if 'xls' in config.files_to_write:
+            write_all_stats_xls(players, top_average_stat_players, output_files['xls'], config, rankings)
+            if group_stats:
+                write_group_stats_xls(group_stats, config, output_files['xls'])
+
+        if 'ndjson' in config.files_to_write and not args.rerank:
+            write_aggregates_to_stream(fight_stream, profile['name'], overall_raid_stats, overall_squad_stats, players,
+                                       {'top_total_players': top_total_stat_players, 'top_average_players': top_average_stat_players,
+                                        'top_consistent_players': top_consistent_stat_players, 'top_percentage_players': top_percentage_stat_players},
+                                       anonymous_names if args.anonymize or extraction_config.anonymize else None)
+
+        if 'heatmaps' in config.position_analyses and ('heatmaps' in config.files_to_write or 'heatmap_png' in config.files_to_write):
+            raid_heatmaps = get_raid_heatmaps(fights)
+            if 'heatmaps' in config.files_to_write:
+                write_heatmaps(fights, raid_heatmaps, config, output_files['heatmaps'])
+            if 'heatmap_png' in config.files_to_write:
+                write_heatmap_pngs(raid_heatmaps, output_files['heatmaps'])
+
+    if not args.rerank and fight_stream is not None:
+        fight_stream.close()
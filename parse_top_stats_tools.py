@@ -17,6 +17,7 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import copy
 import os.path
 from os import listdir
 import importlib
@@ -25,63 +26,160 @@ import json
 from io_helper import myprint
 from stat_classes import *
 from json_helper import *
+from buff_catalog import load_buff_catalog, save_buff_catalog, apply_buff_catalog, update_buff_catalog
+from json_loader import get_json_decoder, open_log_file, read_log_files_ahead, get_fight_header, get_fight_fingerprint
+from fight_archive import is_fight_archive, read_fight_archive_header, load_fight_archive
+from ranking import StatRanking, get_stat_rankings
+from stats_store import StatsStore, StoredStatsPerFight, read_stats
+from position_analysis import get_fight_cohesion, compute_player_cohesion, compute_fight_heatmaps
+from boon_coverage import compute_fight_boon_coverage
+from target_damage import compute_fight_target_damage
+from timeline_index import get_timeline_stats, get_window_bounds, get_player_window_stats, compute_player_window_stats
+from bootstrap import compute_bootstrap
+from quantile_sketch import add_fight_to_sketches, compute_player_quantiles
+from skill_breakdown import compute_fight_skill_damage
+from fight_stream import write_fight_to_stream
+
+# get the ranks of the players in stat in one fight. Only players with a value that can be top are ranked.
+# Players with the same value share the same rank (e.g. 1, 2, 2, 4).
+# Input:
+# sortedList = list of (player_index, stat_value) of the players present in this fight, sorted by stat value in this fight
+# stat = stat that is considered
+# max_rank = highest rank that is returned (including double places)
+# Output:
+# list of (player_index, stat_value, rank), best first
+def get_ranks_in_fight(sortedList, stat, max_rank):
+    ranks = list()
+    valid_values = 0
+    rank = 0
+    last_val = None
+    for player_index, value in sortedList:
+        # only 0 deaths counts as top for a fight
+        if stat == 'deaths':
+            if value != 0:
+                continue
+        # for incoming strips, dmg taken, or downstate, anything >= 0 can be top
+        elif stat == 'stripped' or 'dmg_taken' in stat or stat == 'downstate':
+            if value < 0:
+                continue
+        # for all other stats, only values > 0 can be top
+        elif value <= 0:
+            continue
+
+        valid_values += 1
+        if value != last_val:
+            rank = valid_values
+            last_val = value
+        # check the whole list or until all ranks that are counted were found (including double places)
+        if rank > max_rank:
+            break
+        ranks.append((player_index, value, rank))
+    return ranks
+
+
 
 # For all players considered to be top in stat in this fight, increase
 # the number of fights they reached top by 1 (i.e. increase
-# consistency_stats[stat]).
+# consistency_stats[stat]). Also count the rank of all players up to
+# max_num_players_considered_top in their top_rank_histogram.
 # Input:
 # players = list of all players
-# sortedList = list of (player_index, stat_value) sorted by stat value in this fight
+# sortedList = list of (player_index, stat_value) of the players present in this fight, sorted by stat value in this fight
 # config = configuration to use
 # stat = stat that is considered
 # fight_number = index of the fight being considered
 def increase_top_x_reached(players, sortedList, config, stat, fight_number):
-    valid_values = 0
-    # for distance to tag: consider only players with values > 0 (distance 0 should only be com; distance < 0 is invalid)
-    i = 0
-    last_val = 0
-    # check the whole list or until the number of players considered to be "top" were found (including double places)
-    while i < len(sortedList) and (valid_values < config.num_players_considered_top[stat] or sortedList[i][1] == last_val):
-        # player wasn't present in this fight, ignore
-        if not players[sortedList[i][0]].stats_per_fight[fight_number]['present_in_fight']:
-            i += 1
-            continue
+    for player_index, _, rank in get_ranks_in_fight(sortedList, stat, config.max_num_players_considered_top):
+        players[player_index].top_rank_histogram[stat][rank - 1] += 1
+        if rank <= config.num_players_considered_top[stat]:
+            players[player_index].consistency_stats[stat] += 1
 
-        # only 0 deaths counts as top for a fight
-        if stat == 'deaths' and sortedList[i][1] == 0:
-            players[sortedList[i][0]].consistency_stats[stat] += 1
-            valid_values += 1
-            last_val = sortedList[i][1]
-        # for incoming strips, dmg taken, or downstate, anything >= 0 can be top
-        elif (stat == 'stripped' or 'dmg_taken' in stat or stat == 'downstate') and sortedList[i][1] >= 0:
-            players[sortedList[i][0]].consistency_stats[stat] += 1
-            valid_values += 1
-            last_val = sortedList[i][1]
-        # for all other stats, only values > 0 can be top
-        elif sortedList[i][1] > 0:
-            players[sortedList[i][0]].consistency_stats[stat] += 1
-            valid_values += 1
-            last_val = sortedList[i][1]
-        i += 1
-    return
+
+
+# get the top players of all stats in one fight
+# Input:
+# players = list of all players
+# fight_number = index of the fight being considered
+# config = configuration to use
+# Output:
+# dictionary of stat -> list of (player_index, stat_value, rank) of the players in the top num_players_considered_top[stat]
+def get_top_players_in_fight(players, fight_number, config):
+    stats_in_fight = get_stats_in_fight(players, fight_number)
+    return {stat: get_ranks_in_fight(sort_players_by_value_in_fight(players, stat, fight_number, (stat in config.squad_buff_abbrev.values()), stats_in_fight), stat, config.num_players_considered_top[stat])
+            for stat in config.stats_to_compute}
+
+
+
+# get how often a player reached the top num_top players in stat, computed from the rank histogram
+# Input:
+# player = the Player
+# stat = stat that is considered
+# num_top = how many players are considered to be "top"; at most max_num_players_considered_top
+# Output:
+# number of fights in which the player was in the top num_top players
+def get_times_top(player, stat, num_top):
+    return sum(player.top_rank_histogram[stat][:num_top])
 
 
 
-# sort the list of players by value in stat in fight fight_num
+# set consistency_stats and portion_top_stats of all players for the current num_players_considered_top from their rank histograms
+# Input:
+# players = list of all Players
+# config = the config used for top stats computation
+def apply_num_players_considered_top(players, config):
+    for player in players:
+        for stat in config.stats_to_compute:
+            player.consistency_stats[stat] = get_times_top(player, stat, config.num_players_considered_top[stat])
+            if player.num_fights_present[stat] == 0:
+                player.portion_top_stats[stat] = 0
+            else:
+                player.portion_top_stats[stat] = round(player.consistency_stats[stat]/player.num_fights_present[stat], 4)
+
+
+
+# get the number of times top of all players for all numbers of top players from 1 to max_num_players_considered_top
+# Input:
+# players = list of all Players
+# config = the config used for top stats computation
+# Output:
+# dictionary stat -> number of top players -> list of times top of each player, in the order of players
+def get_times_top_for_all_num_top(players, config):
+    times_top = {}
+    for stat in config.stats_to_compute:
+        times_top[stat] = {num_top: [get_times_top(player, stat, num_top) for player in players] for num_top in range(1, config.max_num_players_considered_top + 1)}
+    return times_top
+
+
+
+# get the stats of all players present in fight fight_num, so they are only read once for all stats
+# Input:
+# players = list of all Players
+# fight_num = number of the fight that is considered
+# Output:
+# list of (player index, stats of the player in fight fight_num) of all players present in this fight
+def get_stats_in_fight(players, fight_num):
+    return [(i, read_stats(player.stats_per_fight[fight_num])) for i, player in enumerate(players) if fight_num in player.stats_per_fight]
+
+
+
+# sort the players present in fight fight_num by value in stat in this fight
 # Input:
 # players = list of all Players
 # stat = stat that is considered
 # fight_num = number of the fight that is considered
 # is_squad_buff = stat is a squad buff
+# stats_in_fight = stats of the players in this fight as returned by get_stats_in_fight (optional)
 # Output:
-# list of (player index, stat value in fight fight_num), sorted by total stat value in fight fight_num
-def sort_players_by_value_in_fight(players, stat, fight_num, is_squad_buff):
+# list of (player index, stat value in fight fight_num) of all players present in this fight, sorted by total stat value in fight fight_num
+def sort_players_by_value_in_fight(players, stat, fight_num, is_squad_buff, stats_in_fight = None):
+    if stats_in_fight is None:
+        stats_in_fight = get_stats_in_fight(players, fight_num)
     # get list of (stat value, index)
     decorated = []
     if is_squad_buff:
-        decorated = [(player.stats_per_fight[fight_num][stat]['gen'], i) for i, player in enumerate(players)]
+        decorated = [(player_stats[stat]['gen'], i) for i, player_stats in stats_in_fight]
     else:
-        decorated = [(player.stats_per_fight[fight_num][stat], i) for i, player in enumerate(players)]
+        decorated = [(player_stats[stat], i) for i, player_stats in stats_in_fight]
     if stat == 'dist' or 'dmg_taken' in stat or stat == 'deaths' or stat == 'stripped' or stat == 'downstate':
         # for tag distance, dmg taken, deaths, stripped, and downstate, low numbers are good
         decorated.sort()
@@ -102,21 +200,7 @@ def sort_players_by_value_in_fight(players, stat, fight_num, is_squad_buff):
 # Output:
 # list of (player index, total stat value), sorted by total stat value
 def sort_players_by_total(players, stat, is_squad_buff):
-    # get list of (total stat, index)
-    decorated = []
-    if is_squad_buff:
-        decorated = [(player.total_stats[stat]['gen'], i) for i, player in enumerate(players)]
-    else:
-        decorated = [(player.total_stats[stat], i) for i, player in enumerate(players)]
-    if stat == 'dist' or 'dmg_taken' in stat or stat == 'deaths' or stat == 'stripped' or stat == 'downstate':
-        # for tag distance, dmg taken, deaths, and stripped, low numbers are good
-        decorated.sort()
-    else:
-        # for all other stats, high numbers are good
-        decorated.sort(reverse=True)
-    # extract list of (index, total stat)
-    sorted_by_total = [(i, total) for total, i in decorated]
-    return sorted_by_total
+    return StatRanking(players, stat, is_squad_buff).get_sorted(StatType.TOTAL)
 
 
 
@@ -126,18 +210,9 @@ def sort_players_by_total(players, stat, is_squad_buff):
 # stat = stat that is considered
 # is_squad_buff = stat is a squad buff
 # Output:
-# list of (player index, consistency stat value), sorted by consistency stat value (how often was top x reached)
+# list of (player index, consistency stat value), sorted by consistency stat value (how often was top x reached), then by total
 def sort_players_by_consistency(players, stat, is_squad_buff):
-    # get list of (times top, total stat, index), sort first by times top (high value = good) and then by total
-    decorated = []
-    if is_squad_buff:
-        decorated = [(player.consistency_stats[stat], player.total_stats[stat]['gen'], i) for i, player in enumerate(players)]
-    else:
-        decorated = [(player.consistency_stats[stat], player.total_stats[stat], i) for i, player in enumerate(players)]
-    decorated.sort(reverse=True)
-    # extract list of (index, times top)
-    sorted_by_consistency = [(i, consistency) for consistency, total, i in decorated]
-    return sorted_by_consistency
+    return StatRanking(players, stat, is_squad_buff).get_sorted(StatType.CONSISTENT)
 
 
 
@@ -147,18 +222,9 @@ def sort_players_by_consistency(players, stat, is_squad_buff):
 # stat = stat that is considered
 # is_squad_buff = stat is a squad buff
 # Output:
-# list of (player index, percentage stat value), sorted by percentage stat value (how often was top x reached / number of fights attended)
+# list of (player index, percentage stat value), sorted by percentage stat value (how often was top x reached / number of fights attended), then by times top and total
 def sort_players_by_percentage(players, stat, is_squad_buff):
-    # get list of (percentage times top, times top, total stat, index), sort first by percentage times top (high value = good), then by times top, and then by total
-    decorated = []
-    if is_squad_buff:
-        decorated = [(player.portion_top_stats[stat], player.consistency_stats[stat], player.total_stats[stat]['gen'], i) for i, player in enumerate(players)]
-    else:
-        decorated = [(player.portion_top_stats[stat], player.consistency_stats[stat], player.total_stats[stat], i) for i, player in enumerate(players)]
-    decorated.sort(reverse=True)
-    # extract list of (index, percentage times top)
-    sorted_by_percentage = [(i, percentage) for percentage, consistency, total, i in decorated]
-    return sorted_by_percentage
+    return StatRanking(players, stat, is_squad_buff).get_sorted(StatType.PERCENTAGE)
 
 
 
@@ -168,36 +234,47 @@ def sort_players_by_percentage(players, stat, is_squad_buff):
 # stat = stat that is considered
 # is_squad_buff = stat is a squad buff
 # Output:
-# list of (player index, average stat value), sorted by average stat value ( total stat value / duration of fights attended)
+# list of (player index, average stat value), sorted by average stat value ( total stat value / duration of fights attended), then by times top and total
 def sort_players_by_average(players, stat, is_squad_buff):
-    # get list of (average stat, times top, total stat, index), sort first by average stat, then by times top, and then by total
-    decorated = []
-    if is_squad_buff:
-        decorated = [(player.average_stats[stat], player.consistency_stats[stat], player.total_stats[stat]['gen'], i) for i, player in enumerate(players)]
-    else:
-        decorated = [(player.average_stats[stat], player.consistency_stats[stat], player.total_stats[stat], i) for i, player in enumerate(players)]
-    if stat == 'dist' or 'dmg_taken' in stat or stat == 'deaths' or stat == 'stripped' or stat == 'downstate':
-        # for dist, dmg taken, deaths, downstate, and stripped: low values good
-        decorated.sort()
-    else:
-        # for all other stats: high values good
-        decorated.sort(reverse=True)
-    # extract list of (index, average stat)
-    sorted_by_average = [(i, average) for average, consistency, total, i in decorated]
-    return sorted_by_average
+    return StatRanking(players, stat, is_squad_buff).get_sorted(StatType.AVERAGE)
 
 
 
 # replace all acount names with "Account <number>" and all player names with "Anon <number>"
 # Input:
+# players = list of Players
+# anonymous_names = anonymous names of all players as returned by get_anonymous_names; one account can map to several players since one player = <character name>_<profession>
+def anonymize_players(players, anonymous_names):
+    for player in players:
+        player.account, player.name = anonymous_names[(player.account, player.name, player.profession)]
+
+
+
+# get the anonymous names of all players. They are given by the index of each player in the list of all players read from the logs,
+# so a player has the same names in the outputs of all configs and in the stream of the fight results.
+# Input:
+# players = list of all Players as returned by collect_fight_data
+# Output:
+# dictionary of (account, character name, profession) -> (anonymous account name, anonymous character name)
+def get_anonymous_names(players):
+    anonymous_names = {}
+    for indices in get_account_index(players).values():
+        for i in indices:
+            anonymous_names[(players[i].account, players[i].name, players[i].profession)] = get_anonymous_player_names(i)
+    return anonymous_names
+
+
+
+# get the dictionary of account name -> list of player indices for a list of players
+# Input:
 # players = list of all Players
-# account_index = dictionary of account name -> list of player indices; one account can map to several players since one player = <character name>_<profession>
-def anonymize_players(players, account_index):
-    for account in account_index:
-        for i in account_index[account]:
-            players[i].account = "Account "+str(i)
-    for i,player in enumerate(players):
-        player.name = "Anon "+str(i)
+# Output:
+# dictionary of account name -> list of player indices
+def get_account_index(players):
+    account_index = {}
+    for i, player in enumerate(players):
+        account_index.setdefault(player.account, []).append(i)
+    return account_index
 
 
 
@@ -208,54 +285,48 @@ def anonymize_players(players, account_index):
 # config = the configuration being used to determine top players
 # stat = which stat are we considering
 # total_or_consistent_or_average = enum StatType, either StatType.TOTAL, StatType.CONSISTENT or StatType.AVERAGE, we are getting the players with top total values, top consistency values, or top average values.
+# ranking (optional) = StatRanking of stat for players, as returned by get_stat_rankings. Built if not given.
 # Output:
 # list of player indices getting a consistency / total / average award
-def get_top_players(players, config, stat, total_or_consistent_or_average):
+def get_top_players(players, config, stat, total_or_consistent_or_average, ranking = None):
+    if ranking is None:
+        ranking = StatRanking(players, stat, (stat in config.squad_buff_abbrev.values()))
     percentage = 0.
-    sorted_index = []
-    # get correct portion of total value and get sorted list of (player index, total/consistency/average stat) 
+    # get correct portion of total value
     if total_or_consistent_or_average == StatType.TOTAL:
         percentage = float(config.portion_of_top_for_total)
-        sorted_index = sort_players_by_total(players, stat, (stat in config.squad_buff_abbrev.values()))
     elif total_or_consistent_or_average == StatType.CONSISTENT:
         percentage = float(config.portion_of_top_for_consistent)
-        sorted_index = sort_players_by_consistency(players, stat, (stat in config.squad_buff_abbrev.values()))
     elif total_or_consistent_or_average == StatType.AVERAGE:
         percentage = 0.
-        sorted_index = sort_players_by_average(players, stat, (stat in config.squad_buff_abbrev.values()))
     else:
         print("ERROR: Called get_top_players for stats that are not total or consistent or average")
         return        
 
+    # sorted player indices and total/consistency/average values in this order
+    sorted_index = ranking.get_order(total_or_consistent_or_average).tolist()
+    sorted_values = ranking.get_values(total_or_consistent_or_average)[sorted_index].tolist()
+    sorted_totals = ranking.total[sorted_index].tolist()
+
     # using total value for overall top player to compare with
-    top_value = 0
-    if stat in config.squad_buff_abbrev.values():
-        top_value = players[sorted_index[0][0]].total_stats[stat]['gen']
-    else:
-        top_value = players[sorted_index[0][0]].total_stats[stat]
+    top_value = sorted_totals[0]
     top_players = list()
 
-    i = 0
+    # if stat isn't distance, dmg taken, deaths, stripped, or downstate, total value must be at least percentage % of top value
+    total_value_is_checked = not (ranking.low_values_are_good or ranking.is_squad_buff)
+
     last_value = 0
-    while i < len(sorted_index):
-        new_value = sorted_index[i][1] # value by which was sorted, i.e. total, consistency, or average
+    for i, player_index in enumerate(sorted_index):
+        new_value = sorted_values[i] # value by which was sorted, i.e. total, consistency, or average
         # index must be lower than number of output desired OR list entry has same value as previous entry, i.e. double place
         if i >= config.num_players_listed[stat] and new_value != last_value:
             break
         last_value = new_value
-        total_value = 0
-        if stat in config.squad_buff_abbrev.values():
-            total_value = players[sorted_index[i][0]].total_stats[stat]['gen']
-        else:
-            total_value = players[sorted_index[i][0]].total_stats[stat]
 
-        # if stat isn't distance, dmg taken, deaths, stripped, or downstate, total value must be at least percentage % of top value
-        if stat == "dist" or "dmg_taken" in stat or stat == "deaths" or stat == 'stripped' or stat == 'downstate' or stat in config.squad_buff_abbrev.values() or total_value >= top_value*percentage:
+        if not total_value_is_checked or sorted_totals[i] >= top_value*percentage:
             # consider minimum attendance percentage for average stats
-            if total_or_consistent_or_average != StatType.AVERAGE or (players[sorted_index[i][0]].attendance_percentage[stat] > config.min_attendance_percentage_for_average):
-                top_players.append(sorted_index[i][0])
-
-        i += 1
+            if total_or_consistent_or_average != StatType.AVERAGE or (ranking.attendance[player_index] > config.min_attendance_percentage_for_average):
+                top_players.append(player_index)
 
     return top_players
             
@@ -268,13 +339,16 @@ def get_top_players(players, config, stat, total_or_consistent_or_average):
 # num_used_fights = number of fights considered for computing top stats
 # top_consistent_players (optional) = list of top consistent player indices
 # top_total_players (optional) = list of top total player indices
-# top_percentage_players (optional) = list of top percentage player indices
-# top_late_players (optional) = list of player indices with late but great awards
+# ranking (optional) = StatRanking of stat for players, as returned by get_stat_rankings. Built if not given.
 # Output:
 # list of player indices getting a percentage award, value with which the percentage stat was compared
-def get_top_percentage_players(players, config, stat, num_used_fights, top_consistent_players = list(), top_total_players = list()):
-    sorted_index = sort_players_by_percentage(players, stat, (stat in config.squad_buff_abbrev.values()))
-    top_percentage = players[sorted_index[0][0]].portion_top_stats[stat]
+def get_top_percentage_players(players, config, stat, num_used_fights, top_consistent_players = list(), top_total_players = list(), ranking = None):
+    if ranking is None:
+        ranking = StatRanking(players, stat, (stat in config.squad_buff_abbrev.values()))
+    sorted_index = ranking.get_order(StatType.PERCENTAGE).tolist()
+    sorted_percentages = ranking.percentage[sorted_index].tolist()
+    num_fights_present = ranking.num_fights_present[sorted_index].tolist()
+    top_percentage = sorted_percentages[0]
 
     # get correct comparison value for top percentage and minimum attendance
     comparison_value = top_percentage * config.portion_of_top_for_percentage
@@ -283,9 +357,10 @@ def get_top_percentage_players(players, config, stat, num_used_fights, top_consi
     top_players = list()
 
     last_value = 0
-    for (ind, percent) in sorted_index:
+    for i, ind in enumerate(sorted_index):
+        percent = sorted_percentages[i]
         # player wasn't there for enough fights
-        if players[ind].num_fights_present[stat] < min_attendance:
+        if num_fights_present[i] < min_attendance:
             continue
         # index must be lower than number of output desired OR list entry has same value as previous entry, i.e. double place
         if len(top_players) >= config.num_players_listed[stat] and percent != last_value:
@@ -307,16 +382,16 @@ def get_top_percentage_players(players, config, stat, num_used_fights, top_consi
 # config = the config being used to compute top stats
 def compute_total_values(players, fights, config):
     for player in players:
-        for fight_number in range(len(fights)):
+        # only fights the player was present in are stored. Stats in a stats store are read once per player.
+        for fight_number, player_stats in read_stats(player.stats_per_fight).items():
             fight = fights[fight_number]
-            player_stats = player.stats_per_fight[fight_number]
             if player_stats['present_in_fight']:
                 # compute overall duration present (for all types) and the normalization factor of duration * allies
                 for stat in config.stats_to_compute:
                     player.duration_present[stat] += player_stats['duration_present'][stat]
-                    player.normalization_time_allies[stat] += (fight.allies - 1) * player.stats_per_fight[fight_number]['duration_present'][stat]
+                    player.normalization_time_allies[stat] += (fight.allies - 1) * player_stats['duration_present'][stat]
                     # increase number of fights the player was present
-                    if player.stats_per_fight[fight_number]['duration_present'][stat] > 0:
+                    if player_stats['duration_present'][stat] > 0:
                         player.num_fights_present[stat] += 1
 
                 # compute total values per player and per fight
@@ -361,14 +436,14 @@ def compute_total_values(players, fights, config):
                             player.total_stats[stat] = max(player.total_stats[stat], player_stats[stat])
                         elif stat in config.squad_buff_abbrev.values():
                             if player_stats[stat]['gen'] >= 0:
-                                fight.total_stats[stat] += player.stats_per_fight[fight_number][stat]['gen']
-                                player.total_stats[stat]['gen'] += player.stats_per_fight[fight_number][stat]['gen']
+                                fight.total_stats[stat] += player_stats[stat]['gen']
+                                player.total_stats[stat]['gen'] += player_stats[stat]['gen']
                             if player_stats[stat]['uptime'] >= 0:
-                                player.total_stats[stat]['uptime'] += player.stats_per_fight[fight_number][stat]['uptime']
+                                player.total_stats[stat]['uptime'] += player_stats[stat]['uptime']
                         else:
                             # all other stats
-                            fight.total_stats[stat] += player.stats_per_fight[fight_number][stat]
-                            player.total_stats[stat] += player.stats_per_fight[fight_number][stat]
+                            fight.total_stats[stat] += player_stats[stat]
+                            player.total_stats[stat] += player_stats[stat]
 
 
 
@@ -380,12 +455,19 @@ def compute_total_values(players, fights, config):
 # config = the config being used to compute top stats
 # TODO use only duration of fight where stat >= 0
 def compute_avg_values(players, fights, config): 
-    total_normalization_time_per_fight = list()
-    for fight_number in range(len(fights)):
-        total_normalization_time_per_fight.append({})
-        # sum_players (player_duration_present)
-        for stat in config.stats_to_compute:
-            total_normalization_time_per_fight[fight_number][stat] = sum([player.stats_per_fight[fight_number]['duration_present'][stat] for player in players])
+    # sum_players (player_duration_present)
+    total_normalization_time_per_fight = [{stat: 0 for stat in config.stats_to_compute} for fight in fights]
+    num_players_per_fight = [0 for fight in fights]
+    # sum_players (spike damage), for the average spike damage of each fight
+    spike_dmg_per_fight = [0 for fight in fights]
+    for player in players:
+        # stats in a stats store are read once per player
+        for fight_number, player_stats in read_stats(player.stats_per_fight).items():
+            num_players_per_fight[fight_number] += 1
+            for stat in config.stats_to_compute:
+                total_normalization_time_per_fight[fight_number][stat] += player_stats['duration_present'][stat]
+            if 'spike_dmg' in config.stats_to_compute:
+                spike_dmg_per_fight[fight_number] += player_stats['spike_dmg']
 
     total_normalization_time_allies_per_fight = list()
     for fight_number in range(len(fights)):
@@ -405,7 +487,9 @@ def compute_avg_values(players, fights, config):
 
             # TODO double check fight avg stats
             if stat == 'spike_dmg':
-                fight.avg_stats[stat] = sum(player.stats_per_fight[fight_number][stat] for player in players)/len(players)
+                # averaged over all players, the ones that weren't in the fight count with the empty stat value -1
+                num_players_not_present = len(players) - num_players_per_fight[fight_number]
+                fight.avg_stats[stat] = (spike_dmg_per_fight[fight_number] - num_players_not_present)/len(players)
             elif stat in config.squad_buff_abbrev.values() and stat in config.buffs_not_stacking:
                 # all not stacking buff averages are per time, and the % values are always relative to the total fight duration
                 fight.avg_stats[stat] /= total_normalization_time_per_fight[fight_number][stat]
@@ -424,6 +508,7 @@ def compute_avg_values(players, fights, config):
                 fight.avg_stats[stat] *= 100
 
     for player in players:
+        stats_per_fight = read_stats(player.stats_per_fight)
         # compute percentage top stats and attendance percentage for each player
         # round total and portion top stats
         for stat in config.stats_to_compute:
@@ -432,14 +517,14 @@ def compute_avg_values(players, fights, config):
             else:
                 player.portion_top_stats[stat] = round(player.consistency_stats[stat]/player.num_fights_present[stat], 4)
             if stat in config.squad_buff_abbrev.values():
-                player.attendance_percentage[stat] = round(sum(fight.duration for i,fight in enumerate(fights) if (player.stats_per_fight[i]['present_in_fight'] and player.stats_per_fight[i][stat]['gen'] >= 0)) / sum(fight.duration for fight in fights if fight.skipped == False) * 100)
+                player.attendance_percentage[stat] = round(sum(fights[i].duration for i,player_stats in stats_per_fight.items() if player_stats[stat]['gen'] >= 0) / sum(fight.duration for fight in fights if fight.skipped == False) * 100)
                 player.total_stats[stat]['gen'] = round(player.total_stats[stat]['gen'], 2)
                 player.total_stats[stat]['uptime'] = round(player.total_stats[stat]['uptime']/player.duration_present[stat] * 100, 2)
                 if player.total_stats[stat]['gen'] <= 0:
                     player.average_stats[stat] = player.total_stats[stat]['gen']
                     continue
             else:
-                player.attendance_percentage[stat] = round(sum(fight.duration for i,fight in enumerate(fights) if (player.stats_per_fight[i]['present_in_fight'] and player.stats_per_fight[i][stat] >= 0)) / sum(fight.duration for fight in fights if fight.skipped == False) * 100)
+                player.attendance_percentage[stat] = round(sum(fights[i].duration for i,player_stats in stats_per_fight.items() if player_stats[stat] >= 0) / sum(fight.duration for fight in fights if fight.skipped == False) * 100)
                 player.total_stats[stat] = round(player.total_stats[stat], 2)
                 if player.total_stats[stat] == 0:
                     player.average_stats[stat] = 0
@@ -447,18 +532,12 @@ def compute_avg_values(players, fights, config):
             
             # DON'T SWITCH DMG_TAKEN AND DMG OR HEAL_FROM_REGEN AND HEAL
             if stat == 'spike_dmg':
-                # find the fights that weren't skipped in which the player was present
-                fights_used_for_player = [fight for fight_number,fight in enumerate(fights) if fight.skipped == False and player.stats_per_fight[fight_number]['present_in_fight']]
-                if not fights_used_for_player:
+                # only fights that weren't skipped and in which the player was present are stored
+                if not stats_per_fight:
                     player.average_stats[stat] = 0
                 else:
-                    player.average_stats[stat] = 0
-                    # sum over all fights that weren't skipped and in which the player was present
-                    for fight_number,fight in enumerate(fights):
-                        if fight.skipped == False and player.stats_per_fight[fight_number]['present_in_fight']:
-                            player.average_stats[stat] += player.stats_per_fight[fight_number][stat]
                     # average over all fights in which he was present
-                    player.average_stats[stat] /= len(fights_used_for_player)
+                    player.average_stats[stat] = sum(player_stats[stat] for player_stats in stats_per_fight.values()) / len(stats_per_fight)
 
             elif stat == 'heal_from_regen':
                 if player.total_stats['hits_from_regen'] == 0:
@@ -477,7 +556,7 @@ def compute_avg_values(players, fights, config):
             elif stat in config.buffs_not_stacking:
                 player.average_stats[stat] = round(player.total_stats[stat]['gen']/player.duration_present[stat] * 100, 2)
             elif 'heal' in stat or 'barrier' in stat:
-                duration_healing_addon_present = sum([player.stats_per_fight[fight_number]['duration_present'][stat] for fight_number, fight in enumerate(fights) if (player.stats_per_fight[fight_number]['present_in_fight'] and player.stats_per_fight[fight_number][stat] >= 0)])
+                duration_healing_addon_present = sum([player_stats['duration_present'][stat] for player_stats in stats_per_fight.values() if player_stats[stat] >= 0])
                 if duration_healing_addon_present == 0:
                     player.average_stats[stat] = 0
                 else:
@@ -488,28 +567,80 @@ def compute_avg_values(players, fights, config):
 
 
 
-def get_stats_from_json_data(json_data, players, player_index, account_index, fights, config, found_all_buff_ids, found_healing, found_barrier, log, filename):
+# Add a fight to the list of fights, or replace the fight with the same number read from another log
+# Input:
+# fight = the Fight
+# fights = list of Fights, changed inplace
+# fight_number = number of the fight, len(fights) for a new fight
+def set_fight(fight, fights, fight_number):
+    if fight_number == len(fights):
+        fights.append(fight)
+    else:
+        fights[fight_number] = fight
+
+
+
+# Add a fight that is skipped in the top stats computation. No stats are computed or stored for it.
+# Input:
+# fight = the skipped Fight
+# fights = list of Fights
+# log = log file to write to
+# filename = name of the log file of this fight
+# fight_number = number of the fight, if it replaces a fight read from another log (optional)
+def add_skipped_fight(fight, fights, log, filename, fight_number = None):
+    set_fight(fight, fights, len(fights) if fight_number is None else fight_number)
+    log.write("skipped "+filename)
+
+
+
+# Read the stats of all players in one fight and add them to players and fights.
+# Input:
+# json_data = json object including one fight
+# players, player_index, account_index = list of Players, and their indices by name and profession and by account, changed inplace
+# fights = list of Fights, changed inplace
+# config = the config used for top stats computation
+# found_all_buff_ids, found_healing, found_barrier = what was found in the previous logs
+# log = log file to write to
+# filename = name of the log file of this fight
+# stats_store = StatsStore for the stats per fight of new players, or None to keep them in memory
+# fight_number = number of the fight, if it replaces a fight read from another log whose stats were removed (optional)
+# Output:
+# found_all_buff_ids, found_healing, found_barrier, updated with this fight
+def get_stats_from_json_data(json_data, players, player_index, account_index, fights, config, found_all_buff_ids, found_healing, found_barrier, log, filename, stats_store = None, fight_number = None):
     # get fight stats
     fight = get_stats_from_fight_json(json_data, config, log)
             
     if not found_all_buff_ids:
         found_all_buff_ids = get_buff_ids_from_json(json_data, config, log)
-                    
-    # add new entry for this fight in all players
-    for player in players:
-        player.stats_per_fight.append({key: value for key, value in config.empty_stats.items()})
-        player.stats_per_fight[-1]['duration_present'] = {key: value for key, value in config.empty_stats['duration_present'].items()}
 
-    fight_number = int(len(fights))
-        
     # don't compute anything for skipped fights
     if fight.skipped:
-        fights.append(fight)
-        log.write("skipped "+filename)            
+        add_skipped_fight(fight, fights, log, filename, fight_number)
         return found_all_buff_ids, found_healing, found_barrier
 
+    if fight_number is None:
+        fight_number = len(fights)
+
+    # the cohesion of each squad member is computed from the positions of all of them at once
+    cohesion_per_player = {}
+    if 'cohesion' in config.position_analyses:
+        cohesion_per_player = get_fight_cohesion(json_data['players'], fight, config)
+    if 'heatmaps' in config.position_analyses:
+        compute_fight_heatmaps(json_data, fight, config)
+    if config.boon_coverage_buffs:
+        compute_fight_boon_coverage(json_data['players'], fight, config)
+    target_damage_per_player = {}
+    if config.target_damage:
+        target_damage_per_player = compute_fight_target_damage(json_data, fight, config)
+    if config.time_windows:
+        window_bounds = get_window_bounds(json_data['players'], fight, config)
+        timeline_stats = get_timeline_stats(config)
+    skill_damage_per_player = {}
+    if config.skill_breakdown:
+        skill_damage_per_player = compute_fight_skill_damage(json_data, fight)
+
     # get stats for each player
-    for player_data in json_data['players']:
+    for player_json_index, player_data in enumerate(json_data['players']):
         build_swapped = False
         new_player_created = False
 
@@ -528,11 +659,9 @@ def get_stats_from_json_data(json_data, players, player_index, account_index, fi
             print("creating new player",name_and_prof)
             new_player = Player(account, name, profession)
             new_player.initialize(config)
+            if stats_store is not None:
+                new_player.stats_per_fight = StoredStatsPerFight(stats_store)
             player_index[name_and_prof] = len(players)
-            # fill up fights where the player wasn't there yet with empty stats
-            while len(new_player.stats_per_fight) <= fight_number:
-                new_player.stats_per_fight.append({key: value for key, value in config.empty_stats.items()})
-                new_player.stats_per_fight[-1]['duration_present'] = {key: value for key, value in config.empty_stats['duration_present'].items()}
             players.append(new_player)
             new_player_created = True
 
@@ -548,40 +677,61 @@ def get_stats_from_json_data(json_data, players, player_index, account_index, fi
             build_swapped = True
 
         player = players[player_index[name_and_prof]]
+        # new entry for this fight, only for players present in it. It is added to the player's stats per fight when it is complete.
+        player_stats = {key: value for key, value in config.empty_stats.items()}
+        player_stats['duration_present'] = {key: value for key, value in config.empty_stats['duration_present'].items()}
 
+        # only compute the duration types that are used for the averages of the stats to compute
+        needed_durations = get_config_extraction_plan(config).durations
         duration_present = {}
         duration_present['total'] = fight.duration
-        duration_present['active'] = get_stat_from_player_json(player_data, 'time_active', None, None, config)
-        duration_present['in_combat'] = get_stat_from_player_json(player_data, 'time_in_combat', None, None, config)
-        duration_present['not_running_back'] = get_stat_from_player_json(player_data, 'time_not_running_back', fight, None, config)
-        player.stats_per_fight[fight_number]['group'] = get_stat_from_player_json(player_data, 'group', fight, player.stats_per_fight[fight_number]['duration_present'], config)
-        player.stats_per_fight[fight_number]['present_in_fight'] = True
+        if 'active' in needed_durations:
+            duration_present['active'] = get_stat_from_player_json(player_data, 'time_active', None, None, config)
+        if 'in_combat' in needed_durations:
+            duration_present['in_combat'] = get_stat_from_player_json(player_data, 'time_in_combat', None, None, config)
+        if 'not_running_back' in needed_durations:
+            duration_present['not_running_back'] = get_stat_from_player_json(player_data, 'time_not_running_back', fight, None, config)
+        player_stats['group'] = get_stat_from_player_json(player_data, 'group', fight, player_stats['duration_present'], config)
+        player_stats['present_in_fight'] = True
 
         error_index = len(config.errors)
         # get all stats that are supposed to be computed from the player data
         for stat in config.stats_to_compute:
             # TODO add total stats per fight and avg stats per fight; add option to decide whether "top" should be determined by total or avg ?
-            player.stats_per_fight[fight_number][stat] = get_stat_from_player_json(player_data, stat, fight, duration_present, config)
-            if stat in config.squad_buff_abbrev.values() or player.stats_per_fight[fight_number][stat] >= 0:
+            player_stats[stat] = get_stat_from_player_json(player_data, stat, fight, duration_present, config)
+            if stat in config.squad_buff_abbrev.values() or player_stats[stat] >= 0:
                 # player is only considered to be "there" if his contribution to this stat could be read (i.e. is >= 0)
-                player.stats_per_fight[fight_number]['duration_present'][stat] = duration_present[config.duration_for_averages[stat]]
+                player_stats['duration_present'][stat] = duration_present[config.duration_for_averages[stat]]
             else:
-                player.stats_per_fight[fight_number]['duration_present'][stat] = 0
-            if 'heal' in stat and player.stats_per_fight[fight_number][stat] >= 0:
+                player_stats['duration_present'][stat] = 0
+            if 'heal' in stat and player_stats[stat] >= 0:
                 found_healing = True
-            elif stat == 'barrier' and player.stats_per_fight[fight_number][stat] >= 0:
+            elif stat == 'barrier' and player_stats[stat] >= 0:
                 found_barrier = True                    
             elif 'dmg_taken' in stat:
                 # TODO fix with using proper duration for avg; check the rest of the comp is right
                 # if player wasn't present, dmg taken doesn't count
                 #TODO for anything where total-players or total-absorbed is something else, use same duration type?
-                if player.stats_per_fight[fight_number]['duration_present'][stat] == 0:
-                    player.stats_per_fight[fight_number][stat] = -1
+                if player_stats['duration_present'][stat] == 0:
+                    player_stats[stat] = -1
                 else:
                     # dmg taken per fight should be sorted by avg, what else?
-                    player.stats_per_fight[fight_number][stat] = player.stats_per_fight[fight_number][stat]/player.stats_per_fight[fight_number]['duration_present'][stat]
-
+                    player_stats[stat] = player_stats[stat]/player_stats['duration_present'][stat]
+
+        player.stats_per_fight[fight_number] = player_stats
+        if config.stat_quantiles:
+            add_fight_to_sketches(player.quantile_sketches, player_stats, config)
+        if player_json_index in cohesion_per_player:
+            player.cohesion_per_fight[fight_number] = cohesion_per_player[player_json_index]
+        if player_json_index in target_damage_per_player:
+            player.target_damage_per_fight[fight_number] = target_damage_per_player[player_json_index]
+        if config.time_windows:
+            player.window_stats_per_fight[fight_number] = get_player_window_stats(player_data, fight, window_bounds, timeline_stats)
+        if player_json_index in skill_damage_per_player:
+            player.skill_damage_per_fight[fight_number] = skill_damage_per_player[player_json_index]
         player.swapped_build |= build_swapped
+        if player_data.get('guildID'):
+            player.guild = player_data['guildID']
 
         ################################
         ### print warning/debug logs ###
@@ -593,44 +743,146 @@ def get_stats_from_json_data(json_data, players, player_index, account_index, fi
             config.errors = list()
         
         myprint(log, name, "debug", config)
-        for stat in player.stats_per_fight[fight_number].keys():
-            myprint(log, stat+": "+str(player.stats_per_fight[fight_number][stat]), "debug", config)
+        for stat in player_stats.keys():
+            myprint(log, stat+": "+str(player_stats[stat]), "debug", config)
         myprint(log, "\n", "debug", config)
 
-    # create lists sorted according to stats
-    sortedStats = {key: list() for key in config.stats_to_compute}
-    for stat in config.stats_to_compute:
-        sortedStats[stat] = sort_players_by_value_in_fight(players, stat, fight_number, (stat in config.squad_buff_abbrev.values()))
-
-    #######################
-    ### print debug log ###
-    #######################
-    for stat in config.stats_to_compute:
-        myprint(log, "sorted "+stat+": ", "debug", config)
-        for entry in sortedStats[stat]:
-            print_string = "("+str(entry[0])+", "+str(entry[1])+")"
-            myprint(log, print_string, "debug", config)
-        
-    # increase number of times top x was achieved for top x players in each stat
-    for stat in config.stats_to_compute:
-        increase_top_x_reached(players, sortedStats[stat], config, stat, fight_number)
-        
-    fights.append(fight)
+    set_fight(fight, fights, fight_number)
 
     return found_all_buff_ids, found_healing, found_barrier
 
 
     
+# get the paths of all log files in the input directory, sorted by name
+# Input:
+# input_directory = directory containing the logs
+# Output:
+# list of (filename, file path)
+def get_log_files(input_directory):
+    log_files = list()
+    for filename in sorted(listdir(input_directory)):
+        # skip files of incorrect filetype
+        file_start, file_extension = os.path.splitext(filename)
+        if file_extension not in ['.json', '.gz', '.npz'] or "top_stats" in file_start:
+            continue
+        log_files.append((filename, "".join((input_directory,"/",filename))))
+    return log_files
+
+
+
+# check whether a log contains a fight that was already read from another log, e.g. if the same log was uploaded by several people.
+# Of each set of duplicates, the log with the most information (healing addon data, combat replay, size) is used.
+# If it is read after another log of the same fight, it replaces that one.
+# Input:
+# header = fight header as returned by get_fight_header or json_helper.get_fight_header_from_json, with the fields for the fingerprint
+# file_size = size of the log in bytes
+# filename = name of the log file
+# fight_number = number the fight of this log gets if it wasn't read before
+# fight_files = dictionary of fingerprint -> (information in the log, name of the log file, fight number) of all fights read so far, changed inplace
+# log = log file to write to
+# Output:
+# True if the fight was already read from a log with at least as much information and this log is skipped
+# number of the fight read from another log that is replaced by this log, or None
+def check_duplicate_log(header, file_size, filename, fight_number, fight_files, log):
+    fingerprint = get_fight_fingerprint(header)
+    information = (header['has_healing_extension'], header['has_combat_replay'], file_size)
+    if fingerprint not in fight_files:
+        fight_files[fingerprint] = (information, filename, fight_number)
+        return False, None
+    used_information, used_filename, used_fight_number = fight_files[fingerprint]
+    if information <= used_information:
+        myprint(log, filename+" contains the same fight as "+used_filename+". Skipping "+filename+".", "info")
+        return True, None
+    myprint(log, filename+" contains the same fight as "+used_filename+" with more information. Using "+filename+" instead of "+used_filename+".", "info")
+    fight_files[fingerprint] = (information, filename, used_fight_number)
+    return False, used_fight_number
+
+
+
+# get the number of the fight into which a log is read. Duplicate logs of fights read before are left out, unless they contain more information
+# (see check_duplicate_log). Then the stats read from the other log are removed and the fight is read again from this log with the same number.
+# Input:
+# header = fight header as returned by get_fight_header or json_helper.get_fight_header_from_json
+# file_size = size of the log in bytes
+# filename = name of the log file
+# players = list of Players, changed inplace
+# fights = list of Fights read so far
+# fight_files = see check_duplicate_log
+# config = the config used for reading the logs
+# log = log file to write to
+# Output:
+# fight number, or None if the log is skipped
+def get_fight_number_of_log(header, file_size, filename, players, fights, fight_files, config, log):
+    if not config.skip_duplicate_logs:
+        return len(fights)
+    skip_log, replaced_fight_number = check_duplicate_log(header, file_size, filename, len(fights), fight_files, log)
+    if skip_log:
+        return None
+    if replaced_fight_number is None:
+        return len(fights)
+    remove_fight_stats(players, replaced_fight_number, config)
+    return replaced_fight_number
+
+
+
+# remove everything read from the log of a fight from the players, so the fight can be read from another log
+# Input:
+# players = list of Players, changed inplace
+# fight_number = number of the fight
+# config = the config used for reading the logs
+def remove_fight_stats(players, fight_number, config):
+    for player in players:
+        if fight_number not in player.stats_per_fight:
+            continue
+        del player.stats_per_fight[fight_number]
+        for values_per_fight in [player.cohesion_per_fight, player.target_damage_per_fight, player.window_stats_per_fight, player.skill_damage_per_fight]:
+            values_per_fight.pop(fight_number, None)
+        if config.stat_quantiles:
+            # values can't be removed from the sketches, so they are built again from the remaining fights
+            player.quantile_sketches = {}
+            for player_stats in read_stats(player.stats_per_fight).values():
+                add_fight_to_sketches(player.quantile_sketches, player_stats, config)
+
+
+
 # Collect the top stats data.
 # Input:
 # args = cmd line arguments
 # config = configuration to use for top stats computation
 # log = log file to write to
+# anonymize = Create an anonymized version of the top stats. All account and character names will be replaced.
 # Output:
 # list of Players with their stats
 # list of all fights (also the skipped ones)
 # was healing found in the logs?
 def collect_stat_data(args, config, log, anonymize=False):
+    players, fights, found_healing, found_barrier = collect_fight_data(args, config, log)
+    if fights is None:
+        return None, None, None, None
+
+    get_overall_stats(players, fights, config, log)
+                
+    myprint(log, "\n", "info", config)
+
+    if anonymize:
+        anonymize_players(players, get_anonymous_names(players))
+    
+    return players, fights, found_healing, found_barrier
+
+
+
+# Read the stats of all players in all fights from the logs, without computing overall stats.
+# Input:
+# args = cmd line arguments
+# config = configuration to use for reading the logs
+# log = log file to write to
+# fight_stream = file to which the results of each fight are written as soon as it is processed (optional, see fight_stream.py)
+# Output:
+# list of Players with their stats per fight
+# list of all fights (also the skipped ones)
+# was healing found in the logs?
+# was barrier found in the logs?
+def collect_fight_data(args, config, log, fight_stream = None):
     # healing only in logs if addon was installed
     found_healing = False # Todo what if some logs have healing and some don't
     found_barrier = False    
@@ -640,55 +892,276 @@ def collect_stat_data(args, config, log, anonymize=False):
     account_index = {}  # dictionary that matches each account name to a list of its indices in players list
 
     fights = []
-    found_all_buff_ids = False
+    # buff ids found in earlier runs don't have to be read from the logs again
+    buff_catalog = load_buff_catalog(config, log)
+    apply_buff_catalog(buff_catalog, config)
+    found_all_buff_ids = found_all_needed_buff_ids(config)
+
+    json_decoder, decode = get_json_decoder(getattr(args, 'json_decoder', None))
+    myprint(log, "Using json decoder "+json_decoder, "info")
+
+    # in low memory mode, the stats per fight are written to a temporary file as soon as a player's stats in a fight are complete
+    stats_store = None
+    if getattr(args, 'low_memory', False) or config.low_memory:
+        myprint(log, "Keeping the stats per fight in a temporary file", "info")
+        stats_store = StatsStore(config)
     
-    # iterating over all fights in directory
-    files = listdir(args.input_directory)
-    sorted_files = sorted(files)
-    for filename in sorted_files:
-        # skip files of incorrect filetype
-        file_start, file_extension = os.path.splitext(filename)
-        if file_extension not in ['.json', '.gz'] or "top_stats" in file_start:
-            continue
+    log_files = get_log_files(args.input_directory)
+    fight_files = {}    # fingerprint -> (information in the log, name of the log file, fight number) of each fight read so far, for skipping duplicate logs
 
+    # iterating over all fights in directory. The next logs are read while the current one is processed.
+    for filename, file_path, prefetched_data in read_log_files_ahead(log_files, config.read_ahead_megabytes * 1000000):
         print_string = "parsing "+filename
         print(print_string)
-        file_path = "".join((args.input_directory,"/",filename))
 
-        # load file
-        if file_extension == '.gz':
-            with gzip.open(file_path, mode="r") as f:
-                json_data = json.loads(f.read().decode('utf-8'))
+        fight_number = len(fights)
+        if is_fight_archive(file_path):
+            header = read_fight_archive_header(file_path)
+            fight_number = get_fight_number_of_log(header, header['file_size'], filename, players, fights, fight_files, config, log)
+            if fight_number is None:
+                continue
+            fight = get_fight_from_header(header, config, log)
+            if fight.skipped:
+                add_skipped_fight(fight, fights, log, filename, fight_number)
+                if fight_stream is not None:
+                    write_fight_to_stream(fight_stream, fight_number, fight, players, {}, config)
+                continue
+            # only the player entries needed for the stats to compute are read from the archive
+            json_data = load_fight_archive(file_path, get_config_extraction_plan(config).player_json_fields)
         else:
-            json_datafile = open(file_path, encoding='utf-8')
-            json_data = json.load(json_datafile)
-
-        found_all_buff_ids, found_healing, found_barrier = get_stats_from_json_data(json_data, players, player_index, account_index, fights, config, found_all_buff_ids, found_healing, found_barrier, log, filename)
+            with open_log_file(file_path, prefetched_data) as data:
+                # check whether the fight is a duplicate or skipped before decoding the whole file
+                header = get_fight_header(data, config.skip_duplicate_logs)
+                json_data = None
+                if header is None and config.skip_duplicate_logs:
+                    json_data = decode(data)
+                    header = get_fight_header_from_json(json_data)
+                if header is not None:
+                    fight_number = get_fight_number_of_log(header, len(data), filename, players, fights, fight_files, config, log)
+                    if fight_number is None:
+                        continue
+                    fight = get_fight_from_header(header, config, log)
+                    if fight.skipped:
+                        add_skipped_fight(fight, fights, log, filename, fight_number)
+                        if fight_stream is not None:
+                            write_fight_to_stream(fight_stream, fight_number, fight, players, {}, config)
+                        continue
+                if json_data is None:
+                    json_data = decode(data)
+
+        found_all_buff_ids, found_healing, found_barrier = get_stats_from_json_data(json_data, players, player_index, account_index, fights, config, found_all_buff_ids, found_healing, found_barrier, log, filename, stats_store, fight_number)
+        if fight_stream is not None:
+            top_players = {} if fights[fight_number].skipped else get_top_players_in_fight(players, fight_number, config)
+            write_fight_to_stream(fight_stream, fight_number, fights[fight_number], players, top_players, config, getattr(args, 'anonymize', False) or config.anonymize)
+
+    if update_buff_catalog(buff_catalog, config):
+        save_buff_catalog(buff_catalog, config, log)
 
     if (not fights) or all(fight.skipped for fight in fights):
         # list of fights is empty or all were skipped -> no valid fights were found
         myprint(log, "\n No valid fights were found in "+args.input_directory, "info")
         return None, None, None, None
 
-    get_overall_stats(players, fights, config)
-                
-    myprint(log, "\n", "info", config)
-
-    if anonymize:
-        anonymize_players(players, account_index)
-    
     return players, fights, found_healing, found_barrier
 
 
 
-# compute total and average stats for each player
+# Get the players and fights for computing top stats with config from the stats read with another config (see stat_classes.fill_extraction_config).
+# Fights are additionally skipped if they don't fulfill the requirements of config. The stats per fight are shared, not copied.
+# Input:
+# players = list of Players as returned by collect_fight_data
+# fights = list of Fights as returned by collect_fight_data
+# config = the config used for top stats computation
+# log = log file to write to
+# Output:
+# list of Players that were present in at least one fight that isn't skipped, without overall stats
+# list of all fights (also the skipped ones)
+def get_profile_data(players, fights, config, log):
+    profile_fights = list()
+    for fight_number, fight in enumerate(fights):
+        profile_fight = copy.copy(fight)
+        profile_fight.total_stats = {key: 0 for key in config.stats_to_compute}
+        profile_fight.avg_stats = {key: 0 for key in config.stats_to_compute}
+        if 'cohesion' not in config.position_analyses:
+            profile_fight.cohesion = {}
+        if 'heatmaps' not in config.position_analyses:
+            profile_fight.heatmaps = {}
+        profile_fight.boon_coverage = {buff: coverage for buff, coverage in fight.boon_coverage.items() if buff in config.boon_coverage_buffs}
+        if not config.target_damage:
+            profile_fight.target_damage = {}
+        if not config.skill_breakdown:
+            profile_fight.skill_names = {}
+        if not profile_fight.skipped:
+            check_fight_requirements(profile_fight, config, log)
+            if profile_fight.skipped:
+                # only keep the fight information that is kept for fights skipped while reading the logs
+                profile_fight = Fight(skipped = True, duration = fight.duration, enemies = fight.enemies, allies = fight.allies, kills = fight.kills,
+                                      start_time = fight.start_time, end_time = fight.end_time,
+                                      total_stats = profile_fight.total_stats, avg_stats = profile_fight.avg_stats)
+        profile_fights.append(profile_fight)
+
+    profile_players = list()
+    for player in players:
+        # stats in a stats store stay there and are shared with the other configs
+        stats_per_fight = StoredStatsPerFight(player.stats_per_fight.store) if isinstance(player.stats_per_fight, StoredStatsPerFight) else dict()
+        stats_per_fight.update((fight_number, player_stats) for fight_number, player_stats in player.stats_per_fight.items() if not profile_fights[fight_number].skipped)
+        if not stats_per_fight:
+            continue
+        profile_player = Player(player.account, player.name, player.profession)
+        profile_player.initialize(config)
+        profile_player.stats_per_fight = stats_per_fight
+        profile_player.guild = player.guild
+        if 'cohesion' in config.position_analyses:
+            profile_player.cohesion_per_fight = {fight_number: cohesion for fight_number, cohesion in player.cohesion_per_fight.items() if fight_number in stats_per_fight}
+        if config.target_damage:
+            profile_player.target_damage_per_fight = {fight_number: damage for fight_number, damage in player.target_damage_per_fight.items() if fight_number in stats_per_fight}
+        if config.time_windows:
+            profile_player.window_stats_per_fight = {fight_number: {name: {stat: value for stat, value in window_stats[name].items() if stat in config.stats_to_compute}
+                                                                    for name in config.time_windows if name in window_stats}
+                                                     for fight_number, window_stats in player.window_stats_per_fight.items() if fight_number in stats_per_fight}
+        if config.skill_breakdown:
+            profile_player.skill_damage_per_fight = {fight_number: skill_damage for fight_number, skill_damage in player.skill_damage_per_fight.items() if fight_number in stats_per_fight}
+        if config.stat_quantiles:
+            if len(stats_per_fight) == len(player.stats_per_fight) and all(sketch.accuracy == config.quantile_sketch_accuracy for sketch in player.quantile_sketches.values()):
+                profile_player.quantile_sketches = {stat: sketch for stat, sketch in player.quantile_sketches.items() if stat in config.stats_to_compute}
+            else:
+                # fights were left out for this config, so the sketches have to be built again
+                for player_stats in read_stats(stats_per_fight).values():
+                    add_fight_to_sketches(profile_player.quantile_sketches, player_stats, config)
+        profile_players.append(profile_player)
+
+    # players with several characters or specializations in the remaining fights swapped build
+    for indices in get_account_index(profile_players).values():
+        if len(indices) > 1:
+            for i in indices:
+                profile_players[i].swapped_build = True
+
+    return profile_players, profile_fights
+
+
+
+# get the output file name for one of several configs
+# Input:
+# filename = output file name given for all configs
+# config_name = name of the config
+# Output:
+# filename with the config name appended
+def get_profile_output_filename(filename, config_name):
+    file_start, file_extension = os.path.splitext(filename)
+    return file_start+"_"+config_name+file_extension
+
+
+
+# Collect only the fight overview from the fight headers, without computing any player stats.
+# Input:
+# args = cmd line arguments
+# config = configuration to use for deciding which fights are skipped
+# log = log file to write to
+# Output:
+# list of all fights (also the skipped ones)
+def collect_fight_overview(args, config, log):
+    json_decoder, decode = get_json_decoder(getattr(args, 'json_decoder', None))
+    fights = []
+    fight_files = {}    # fingerprint -> (information in the log, name of the log file, fight number) of each fight read so far, for skipping duplicate logs
+    for filename, file_path in get_log_files(args.input_directory):
+        print("reading header of "+filename)
+        if is_fight_archive(file_path):
+            header = read_fight_archive_header(file_path)
+            file_size = header['file_size']
+        else:
+            with open_log_file(file_path) as data:
+                header = get_fight_header(data, config.skip_duplicate_logs)
+                if header is None:
+                    header = get_fight_header_from_json(decode(data))
+                file_size = len(data)
+        # there are no player stats to remove if a log replaces another one
+        fight_number = get_fight_number_of_log(header, file_size, filename, [], fights, fight_files, config, log)
+        if fight_number is None:
+            continue
+        fight = get_fight_from_header(header, config, log)
+        if fight.skipped:
+            log.write("skipped "+filename)
+        set_fight(fight, fights, fight_number)
+    return fights
+
+
+
+# get the players with top stats for all stats to compute
+# Input:
+# players = list of Players
+# config = the config used for top stats computation
+# num_used_fights = number of fights that weren't skipped
+# found_healing = was healing found in the logs?
+# found_barrier = was barrier found in the logs?
+# rankings (optional) = dictionary stat -> StatRanking as returned by get_stat_rankings. Built if not given.
+# Output:
+# dictionaries stat -> list of player indices with top total, average, consistent and percentage values, and dictionary stat -> comparison value for percentage awards
+def get_top_stat_players(players, config, num_used_fights, found_healing, found_barrier, rankings = None):
+    if rankings is None:
+        rankings = get_stat_rankings(players, config)
+    top_total_stat_players = {key: list() for key in config.stats_to_compute}
+    top_average_stat_players = {key: list() for key in config.stats_to_compute}
+    top_consistent_stat_players = {key: list() for key in config.stats_to_compute}
+    top_percentage_stat_players = {key: list() for key in config.stats_to_compute}
+    percentage_comparison_val = {key: 0 for key in config.stats_to_compute}
+
+    for stat in config.stats_to_compute:
+        if (stat == 'heal' and not found_healing) or (stat == 'barrier' and not found_barrier):
+            continue
+
+        top_consistent_stat_players[stat] = get_top_players(players, config, stat, StatType.CONSISTENT, rankings[stat])
+        top_total_stat_players[stat] = get_top_players(players, config, stat, StatType.TOTAL, rankings[stat])
+        top_average_stat_players[stat] = get_top_players(players, config, stat, StatType.AVERAGE, rankings[stat])
+        top_percentage_stat_players[stat],percentage_comparison_val[stat] = get_top_percentage_players(players, config, stat, num_used_fights, top_consistent_stat_players[stat], ranking = rankings[stat])
+
+    return top_total_stat_players, top_average_stat_players, top_consistent_stat_players, top_percentage_stat_players, percentage_comparison_val
+
+
+
+# for all fights and stats, rank the players present in the fight and increase the number of times top x was achieved for the top x players
+# Input:
+# players = list of Players
+# fights = list of Fights
+# config = config used in the stats computation
+# log = log file to write to
+def compute_top_x_reached(players, fights, config, log):
+    for fight_number, fight in enumerate(fights):
+        if fight.skipped:
+            continue
+        stats_in_fight = get_stats_in_fight(players, fight_number)
+        for stat in config.stats_to_compute:
+            sorted_players = sort_players_by_value_in_fight(players, stat, fight_number, (stat in config.squad_buff_abbrev.values()), stats_in_fight)
+
+            #######################
+            ### print debug log ###
+            #######################
+            myprint(log, "sorted "+stat+" in fight "+str(fight_number)+": ", "debug", config)
+            for entry in sorted_players:
+                print_string = "("+str(entry[0])+", "+str(entry[1])+")"
+                myprint(log, print_string, "debug", config)
+
+            increase_top_x_reached(players, sorted_players, config, stat, fight_number)
+
+
+
+# compute times top, total and average stats for each player
 # Input:
 # players = list of Players
 # fights = list of Fights
 # config = config used in the stats computation
-def get_overall_stats(players, fights, config):
+# log = log file to write to
+def get_overall_stats(players, fights, config, log):
+    compute_top_x_reached(players, fights, config, log)
     compute_total_values(players, fights, config)
     compute_avg_values(players, fights, config)
+    if 'cohesion' in config.position_analyses:
+        compute_player_cohesion(players)
+    if config.time_windows:
+        compute_player_window_stats(players)
+    if config.bootstrap_draws > 0:
+        compute_bootstrap(players, fights, config)
+    if config.stat_quantiles:
+        compute_player_quantiles(players, config)
 
 
 
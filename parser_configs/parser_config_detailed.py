@@ -53,6 +53,9 @@ num_players_considered_top_default = 5
 num_players_considered_top = {'strips': 3, 'stab': 3, 'prot': 3, 'aegis': 3, 'resist': 3, 'regen': 3, 'heal_from_regen': 3,
                               'hits_from_regen': 3, 'might': 3, 'fury': 3, 'quick': 3, 'alac': 3, 'speed': 3, 'cleanses': 3,
                               'heal': 3, 'barrier': 3, 'deaths': 1}
+# For each stat, it is stored how often each player reached rank 1, 2, ..., max_num_players_considered_top in a fight.
+# The number of times top and percentage top can then be given for any number of top players up to this value, and num_players_considered_top can be changed with --rerank.
+max_num_players_considered_top = 10
 
 relevant_classes_for_stat = {
     'dmg_total': [],
@@ -149,10 +152,88 @@ min_allied_players = 10
 min_fight_duration = 30
 # minimum number of enemies to consider a fight in the stats
 min_enemy_players = 10
+# only use one log of each fight if the same fight is found in several logs (e.g. uploaded by several people, or the same log was copied twice)
+# the log with the most information (healing addon data, combat replay, size) is used
+skip_duplicate_logs = True
 
-# choose which files to write as results and whether to write results to console. Options are 'console', 'txt', 'xls' and 'json'.
+# file in which the ids and stacking types of buffs found in the logs are stored, so they don't have to be looked up again in later runs.
+# relative paths are relative to the user cache directory (%LOCALAPPDATA%\arcdps_top_stats_parser on Windows, ~/.cache/arcdps_top_stats_parser elsewhere).
+# Delete the file if buff ids changed with a game update.
+buff_catalog_file = "buff_catalog.json"
+
+# choose which files to write as results and whether to write results to console. Options are 'console', 'txt', 'xls', 'json', 'snapshot', 'heatmaps', 'heatmap_png' and 'ndjson'.
+# 'snapshot' stores the computed stats, so the top stats can be recomputed with --rerank after changing the settings above without parsing the logs again.
+# 'heatmaps' writes the heatmaps of each fight and each map to a .npz file next to the json output, 'heatmap_png' additionally writes an image of the squad positions on each map.
+# Both need 'heatmaps' in position_analyses.
+# 'ndjson' writes one json line with the results of each fight as soon as it is processed, and one line with the stats over all fights at the end,
+# to a file ending in _fights.ndjson next to the json output. It can be read while the logs are parsed, e.g. by an overlay or bot.
 files_to_write = ['xls', 'json']
 
+# replace all account and character names in the output. Same as running with -a.
+anonymize = False
+
+# keep the stats per fight of all players in a temporary file instead of in memory. Use this if the computer runs out of memory for a large number of logs.
+# Slower, and no snapshot is written. Same as running with --low_memory.
+low_memory = False
+
+# how many MB of log files are read from disk in the background while earlier logs are processed. Set to 0 to read each log only when it is processed.
+read_ahead_megabytes = 200
+
+# analyses of the positions of all squad members. Options are:
+# 'cohesion': how closely the squad stays together in each fight, and how far away from the squad center each player is and how long they are outside the blob
+# 'heatmaps': how often squad members were at each place, and where they went down and died, per fight and per map
+position_analyses = []
+# squad members farther away from the squad center than this are outside the blob. Same unit as the distance to tag.
+blob_radius = 600
+# side length of the cells in which positions are counted for the heatmaps. Same unit as the distance to tag.
+heatmap_cell_size = 100
+
+# squad buffs (by their abbreviations, e.g. 'stab' for Stability) for which the percentage of the squad having them is computed for every second of each fight,
+# e.g. ['stab', 'prot', 'aegis', 'resist'] to see when stability dropped off the squad. Leave empty to skip this.
+boon_coverage_buffs = []
+# a boon doesn't cover the squad in a second if less than this percentage of the squad has it. The time below this is reported for each fight.
+boon_coverage_threshold = 50
+
+# compute how much damage each squad member did to each enemy target, how much damage the squad did to each target in each second,
+# and the windows in which the squad focused one target. Written to the sections 'damage_matrices' and 'focus_fire' of the json output.
+target_damage = False
+# length in s of the windows in which focus fire and the highest burst on each target are searched
+focus_fire_window = 5
+# a window counts as focus fire if one target took at least this percentage of the squad damage in it
+focus_fire_share = 50
+
+# time windows in which the damage, healing and barrier stats are computed additionally. They are shown as extra columns in the xls sheets of these stats.
+# Each window is given as window_name: (start, end) with times in s from the start of the fight. Instead of a time, 'tag_death' can be used for the time the commander died,
+# and None for the end of the fight. The stats of each window are summed over all fights.
+time_windows = {}
+#time_windows['first_30s'] = (0, 30)
+#time_windows['until_tag_death'] = (0, 'tag_death')
+
+# compute which skills did the damage of each account and profession, with their hits and crits, from the damage distribution in the logs.
+# Written to the section 'skill_breakdown' of the json output. Takes longer and more memory, since the damage distribution is the largest part of the logs.
+skill_breakdown = False
+# number of skills with the most damage that are written for each account and profession
+skill_breakdown_top = 10
+
+# estimate how stable the totals, averages and ranks are by resampling the fights with replacement this many times (e.g. 1000). 0 = don't.
+# For each player and stat, the confidence intervals of total, average and rank and the probability of each listed rank are written to 'bootstrap' of the players in the json output.
+bootstrap_draws = 0
+# confidence level in percent of the intervals
+bootstrap_confidence = 90
+# seed for resampling the fights, so the same logs always give the same intervals
+bootstrap_seed = 0
+
+# percentiles of the values of each player per fight, normalized like the averages (e.g. per s), that are computed for each stat, e.g. [10, 50, 90]. Leave empty to skip this.
+# They show whether a player was consistently good or had one huge fight, and are written as extra columns to the xls sheets and to 'quantiles' of the players in the json output.
+stat_quantiles = []
+# the percentiles are kept in sketches of constant size while reading the logs. Their maximum relative error is given here.
+quantile_sketch_accuracy = 0.01
+
+# compute total and average stats for groups of players, in the same way as for single players. Each key gets its own xls sheet and its own part of 'group_stats' in the json output.
+# Possible keys: 'account' (all characters of an account), 'profession', 'group' (subgroup of the squad in each fight), 'guild' (guild id the players represented).
+# e.g. ['account', 'profession', 'group']. Leave empty to skip this.
+group_by = []
+
 # names as which each specialization will show up in the stats
 profession_abbreviations = {}
 profession_abbreviations["Guardian"] = "Guardian"
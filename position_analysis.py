@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+#    position_analysis.py contains analyses of the positions of all squad members as recorded in the combat replay.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import re
+import struct
+import zlib
+
+import numpy as np
+
+# analyses that can be chosen in position_analyses in the config
+position_analysis_names = ['cohesion', 'heatmaps']
+
+# kinds of positions that are counted in the heatmaps
+heatmap_kinds = ['positions', 'downs', 'deaths']
+
+
+
+# get the positions of all squad members in one array. Positions are aligned by time, using the start of each player's position data.
+# Input:
+# players_json = the 'players' list of a log
+# polling_rate = time between two positions in ms
+# Output:
+# indices of the squad members in players_json
+# numpy array of shape (number of squad members, number of samples, 2) with the positions in pixels, NaN where a player has no position or is dead
+def get_squad_positions(players_json, polling_rate):
+    squad_indices = list()
+    player_positions = list()
+    for i, player_json in enumerate(players_json):
+        if player_json['notInSquad'] or not player_json.get('combatReplayData', {}).get('positions'):
+            continue
+        squad_indices.append(i)
+        replay_data = player_json['combatReplayData']
+        first_sample = int(round(replay_data.get('start', 0) / polling_rate))
+        player_positions.append((first_sample, np.asarray(replay_data['positions'], dtype = float)))
+
+    num_samples = max((first_sample + len(positions) for first_sample, positions in player_positions), default = 0)
+    squad_positions = np.full((len(player_positions), num_samples, 2), np.nan)
+    for row, (first_sample, positions) in enumerate(player_positions):
+        squad_positions[row, first_sample:first_sample + len(positions)] = positions
+        # dead players don't move, they are not part of the squad until they are alive again
+        for death_start, death_end in players_json[squad_indices[row]]['combatReplayData'].get('dead', []):
+            squad_positions[row, int(np.ceil(death_start / polling_rate)):int(np.ceil(death_end / polling_rate))] = np.nan
+    return squad_indices, squad_positions
+
+
+
+# get a percentile of each column of an array with NaN for missing values, as np.nanpercentile(values, percentile, axis = 0),
+# but sorting all columns at once instead of one after the other
+# Input:
+# values = 2d numpy array, every column has at least one value that isn't NaN
+# percentile = percentile to compute, between 0 and 100
+# Output:
+# numpy array with the percentile of each column
+def get_column_percentile(values, percentile):
+    num_values = (~np.isnan(values)).sum(axis = 0)
+    # NaN are sorted to the end of each column
+    sorted_values = np.sort(values, axis = 0)
+    position = percentile / 100 * (num_values - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, num_values - 1)
+    lower_values = np.take_along_axis(sorted_values, lower[np.newaxis, :], axis = 0)[0]
+    upper_values = np.take_along_axis(sorted_values, upper[np.newaxis, :], axis = 0)[0]
+    return lower_values + (position - lower) * (upper_values - lower_values)
+
+
+
+# compute how closely the squad stays together in one fight. For each sample, the squad center is the mean position of all living squad members with positions.
+# Only samples with at least two such squad members are used.
+# Input:
+# squad_positions = array of positions as returned by get_squad_positions
+# polling_rate = time between two positions in ms
+# inch_to_pixel = conversion factor of positions to distances, as for the distance to tag
+# blob_radius = players farther away from the squad center are outside the blob
+# Output:
+# dictionary with the spread of the squad in this fight:
+#   'spread' = average over all samples of the mean distance of the squad members to the squad center
+#   'spread_p90' = average over all samples of the 90th percentile of the distances to the squad center
+#   'percentage_in_blob' = percentage of the time of all squad members that they were in the blob
+# list with one dictionary per row of squad_positions:
+#   'dist_to_center' = average distance to the squad center
+#   'time_outside_blob' = time in s the player was farther away from the squad center than blob_radius
+#   'time_with_positions' = time in s for which the distance to the squad center is known
+def get_squad_cohesion(squad_positions, polling_rate, inch_to_pixel, blob_radius):
+    valid = ~np.isnan(squad_positions[:, :, 0])
+    # only samples with at least two living squad members have a meaningful squad center
+    valid &= valid.sum(axis = 0) >= 2
+    num_valid = valid.sum(axis = 0)
+    used_samples = num_valid > 0
+    valid = valid[:, used_samples]
+    num_valid = num_valid[used_samples]
+    positions = np.where(valid[:, :, np.newaxis], squad_positions[:, used_samples], 0.)
+
+    center = positions.sum(axis = 0) / np.maximum(num_valid, 1)[:, np.newaxis]
+    distances = np.hypot(positions[:, :, 0] - center[:, 0], positions[:, :, 1] - center[:, 1]) / inch_to_pixel
+    distances[~valid] = np.nan
+    outside_blob = valid & (distances > blob_radius)
+
+    fight_cohesion = {'spread': 0., 'spread_p90': 0., 'percentage_in_blob': 0.}
+    if num_valid.size > 0:
+        fight_cohesion['spread'] = round(float(np.mean(np.nanmean(distances, axis = 0))), 2)
+        fight_cohesion['spread_p90'] = round(float(np.mean(get_column_percentile(distances, 90))), 2)
+        fight_cohesion['percentage_in_blob'] = round(float(100 * (1 - outside_blob.sum() / valid.sum())), 2)
+
+    seconds_per_sample = polling_rate / 1000
+    num_valid_per_player = valid.sum(axis = 1)
+    distance_sum_per_player = np.where(valid, distances, 0.).sum(axis = 1)
+    player_cohesion = list()
+    for num_samples, distance_sum, num_outside in zip(num_valid_per_player.tolist(), distance_sum_per_player.tolist(), outside_blob.sum(axis = 1).tolist()):
+        player_cohesion.append({'dist_to_center': round(distance_sum / num_samples, 2) if num_samples > 0 else -1,
+                                'time_outside_blob': round(num_outside * seconds_per_sample, 2),
+                                'time_with_positions': round(num_samples * seconds_per_sample, 2)})
+    return fight_cohesion, player_cohesion
+
+
+
+# compute the cohesion of the squad in one fight
+# Input:
+# players_json = the 'players' list of a log
+# fight = the Fight, with polling_rate and inch_to_pixel read from the log. fight.cohesion is set.
+# config = the config used for top stats computation
+# Output:
+# dictionary of index in players_json -> cohesion of this player as returned by get_squad_cohesion
+def get_fight_cohesion(players_json, fight, config):
+    squad_indices, squad_positions = get_squad_positions(players_json, fight.polling_rate)
+    fight.cohesion, player_cohesion = get_squad_cohesion(squad_positions, fight.polling_rate, fight.inch_to_pixel, config.blob_radius)
+    return dict(zip(squad_indices, player_cohesion))
+
+
+
+# compute the cohesion of each player over all fights from the cohesion per fight
+# Input:
+# players = list of Players, player.cohesion is set
+def compute_player_cohesion(players):
+    for player in players:
+        fight_cohesions = [cohesion for cohesion in player.cohesion_per_fight.values() if cohesion['time_with_positions'] > 0]
+        time_with_positions = sum(cohesion['time_with_positions'] for cohesion in fight_cohesions)
+        time_outside_blob = sum(cohesion['time_outside_blob'] for cohesion in fight_cohesions)
+        if time_with_positions == 0:
+            player.cohesion = {'dist_to_center': -1, 'time_outside_blob': 0, 'percentage_outside_blob': 0}
+            continue
+        # the distance is weighted by the time in each fight
+        dist_to_center = sum(cohesion['dist_to_center'] * cohesion['time_with_positions'] for cohesion in fight_cohesions) / time_with_positions
+        player.cohesion = {'dist_to_center': round(dist_to_center, 2),
+                           'time_outside_blob': round(time_outside_blob, 2),
+                           'percentage_outside_blob': round(100 * time_outside_blob / time_with_positions, 2)}
+
+
+
+# count points in square cells of a fixed size. Only the rectangle of cells containing points is stored.
+# Input:
+# points = numpy array of shape (number of points, 2) in the same unit as the distance to tag
+# cell_size = side length of the cells
+# Output:
+# heatmap = dictionary with 'origin' = cell indices of the first cell in x and y, 'counts' = 2d numpy array of the number of points in each cell, indexed by [x, y]
+def get_heatmap(points, cell_size):
+    if len(points) == 0:
+        return {'origin': np.zeros(2, dtype = np.int64), 'counts': np.zeros((0, 0), dtype = np.int32)}
+    cells = np.floor(points / cell_size).astype(np.int64)
+    origin = cells.min(axis = 0)
+    cells -= origin
+    shape = tuple((cells.max(axis = 0) + 1).tolist())
+    counts = np.bincount(np.ravel_multi_index((cells[:, 0], cells[:, 1]), shape), minlength = shape[0] * shape[1])
+    return {'origin': origin, 'counts': counts.reshape(shape).astype(np.int32)}
+
+
+
+# add up two heatmaps with the same cell size
+# Input:
+# heatmap, other_heatmap = heatmaps as returned by get_heatmap
+# Output:
+# heatmap covering the cells of both
+def add_heatmaps(heatmap, other_heatmap):
+    if other_heatmap['counts'].size == 0:
+        return heatmap
+    if heatmap['counts'].size == 0:
+        return other_heatmap
+    origin = np.minimum(heatmap['origin'], other_heatmap['origin'])
+    end = np.maximum(heatmap['origin'] + heatmap['counts'].shape, other_heatmap['origin'] + other_heatmap['counts'].shape)
+    counts = np.zeros(tuple((end - origin).tolist()), dtype = np.int32)
+    for added in (heatmap, other_heatmap):
+        start = added['origin'] - origin
+        counts[start[0]:start[0] + added['counts'].shape[0], start[1]:start[1] + added['counts'].shape[1]] += added['counts']
+    return {'origin': origin, 'counts': counts}
+
+
+
+# get the positions of the squad members when they went down or died
+# Input:
+# players_json = the 'players' list of a log
+# polling_rate = time between two positions in ms
+# event = 'down' or 'dead'
+# Output:
+# numpy array of shape (number of events, 2) with the positions in pixels
+def get_event_positions(players_json, polling_rate, event):
+    event_positions = list()
+    for player_json in players_json:
+        replay_data = player_json.get('combatReplayData', {})
+        positions = replay_data.get('positions')
+        if player_json['notInSquad'] or not positions:
+            continue
+        first_sample = int(round(replay_data.get('start', 0) / polling_rate))
+        for event_start, _ in replay_data.get(event, []):
+            sample = min(max(int(event_start / polling_rate) - first_sample, 0), len(positions) - 1)
+            event_positions.append(positions[sample])
+    return np.asarray(event_positions, dtype = float).reshape(-1, 2)
+
+
+
+# compute heatmaps of where the squad was, went down and died in one fight
+# Input:
+# fight_json = json object including one fight
+# fight = the Fight, with polling_rate and inch_to_pixel read from the log. fight.heatmaps is set.
+# config = the config used for top stats computation
+def compute_fight_heatmaps(fight_json, fight, config):
+    players_json = fight_json['players']
+    _, squad_positions = get_squad_positions(players_json, fight.polling_rate)
+    points = {'positions': squad_positions.reshape(-1, 2),
+              'downs': get_event_positions(players_json, fight.polling_rate, 'down'),
+              'deaths': get_event_positions(players_json, fight.polling_rate, 'dead')}
+    fight.heatmaps = {'map': fight_json.get('fightName', ""), 'cell_size': config.heatmap_cell_size}
+    for kind in heatmap_kinds:
+        kind_points = points[kind][~np.isnan(points[kind][:, 0])]
+        # positions are scaled like for the distance to tag
+        fight.heatmaps[kind] = get_heatmap(kind_points / fight.inch_to_pixel, config.heatmap_cell_size)
+
+
+
+# add up the heatmaps of all fights that weren't skipped, separately for each map
+# Input:
+# fights = list of Fights
+# Output:
+# dictionary of map name -> kind of positions -> heatmap
+def get_raid_heatmaps(fights):
+    raid_heatmaps = dict()
+    for fight in fights:
+        if fight.skipped or not fight.heatmaps:
+            continue
+        map_heatmaps = raid_heatmaps.setdefault(fight.heatmaps['map'], dict())
+        for kind in heatmap_kinds:
+            map_heatmaps[kind] = add_heatmaps(map_heatmaps.get(kind, get_heatmap([], 1)), fight.heatmaps[kind])
+    return raid_heatmaps
+
+
+
+# write the heatmaps of all fights and of the whole raid to a compressed .npz file. For each heatmap, there are two arrays
+# <name>_counts and <name>_origin, where name is fight_<fight number>_<kind> or raid_<map index>_<kind>.
+# The map names are stored in raid_maps, the cell size in cell_size.
+# Input:
+# fights = list of Fights
+# raid_heatmaps = heatmaps per map as returned by get_raid_heatmaps
+# config = the config used for top stats computation
+# filename = .npz file to write to
+def write_heatmaps(fights, raid_heatmaps, config, filename):
+    arrays = {'raid_maps': np.array(list(raid_heatmaps.keys()), dtype = str), 'cell_size': np.array(config.heatmap_cell_size)}
+    for fight_number, fight in enumerate(fights):
+        if fight.skipped or not fight.heatmaps:
+            continue
+        for kind in heatmap_kinds:
+            arrays["fight_"+str(fight_number)+"_"+kind+"_counts"] = fight.heatmaps[kind]['counts']
+            arrays["fight_"+str(fight_number)+"_"+kind+"_origin"] = fight.heatmaps[kind]['origin']
+    for map_index, map_heatmaps in enumerate(raid_heatmaps.values()):
+        for kind in heatmap_kinds:
+            arrays["raid_"+str(map_index)+"_"+kind+"_counts"] = map_heatmaps[kind]['counts']
+            arrays["raid_"+str(map_index)+"_"+kind+"_origin"] = map_heatmaps[kind]['origin']
+    with open(filename, 'wb') as heatmap_file:
+        np.savez_compressed(heatmap_file, **arrays)
+
+
+
+# write a grayscale png image. Only needs zlib, so no imaging library has to be installed.
+# Input:
+# pixels = 2d numpy array of uint8, indexed by [row, column]
+# filename = .png file to write to
+def write_grayscale_png(pixels, filename):
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+    height, width = pixels.shape
+    # each row starts with filter type 0
+    raw_data = np.hstack([np.zeros((height, 1), dtype = np.uint8), pixels]).tobytes()
+    with open(filename, 'wb') as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n")
+        png_file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)))
+        png_file.write(chunk(b"IDAT", zlib.compress(raw_data, 9)))
+        png_file.write(chunk(b"IEND", b""))
+
+
+
+# write the raid heatmap of the squad positions on each map as png image. Counts are shown on a logarithmic scale, north is up.
+# Input:
+# raid_heatmaps = heatmaps per map as returned by get_raid_heatmaps
+# filename = name of the .npz heatmap file; the images are named like it, with the map name appended
+def write_heatmap_pngs(raid_heatmaps, filename):
+    file_start = filename[:-4] if filename.endswith('.npz') else filename
+    for map_name, map_heatmaps in raid_heatmaps.items():
+        counts = map_heatmaps['positions']['counts']
+        if counts.size == 0:
+            continue
+        brightness = np.log1p(counts) / np.log1p(counts.max()) * 255
+        # heatmaps are indexed by [x, y], images by [row, column]
+        pixels = brightness.astype(np.uint8).T
+        map_suffix = re.sub(r'[^A-Za-z0-9]+', '_', map_name).strip('_')
+        write_grayscale_png(pixels, file_start+"_"+map_suffix+".png")
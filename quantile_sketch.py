@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+#    quantile_sketch.py keeps the distribution of the per fight values of each player in sketches of constant size.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import math
+
+# values below this are counted as 0
+min_value = 1e-6
+# maximum number of buckets of a sketch. If there are more, the lowest buckets are merged.
+max_num_buckets = 2048
+
+
+
+# This class counts values in buckets whose bounds grow exponentially, like a DDSketch. Each quantile is returned with a relative error of at most
+# the given accuracy, as long as the lowest buckets didn't have to be merged. Sketches with the same accuracy can be merged, so the sketch of
+# several fights or seasons is the merged sketch of each of them.
+class QuantileSketch:
+    # Input:
+    # accuracy = maximum relative error of the quantiles, e.g. 0.01 for 1%
+    def __init__(self, accuracy = 0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = dict()   # bucket index -> number of values in it
+        self.zero_count = 0     # number of values below min_value
+        self.count = 0          # number of all values
+
+
+    # add one value. Negative values are counted as 0.
+    def add(self, value):
+        self.count += 1
+        if value < min_value:
+            self.zero_count += 1
+            return
+        bucket = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        if len(self.buckets) > max_num_buckets:
+            self.collapse()
+
+
+    # merge the lowest buckets until there are at most max_num_buckets
+    def collapse(self):
+        bucket_indices = sorted(self.buckets)
+        num_merged = len(bucket_indices) - max_num_buckets + 1
+        merged_count = sum(self.buckets.pop(bucket) for bucket in bucket_indices[:num_merged])
+        self.buckets[bucket_indices[num_merged]] += merged_count
+
+
+    # add all values of another sketch with the same accuracy
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Only sketches with the same accuracy can be merged.")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        if len(self.buckets) > max_num_buckets:
+            self.collapse()
+
+
+    # get a quantile of the added values
+    # Input:
+    # quantile = between 0 and 1, e.g. 0.5 for the median
+    # Output:
+    # estimated value of the quantile, None if no values were added
+    def get_quantile(self, quantile):
+        if self.count == 0:
+            return None
+        rank = quantile * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.
+        seen = self.zero_count
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                # the value in the middle of the bucket, relative to its bounds
+                return 2 * self.gamma ** bucket / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+
+# get the name of a percentile in the output
+# Input:
+# percentile = percentile between 0 and 100
+def get_percentile_name(percentile):
+    return "median" if percentile == 50 else "p"+str(percentile)
+
+
+
+# get the value of a stat of a player in one fight, normalized in the same way as the averages
+# Input:
+# player_stats = stats of a player in a fight
+# stat = stat that is considered
+# config = the config used for top stats computation
+# Output:
+# normalized value, or None if the player wasn't present for this stat
+def get_normalized_value(player_stats, stat, config):
+    duration = player_stats['duration_present'][stat]
+    if stat in config.squad_buff_abbrev.values():
+        # buff generation is given per time in the logs
+        value = player_stats[stat]['gen']
+        return value if value >= 0 and duration > 0 else None
+    value = player_stats[stat]
+    if value < 0 or duration <= 0:
+        return None
+    if stat == 'dist' or 'dmg_taken' in stat or stat in config.self_buff_ids or stat == 'spike_dmg':
+        # already per time, or per fight
+        return value
+    if stat == 'heal_from_regen':
+        return value / player_stats['hits_from_regen'] if player_stats.get('hits_from_regen', 0) > 0 else None
+    if stat in ['deaths', 'kills', 'downs', 'downstate', 'resurrects']:
+        return value / (duration / 60)
+    return value / duration
+
+
+
+# add the values of a player in one fight to the sketches of the player
+# Input:
+# sketches = dictionary of stat -> QuantileSketch, changed inplace
+# player_stats = stats of a player in a fight
+# config = the config used for top stats computation
+def add_fight_to_sketches(sketches, player_stats, config):
+    for stat in config.stats_to_compute:
+        value = get_normalized_value(player_stats, stat, config)
+        if value is None:
+            continue
+        if stat not in sketches:
+            sketches[stat] = QuantileSketch(config.quantile_sketch_accuracy)
+        sketches[stat].add(value)
+
+
+
+# compute the configured percentiles of the per fight values of each player from their sketches
+# Input:
+# players = list of Players with their sketches, player.quantiles is set
+# config = the config used for top stats computation
+def compute_player_quantiles(players, config):
+    for player in players:
+        player.quantiles = dict()
+        for stat, sketch in player.quantile_sketches.items():
+            player.quantiles[stat] = {get_percentile_name(percentile): round(sketch.get_quantile(percentile / 100), 2) for percentile in config.stat_quantiles}
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+#    ranking.py contains the sorted orders of all players for each stat that are used for determining top players.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+from stat_classes import StatType
+
+
+# are low values good for this stat? (e.g. tag distance, dmg taken, deaths, stripped, downstate)
+# Input:
+# stat = stat that is considered
+def low_values_are_good(stat):
+    return stat == 'dist' or 'dmg_taken' in stat or stat == 'deaths' or stat == 'stripped' or stat == 'downstate'
+
+
+
+# sort keys for each ranking type, from most to least important. Remaining ties are broken by player index.
+ranking_keys = {StatType.TOTAL: ['total'],
+                StatType.CONSISTENT: ['consistency', 'total'],
+                StatType.PERCENTAGE: ['percentage', 'consistency', 'total'],
+                StatType.AVERAGE: ['average', 'consistency', 'total']}
+
+# columns of the xls sheets that can be sorted by the values stored in a StatRanking
+xls_column_keys = {'total': 'total', 'avg': 'average', 'times_top': 'consistency', 'percentage_top': 'percentage',
+                   'attendance_num': 'num_fights_present', 'attendance_duration': 'duration_present', 'uptime': 'uptime'}
+
+
+
+# This class stores the values of all players for one stat, and the orders of the players by these values.
+# Orders are computed once when they are first needed and reused afterwards.
+class StatRanking:
+    # Input:
+    # players = list of Players with computed overall stats
+    # stat = stat that is considered
+    # is_squad_buff = stat is a squad buff
+    def __init__(self, players, stat, is_squad_buff):
+        self.stat = stat
+        self.is_squad_buff = is_squad_buff
+        self.low_values_are_good = low_values_are_good(stat)
+        num_players = len(players)
+        if is_squad_buff:
+            self.total = np.fromiter((player.total_stats[stat]['gen'] for player in players), dtype=float, count=num_players)
+            self.uptime = np.fromiter((player.total_stats[stat]['uptime'] for player in players), dtype=float, count=num_players)
+        else:
+            self.total = np.fromiter((player.total_stats[stat] for player in players), dtype=float, count=num_players)
+            self.uptime = np.zeros(num_players)
+        self.average = np.fromiter((player.average_stats[stat] for player in players), dtype=float, count=num_players)
+        self.consistency = np.fromiter((player.consistency_stats[stat] for player in players), dtype=float, count=num_players)
+        self.percentage = np.fromiter((player.portion_top_stats[stat] for player in players), dtype=float, count=num_players)
+        self.attendance = np.fromiter((player.attendance_percentage[stat] for player in players), dtype=float, count=num_players)
+        self.num_fights_present = np.fromiter((player.num_fights_present[stat] for player in players), dtype=float, count=num_players)
+        self.duration_present = np.fromiter((player.duration_present[stat] for player in players), dtype=float, count=num_players)
+        self.orders = dict()
+
+
+    # get the player indices sorted by the given ranking type, best first
+    # Input:
+    # ranking_type = StatType.TOTAL, StatType.CONSISTENT, StatType.PERCENTAGE or StatType.AVERAGE
+    # Output:
+    # numpy array of player indices
+    def get_order(self, ranking_type):
+        if ranking_type not in self.orders:
+            # np.lexsort sorts by the last key first
+            keys = [np.arange(len(self.total))] + [getattr(self, key) for key in reversed(ranking_keys[ranking_type])]
+            order = np.lexsort(keys)
+            # low values are good for total and average of some stats, otherwise high values are good
+            if not (self.low_values_are_good and ranking_type in (StatType.TOTAL, StatType.AVERAGE)):
+                order = order[::-1]
+            self.orders[ranking_type] = order
+        return self.orders[ranking_type]
+
+
+    # get the values by which the players are sorted for the given ranking type
+    # Input:
+    # ranking_type = StatType.TOTAL, StatType.CONSISTENT, StatType.PERCENTAGE or StatType.AVERAGE
+    # Output:
+    # numpy array of values per player index
+    def get_values(self, ranking_type):
+        return getattr(self, ranking_keys[ranking_type][0])
+
+
+    # get the players sorted by the given ranking type
+    # Input:
+    # ranking_type = StatType.TOTAL, StatType.CONSISTENT, StatType.PERCENTAGE or StatType.AVERAGE
+    # Output:
+    # list of (player index, value), best first
+    def get_sorted(self, ranking_type):
+        order = self.get_order(ranking_type)
+        return list(zip(order.tolist(), self.get_values(ranking_type)[order].tolist()))
+
+
+    # get the order in which a subset of players is listed in the xls, sorted by the given columns.
+    # Input:
+    # player_indices = list of player indices that are listed
+    # sorting_columns = xls columns to sort by, most important first
+    # sort_ascending = for each sorting column, sort ascending?
+    # Output:
+    # positions in player_indices in sorted order, or None if a column can't be sorted by the stored values
+    def get_xls_order(self, player_indices, sorting_columns, sort_ascending):
+        if any(column not in xls_column_keys for column in sorting_columns):
+            return None
+        player_indices = np.asarray(player_indices, dtype=int)
+        # ties keep the order of player_indices
+        keys = [np.arange(len(player_indices))]
+        for column, ascending in zip(reversed(sorting_columns), reversed(sort_ascending)):
+            values = getattr(self, xls_column_keys[column])[player_indices]
+            keys.append(values if ascending else -values)
+        return np.lexsort(keys)
+
+
+
+# build the rankings for all stats to compute
+# Input:
+# players = list of Players with computed overall stats
+# config = the config used for top stats computation
+# Output:
+# dictionary stat -> StatRanking
+def get_stat_rankings(players, config):
+    squad_buffs = set(config.squad_buff_abbrev.values())
+    return {stat: StatRanking(players, stat, stat in squad_buffs) for stat in config.stats_to_compute}
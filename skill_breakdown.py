@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+#    skill_breakdown.py computes which skills did the damage of each player, from the damage distribution in the logs.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+# values that are summed up for each skill
+skill_values = ['damage', 'hits', 'crit']
+
+
+
+# get the key of a skill as used in the skillMap and buffMap of the log: damage from buffs (e.g. conditions) is indirect damage with the id of the buff
+# Input:
+# skill_json = one entry of 'totalDamageDist'
+def get_skill_key(skill_json):
+    return ('b' if skill_json.get('indirectDamage', False) else 's') + str(skill_json['id'])
+
+
+
+# get the damage, hits and crits of each skill of one player in one fight
+# Input:
+# player_json = json data of one player
+# Output:
+# dictionary of skill key -> list of damage, hits and crits
+def get_player_skill_damage(player_json):
+    skill_damage = dict()
+    if not player_json.get('totalDamageDist'):
+        return skill_damage
+    # the first phase is the whole fight
+    for skill_json in player_json['totalDamageDist'][0]:
+        values = skill_damage.setdefault(get_skill_key(skill_json), [0, 0, 0])
+        values[0] += skill_json.get('totalDamage', 0)
+        values[1] += skill_json.get('hits', 0)
+        values[2] += skill_json.get('crit', 0)
+    return skill_damage
+
+
+
+# get the names of the skills used by the squad in one fight
+# Input:
+# fight_json = json object including one fight
+# skill_keys = keys of the skills whose names are needed
+# Output:
+# dictionary of skill key -> name
+def get_skill_names(fight_json, skill_keys):
+    skill_names = dict()
+    for key in skill_keys:
+        skill_map = fight_json.get('buffMap' if key[0] == 'b' else 'skillMap', {})
+        if key in skill_map:
+            skill_names[key] = skill_map[key].get('name', key)
+    return skill_names
+
+
+
+# compute the skill damage of all squad members in one fight
+# Input:
+# fight_json = json object including one fight
+# fight = the Fight. fight.skill_names is set.
+# Output:
+# dictionary of index in players_json -> skill damage as returned by get_player_skill_damage
+def compute_fight_skill_damage(fight_json, fight):
+    skill_damage_per_player = dict()
+    for i, player_json in enumerate(fight_json['players']):
+        if player_json['notInSquad']:
+            continue
+        skill_damage_per_player[i] = get_player_skill_damage(player_json)
+    fight.skill_names = get_skill_names(fight_json, set(key for skill_damage in skill_damage_per_player.values() for key in skill_damage))
+    return skill_damage_per_player
+
+
+
+# This class stores the damage, hits and crits of each skill of each account and profession over all fights.
+# The skills are sorted by account and profession, and by damage within each of them, so the top skills of a player are one slice of the arrays.
+class SkillIndex:
+    # Input:
+    # players = list of Players with their skill damage per fight
+    # fights = list of Fights with the names of the skills used in them
+    def __init__(self, players, fights):
+        totals = dict()
+        for player in players:
+            player_totals = totals.setdefault((player.account, player.profession), dict())
+            for fight_number, skill_damage in player.skill_damage_per_fight.items():
+                if fights[fight_number].skipped:
+                    continue
+                for key, values in skill_damage.items():
+                    summed_values = player_totals.setdefault(key, [0, 0, 0])
+                    for i, value in enumerate(values):
+                        summed_values[i] += value
+
+        self.skill_names = dict()
+        for fight in fights:
+            self.skill_names.update(fight.skill_names)
+        self.groups = sorted(totals.keys())
+        group_indices = [group_index for group_index, group in enumerate(self.groups) for _ in totals[group]]
+        keys = [key for group in self.groups for key in totals[group]]
+        values = np.array([values for group in self.groups for values in totals[group].values()], dtype = np.int64).reshape(-1, len(skill_values))
+
+        # sort by group, then by damage descending, then by skill key
+        order = np.lexsort((np.array(keys, dtype = str), -values[:, 0], np.array(group_indices, dtype = np.int64))) if keys else np.zeros(0, dtype = int)
+        self.keys = np.array(keys, dtype = str)[order]
+        self.values = values[order]
+        self.offsets = np.searchsorted(np.array(group_indices, dtype = np.int64)[order], np.arange(len(self.groups) + 1))
+        self.group_index = {group: group_index for group_index, group in enumerate(self.groups)}
+
+
+    # get the skills with the most damage of an account playing a profession
+    # Input:
+    # account = account name
+    # profession = profession
+    # num_skills = number of skills to return, None for all
+    # Output:
+    # list of dictionaries with 'skill' = key of the skill, 'name' = name of the skill, 'damage', 'hits', 'crit'; highest damage first
+    def get_top_skills(self, account, profession, num_skills = None):
+        if (account, profession) not in self.group_index:
+            return []
+        group_index = self.group_index[(account, profession)]
+        start, end = int(self.offsets[group_index]), int(self.offsets[group_index + 1])
+        if num_skills is not None:
+            end = min(end, start + num_skills)
+        top_skills = list()
+        for key, values in zip(self.keys[start:end].tolist(), self.values[start:end].tolist()):
+            top_skill = {'skill': key, 'name': self.skill_names.get(key, key)}
+            top_skill.update(zip(skill_values, values))
+            top_skills.append(top_skill)
+        return top_skills
+
+
+
+# get the skill breakdown of all accounts and professions for the output
+# Input:
+# players = list of Players with their skill damage per fight
+# fights = list of Fights
+# num_skills = number of skills per account and profession, None for all
+# Output:
+# list of dictionaries with 'account', 'profession' and 'skills' as returned by SkillIndex.get_top_skills
+def get_skill_breakdown(players, fights, num_skills = None):
+    skill_index = SkillIndex(players, fights)
+    return [{'account': account, 'profession': profession, 'skills': skill_index.get_top_skills(account, profession, num_skills)}
+            for account, profession in skill_index.groups]
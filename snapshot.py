@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+#    snapshot.py stores the computed player and fight stats, so top stats can be recomputed without parsing the logs again.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import pickle
+
+from io_helper import myprint
+from parse_top_stats_tools import apply_num_players_considered_top
+from stat_classes import parsed_config_fields
+
+# increase whenever Player, Fight or the stored config fields change in an incompatible way
+snapshot_version = 11
+
+# config fields that were used while computing the stats. They are restored from the snapshot, since the stored stats depend on them.
+snapshot_config_fields = ['max_num_players_considered_top'] + parsed_config_fields
+
+
+
+# write the computed stats to a snapshot file
+# Input:
+# players = list of Players as returned by collect_stat_data (not anonymized)
+# fights = list of Fights as returned by collect_stat_data
+# found_healing = was healing found in the logs?
+# found_barrier = was barrier found in the logs?
+# config = the config used for top stats computation
+# snapshot_filename = file to write to
+def write_snapshot(players, fights, found_healing, found_barrier, config, snapshot_filename):
+    snapshot = {'version': snapshot_version,
+                'players': players,
+                'fights': fights,
+                'found_healing': found_healing,
+                'found_barrier': found_barrier,
+                'stats_to_compute': config.stats_to_compute,
+                'config': {field: getattr(config, field) for field in snapshot_config_fields}}
+    with open(snapshot_filename, 'wb') as snapshot_file:
+        pickle.dump(snapshot, snapshot_file, protocol = pickle.HIGHEST_PROTOCOL)
+
+
+
+# read a snapshot file
+# Input:
+# snapshot_filename = file written by write_snapshot
+# log = log file to write to
+# Output:
+# snapshot dictionary, or None if the snapshot couldn't be read
+def read_snapshot(snapshot_filename, log):
+    try:
+        with open(snapshot_filename, 'rb') as snapshot_file:
+            snapshot = pickle.load(snapshot_file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as error:
+        myprint(log, "Could not read the snapshot "+snapshot_filename+": "+str(error), "info")
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != snapshot_version:
+        myprint(log, "The snapshot "+snapshot_filename+" was written by a different version of the parser. Please parse the logs again.", "info")
+        return None
+    return snapshot
+
+
+
+# get the stats that can be ranked from a snapshot
+# Input:
+# snapshot = snapshot dictionary as returned by read_snapshot
+# selected_stats = list of stats that should be ranked, or None for all stats in the snapshot
+# log = log file to write to
+# Output:
+# list of stats contained in the snapshot
+def get_snapshot_stats(snapshot, selected_stats, log):
+    if selected_stats is None:
+        return list(snapshot['stats_to_compute'])
+    missing_stats = [stat for stat in selected_stats if stat not in snapshot['stats_to_compute']]
+    if missing_stats:
+        myprint(log, "The following stats are not contained in the snapshot and will be ignored: "+", ".join(missing_stats), "info")
+    return [stat for stat in selected_stats if stat in snapshot['stats_to_compute']]
+
+
+
+# restore the computed stats from a snapshot. The config fields used while parsing are restored in config.
+# The times top are recomputed for the num_players_considered_top of the current config.
+# Input:
+# snapshot = snapshot dictionary as returned by read_snapshot
+# config = the config used for top stats computation, changed inplace
+# log = log file to write to
+# Output:
+# players, fights, found_healing, found_barrier as returned by collect_stat_data
+def restore_snapshot(snapshot, config, log):
+    for field, value in snapshot['config'].items():
+        setattr(config, field, value)
+    for stat in config.stats_to_compute:
+        if config.num_players_considered_top[stat] > config.max_num_players_considered_top:
+            myprint(log, "Ranks for "+stat+" were only counted up to "+str(config.max_num_players_considered_top)+" in the snapshot. Using this as number of players considered top.", "info")
+            config.num_players_considered_top[stat] = config.max_num_players_considered_top
+    apply_num_players_considered_top(snapshot['players'], config)
+    return snapshot['players'], snapshot['fights'], snapshot['found_healing'], snapshot['found_barrier']
@@ -26,14 +26,25 @@ class Player:
     # analogue to duration_present (see above)
     normalization_time_allies: dict = field(default_factory=dict)  
     swapped_build: bool = False         # a different player character or specialization with this account name was in some of the fights
+    guild: str = ""                     # id of the guild the player represented in the last fight in which it was logged
 
     # fields for all stats defined in config
     consistency_stats: dict = field(default_factory=dict)     # how many times did this player get into top for each stat?
+    top_rank_histogram: dict = field(default_factory=dict)    # for each stat, how many times did this player reach rank 1, 2, ..., max_num_players_considered_top in a fight? Players with the same value share a rank.
     total_stats: dict = field(default_factory=dict)           # what's the total value for this player for each stat?
     average_stats: dict = field(default_factory=dict)         # what's the average stat per second for this player? (exception: deaths are per minute)
     portion_top_stats: dict = field(default_factory=dict)     # what percentage of fights did this player get into top for each stat, in relation to the number of fights they were involved in?
                                                               # = consistency_stats/num_fights_present
-    stats_per_fight: list = field(default_factory=list)       # what's the value of each stat for this player in each fight?
+    stats_per_fight: dict = field(default_factory=dict)       # what's the value of each stat for this player in each fight? fight number -> stats, only for fights the player was present in
+    cohesion_per_fight: dict = field(default_factory=dict)    # how far away from the squad center was this player in each fight? fight number -> cohesion (see position_analysis.get_squad_cohesion)
+    cohesion: dict = field(default_factory=dict)              # how far away from the squad center was this player over all fights? (see position_analysis.compute_player_cohesion)
+    target_damage_per_fight: dict = field(default_factory=dict)  # how much damage did this player do to each enemy target in each fight? fight number -> list of damage per target
+    window_stats_per_fight: dict = field(default_factory=dict)   # stats of this player in each configured time window of each fight. fight number -> window name -> stat -> value
+    window_stats: dict = field(default_factory=dict)             # stats of this player in each configured time window, summed over all fights. window name -> stat -> value
+    skill_damage_per_fight: dict = field(default_factory=dict)   # damage, hits and crits of each skill of this player in each fight. fight number -> skill key -> values (see skill_breakdown.get_player_skill_damage)
+    bootstrap: dict = field(default_factory=dict)                # confidence intervals of total, average and rank of this player from resampling the fights. stat -> intervals (see bootstrap.compute_bootstrap)
+    quantile_sketches: dict = field(default_factory=dict)        # distribution of the normalized values of this player per fight. stat -> quantile_sketch.QuantileSketch
+    quantiles: dict = field(default_factory=dict)                # configured percentiles of the normalized values of this player per fight. stat -> percentile name -> value
 
     def initialize(self, config):
         self.duration_present = {key: 0 for key in config.stats_to_compute}
@@ -41,10 +52,12 @@ class Player:
         self.normalization_time_allies = {key: 0 for key in config.stats_to_compute}
         self.total_stats = {key: 0 for key in config.stats_to_compute}
         for stat in config.squad_buff_abbrev.values():
-            self.total_stats[stat] = {'gen': 0, 'uptime': 0}
+            if stat in config.stats_to_compute:
+                self.total_stats[stat] = {'gen': 0, 'uptime': 0}
 
         self.average_stats = {key: 0 for key in config.stats_to_compute}
         self.consistency_stats = {key: 0 for key in config.stats_to_compute}
+        self.top_rank_histogram = {key: [0] * config.max_num_players_considered_top for key in config.stats_to_compute}
         self.portion_top_stats = {key: 0 for key in config.stats_to_compute}
 
 
@@ -60,18 +73,35 @@ class Fight:
     allies: int = 0                                       # number of squad players involved
     kills: int = 0                                        # number of kills
     start_time: str = ""                                  # start time of the fight
+    end_time: str = ""                                    # end time of the fight
     squad_composition: dict = field(default_factory=dict) # squad composition of the fight (how many of which class)
     tag_positions_until_death: list = field(default_factory=list) # position of the commander until he died (empty if no com was found or more than one com was found)
     polling_rate: int = 150                                       # polling rate of position data as read from json (could get overwritten)
     inch_to_pixel: float = 0.009                                  # inch to pixel conversion value; different for some maps -> might get overwritten
+    cohesion: dict = field(default_factory=dict)                  # how closely did the squad stay together? (see position_analysis.get_squad_cohesion)
+    heatmaps: dict = field(default_factory=dict)                  # where was the squad, where did they go down and die? (see position_analysis.compute_fight_heatmaps)
+    boon_coverage: dict = field(default_factory=dict)             # how much of the squad had each boon in each second? (see boon_coverage.get_buff_coverage)
+    target_damage: dict = field(default_factory=dict)             # how much damage did the squad do to each enemy target in each second, and when did they focus one? (see target_damage.compute_fight_target_damage)
+    skill_names: dict = field(default_factory=dict)               # names of the skills used by the squad, skill key -> name (see skill_breakdown.get_skill_names)
     
 
-    
+
+# This class stores which parts of the logs have to be read to compute the configured stats. Everything else is skipped.
+@dataclass
+class ExtractionPlan:
+    durations: set = field(default_factory=set)           # duration types needed for the averages ('total', 'active', 'in_combat', 'not_running_back')
+    buffs: set = field(default_factory=set)               # abbreviations of squad and self buffs whose ids have to be read from the buffMap
+    needs_tag_positions: bool = False                     # are the positions of the commander needed?
+    player_json_fields: set = field(default_factory=set)  # entries of the player json that are read
+
+
+
 # This class stores the configuration for running the top stats.
 @dataclass
 class Config:
     num_players_listed: dict = field(default_factory=dict)          # How many players will be listed who achieved top stats most often for each stat?
     num_players_considered_top: dict = field(default_factory=dict)  # How many players are considered to be "top" in each fight for each stat?
+    max_num_players_considered_top: int = 10                        # Up to which rank are the per fight ranks of each player counted?
     
     min_attendance_portion_for_percentage: float = 0.  # For what portion of all fights does a player need to be there to be considered for "percentage" awards?
     min_attendance_percentage_for_average: float = 0.  # For what percentage of all fights does a player need to be there to be considered for "jack of all trades" awards?     
@@ -85,6 +115,27 @@ class Config:
     min_allied_players: int = 0   # minimum number of allied players to consider a fight in the stats
     min_fight_duration: int = 0   # minimum duration of a fight to be considered in the stats
     min_enemy_players: int = 0    # minimum number of enemies to consider a fight in the stats
+    skip_duplicate_logs: bool = True    # only use one log of each fight if several logs of the same fight are found
+    anonymize: bool = False             # replace all account and character names in the output
+    low_memory: bool = False            # keep the stats per fight in a temporary file instead of in memory
+    read_ahead_megabytes: int = 200     # how many MB of log files are read in the background while earlier logs are processed
+    position_analyses: list = field(default_factory=list)  # which analyses of the positions of all squad members are computed? (see position_analysis.position_analysis_names)
+    blob_radius: float = 600.           # squad members farther away from the squad center are outside the blob
+    heatmap_cell_size: float = 100.     # side length of the cells in which positions are counted for the heatmaps
+    boon_coverage_buffs: list = field(default_factory=list)  # abbreviations of the squad buffs for which the squad coverage in each second is computed
+    boon_coverage_threshold: float = 50.  # percentage of the squad below which a boon counts as not covering the squad
+    target_damage: bool = False         # compute the damage of each squad member on each enemy target, and the focus fire windows
+    focus_fire_window: int = 5          # length in s of the windows in which focus fire and bursts are searched
+    focus_fire_share: float = 50.       # percentage of the squad damage one target has to take in a window to count as focus fire
+    time_windows: dict = field(default_factory=dict)  # window name -> (start, end) of time windows in which stats are computed additionally (see timeline_index.get_window_bounds)
+    skill_breakdown: bool = False       # compute which skills did the damage of each account and profession
+    skill_breakdown_top: int = 10       # number of skills with the most damage written for each account and profession
+    bootstrap_draws: int = 0            # number of times the fights are resampled to estimate confidence intervals of totals, averages and ranks. 0 = don't
+    bootstrap_confidence: float = 90.   # confidence level in percent of the bootstrap confidence intervals
+    bootstrap_seed: int = 0             # seed of the random number generator used for resampling the fights
+    stat_quantiles: list = field(default_factory=list)  # percentiles of the normalized values per fight that are computed for each player and stat, e.g. [10, 50, 90]
+    quantile_sketch_accuracy: float = 0.01  # maximum relative error of the percentiles
+    group_by: list = field(default_factory=list)  # keys by which the players are grouped for computing total and average stats of each group (see group_stats.group_keys)
 
     stat_names: dict = field(default_factory=dict)                  # the names under which the stats appear in the output
     profession_abbreviations: dict = field(default_factory=dict)    # the names under which each profession appears in the output
@@ -97,26 +148,64 @@ class Config:
 
     squad_buff_ids: dict = field(default_factory=dict)              # dict of squad buff name to buff id as read from buffMap
     self_buff_ids: dict = field(default_factory=dict)               # dict of self buff name to buff id as read from buffMap
-    buffs_stacking_duration: list = field(default_factory=list)     # list of squad_buff names stacking duration
-    buffs_stacking_intensity: list = field(default_factory=list)    # list of squad_buff names stacking intensity
-    buffs_not_stacking: list = field(default_factory=list)          # list of squad_buff names that do not stack intensity or duration (e.g. auras)
+    buffs_stacking_duration: set = field(default_factory=set)       # set of squad_buff names stacking duration
+    buffs_stacking_intensity: set = field(default_factory=set)      # set of squad_buff names stacking intensity
+    buffs_not_stacking: set = field(default_factory=set)            # set of squad_buff names that do not stack intensity or duration (e.g. auras)
+    buff_catalog_file: str = ""                                     # file in which buff ids and stacking types are stored between runs
     squad_buff_abbrev: dict = field(default_factory=dict)           # abbreviations of squad buff names
     self_buff_abbrev: dict = field(default_factory=dict)            # abbreviations of self buff names
 
+    extraction_plan: ExtractionPlan = None                          # which parts of the logs have to be read, see json_helper.get_extraction_plan
+
     errors: list = field(default_factory=list)
     log_level: str = "info"
 
     xls_column_names: list = field(default_factory=list)
 
+
+
+# keys by which the players can be grouped (see group_stats.get_group_stats):
+# 'account' = all characters and professions of an account
+# 'profession' = all players of a profession
+# 'group' = all players in a subgroup of the squad, per fight
+# 'guild' = all players representing a guild
+group_keys = ['account', 'profession', 'group', 'guild']
+
+
+
+# get the names that replace the account and character name of a player in anonymized outputs
+# Input:
+# player_index = index of the player in the list of all players read from the logs
+# Output:
+# anonymous account name, anonymous character name
+def get_anonymous_player_names(player_index):
+    return "Account "+str(player_index), "Anon "+str(player_index)
+
     
 # fills a Config with the given input    
-def fill_config(config_input, log):
+# Input:
+# config_input = config module from parser_configs
+# log = log file to write to
+# selected_stats = list of stats to compute instead of config_input.stats_to_compute (optional)
+def fill_config(config_input, log, selected_stats = None):
     config = Config()
+    stats_to_compute = config_input.stats_to_compute
+    if selected_stats:
+        stats_to_compute = list()
+        for stat in selected_stats:
+            if stat not in config_input.stat_names:
+                print("stat "+stat+" is not available. Ignoring it.")
+            elif stat not in stats_to_compute:
+                stats_to_compute.append(stat)
+        # the average healing from regen is computed per regen tick
+        if 'heal_from_regen' in stats_to_compute and 'hits_from_regen' not in stats_to_compute:
+            stats_to_compute.append('hits_from_regen')
+
     if hasattr(config_input, "num_players_listed"):
         config.num_players_listed = config_input.num_players_listed
     else:
         config.num_players_listed = dict()
-    for stat in config_input.stats_to_compute:
+    for stat in stats_to_compute:
         if stat not in config.num_players_listed:
             config.num_players_listed[stat] = config_input.num_players_listed_default
 
@@ -124,15 +213,19 @@ def fill_config(config_input, log):
         config.num_players_considered_top = config_input.num_players_considered_top
     else:
         config.num_players_considered_top = dict()
-    for stat in config_input.stats_to_compute:
+    for stat in stats_to_compute:
         if stat not in config.num_players_considered_top:
             config.num_players_considered_top[stat] = config_input.num_players_considered_top_default
+    if hasattr(config_input, "max_num_players_considered_top"):
+        config.max_num_players_considered_top = config_input.max_num_players_considered_top
+    # ranks need to be counted at least up to the number of players considered top
+    config.max_num_players_considered_top = max([config.max_num_players_considered_top] + [config.num_players_considered_top[stat] for stat in stats_to_compute])
 
     if hasattr(config_input, "duration_for_averages"):
         config.duration_for_averages = config_input.duration_for_averages
     else:
         config.duration_for_averages = dict()
-    for stat in config_input.stats_to_compute:
+    for stat in stats_to_compute:
         if stat not in config.duration_for_averages:
             config.duration_for_averages[stat] = config_input.duration_for_averages_default
 
@@ -140,7 +233,7 @@ def fill_config(config_input, log):
         config.sort_xls_by = config_input.sort_xls_by
     else:
         config.sort_xls_by = dict()
-    for stat in config_input.stats_to_compute:
+    for stat in stats_to_compute:
         if stat not in config.sort_xls_by:
             config.sort_xls_by[stat] = config_input.default_sort_xls_by
 
@@ -154,15 +247,70 @@ def fill_config(config_input, log):
     config.min_allied_players = config_input.min_allied_players
     config.min_fight_duration = config_input.min_fight_duration
     config.min_enemy_players = config_input.min_enemy_players
+    if hasattr(config_input, "skip_duplicate_logs"):
+        config.skip_duplicate_logs = config_input.skip_duplicate_logs
+    if hasattr(config_input, "anonymize"):
+        config.anonymize = config_input.anonymize
+    if hasattr(config_input, "low_memory"):
+        config.low_memory = config_input.low_memory
+    if hasattr(config_input, "read_ahead_megabytes"):
+        config.read_ahead_megabytes = config_input.read_ahead_megabytes
+    if hasattr(config_input, "position_analyses"):
+        config.position_analyses = list(config_input.position_analyses)
+    if hasattr(config_input, "blob_radius"):
+        config.blob_radius = config_input.blob_radius
+    if hasattr(config_input, "heatmap_cell_size"):
+        config.heatmap_cell_size = config_input.heatmap_cell_size
+    if hasattr(config_input, "boon_coverage_buffs"):
+        config.boon_coverage_buffs = list(config_input.boon_coverage_buffs)
+    if hasattr(config_input, "boon_coverage_threshold"):
+        config.boon_coverage_threshold = config_input.boon_coverage_threshold
+    if hasattr(config_input, "target_damage"):
+        config.target_damage = config_input.target_damage
+    if hasattr(config_input, "focus_fire_window"):
+        config.focus_fire_window = config_input.focus_fire_window
+    if hasattr(config_input, "focus_fire_share"):
+        config.focus_fire_share = config_input.focus_fire_share
+    if hasattr(config_input, "time_windows"):
+        for name, bounds in config_input.time_windows.items():
+            if len(bounds) != 2 or any(not (bound is None or bound == 'tag_death' or isinstance(bound, (int, float))) for bound in bounds):
+                print("time window "+name+" must be given as (start, end) with times in s, 'tag_death' or None. Ignoring it.")
+                continue
+            config.time_windows[name] = tuple(bounds)
+    if hasattr(config_input, "skill_breakdown"):
+        config.skill_breakdown = config_input.skill_breakdown
+    if hasattr(config_input, "skill_breakdown_top"):
+        config.skill_breakdown_top = config_input.skill_breakdown_top
+    if hasattr(config_input, "bootstrap_draws"):
+        config.bootstrap_draws = config_input.bootstrap_draws
+    if hasattr(config_input, "bootstrap_confidence"):
+        config.bootstrap_confidence = config_input.bootstrap_confidence
+    if hasattr(config_input, "bootstrap_seed"):
+        config.bootstrap_seed = config_input.bootstrap_seed
+    if hasattr(config_input, "stat_quantiles"):
+        config.stat_quantiles = [percentile for percentile in config_input.stat_quantiles if 0 <= percentile <= 100]
+    if hasattr(config_input, "quantile_sketch_accuracy"):
+        config.quantile_sketch_accuracy = config_input.quantile_sketch_accuracy
+    if hasattr(config_input, "group_by"):
+        for key in config_input.group_by:
+            if key not in group_keys:
+                print("Players can't be grouped by "+key+". Possible keys are "+", ".join(group_keys)+". Ignoring it.")
+            elif key not in config.group_by:
+                config.group_by.append(key)
 
     config.files_to_write = config_input.files_to_write
+
+    if hasattr(config_input, "buff_catalog_file"):
+        config.buff_catalog_file = config_input.buff_catalog_file
+    else:
+        config.buff_catalog_file = "buff_catalog.json"
     
     config.stat_names = config_input.stat_names
     config.stat_descriptions = config_input.stat_descriptions
     config.profession_abbreviations = config_input.profession_abbreviations
     config.relevant_classes = config_input.relevant_classes_for_stat
 
-    config.stats_to_compute = config_input.stats_to_compute
+    config.stats_to_compute = stats_to_compute
 
     config.squad_buff_abbrev["Stability"] = 'stab'
     config.squad_buff_abbrev["Protection"] = 'prot'
@@ -192,7 +340,8 @@ def fill_config(config_input, log):
 
     config.empty_stats = {stat: -1 for stat in config.stats_to_compute}
     for stat in config.squad_buff_abbrev.values():
-        config.empty_stats[stat] = {'gen': -1, 'uptime': -1}
+        if stat in config.stats_to_compute:
+            config.empty_stats[stat] = {'gen': -1, 'uptime': -1}
     config.empty_stats['duration_present'] = {stat: 0 for stat in config.stats_to_compute}
     config.empty_stats['num_fights_present'] = {stat: 0 for stat in config.stats_to_compute}
     config.empty_stats['normalization_time_allies'] = {stat: 0 for stat in config.stats_to_compute}
@@ -207,3 +356,94 @@ def fill_config(config_input, log):
         config.log_level = "info"
     
     return config
+
+
+
+# config fields that are filled or used while reading the logs. The stats of all fights depend on them.
+parsed_config_fields = ['duration_for_averages', 'squad_buff_ids', 'self_buff_ids', 'buffs_stacking_duration', 'buffs_stacking_intensity', 'buffs_not_stacking']
+
+# config fields with a value for each stat
+per_stat_config_fields = ['stat_names', 'stat_descriptions', 'relevant_classes', 'num_players_listed', 'num_players_considered_top', 'duration_for_averages', 'sort_xls_by']
+
+
+
+# fills a Config for reading the logs once for several configs. All stats of all configs are computed,
+# and fights are only skipped if they would be skipped for all configs.
+# Input:
+# config_inputs = list of config modules from parser_configs
+# configs = list of Configs filled from config_inputs
+# log = log file to write to
+# Output:
+# Config to use for reading the logs
+def fill_extraction_config(config_inputs, configs, log):
+    if len(configs) == 1:
+        return configs[0]
+
+    stats_to_compute = list()
+    for config in configs:
+        for stat in config.stats_to_compute:
+            if stat not in stats_to_compute:
+                stats_to_compute.append(stat)
+    # the stats of each config were already checked against its own stat names. Stats the first config doesn't know are set up like in the first config computing them.
+    extraction_config = fill_config(config_inputs[0], log, [stat for stat in stats_to_compute if stat in config_inputs[0].stat_names])
+    for field_name in per_stat_config_fields:
+        setattr(extraction_config, field_name, dict(getattr(extraction_config, field_name)))
+    for stat in stats_to_compute:
+        if stat in extraction_config.stats_to_compute:
+            continue
+        config = next(config for config in configs if stat in config.stats_to_compute)
+        extraction_config.stats_to_compute.append(stat)
+        for field_name in per_stat_config_fields:
+            if stat in getattr(config, field_name):
+                getattr(extraction_config, field_name)[stat] = getattr(config, field_name)[stat]
+        extraction_config.empty_stats[stat] = config.empty_stats[stat]
+        for key in ['duration_present', 'num_fights_present', 'normalization_time_allies']:
+            extraction_config.empty_stats[key][stat] = 0
+
+    extraction_config.skip_duplicate_logs = any(config.skip_duplicate_logs for config in configs)
+    extraction_config.low_memory = any(config.low_memory for config in configs)
+    extraction_config.read_ahead_megabytes = max(config.read_ahead_megabytes for config in configs)
+    # the players read from the logs have rank histograms long enough for all configs
+    extraction_config.max_num_players_considered_top = max(config.max_num_players_considered_top for config in configs)
+    extraction_config.min_allied_players = min(config.min_allied_players for config in configs)
+    extraction_config.min_fight_duration = min(config.min_fight_duration for config in configs)
+    extraction_config.min_enemy_players = min(config.min_enemy_players for config in configs)
+    extraction_config.position_analyses = list()
+    for config in configs:
+        for analysis in config.position_analyses:
+            if analysis not in extraction_config.position_analyses:
+                extraction_config.position_analyses.append(analysis)
+    extraction_config.boon_coverage_buffs = list()
+    for config in configs:
+        for buff in config.boon_coverage_buffs:
+            if buff not in extraction_config.boon_coverage_buffs:
+                extraction_config.boon_coverage_buffs.append(buff)
+    extraction_config.target_damage = any(config.target_damage for config in configs)
+    extraction_config.time_windows = dict()
+    for config in configs:
+        for name, bounds in config.time_windows.items():
+            if name in extraction_config.time_windows and extraction_config.time_windows[name] != bounds:
+                print("time window "+name+" differs between the configs. Using "+str(extraction_config.time_windows[name])+" for all of them.")
+            extraction_config.time_windows.setdefault(name, bounds)
+    extraction_config.skill_breakdown = any(config.skill_breakdown for config in configs)
+    # the fight stream is shared by all configs
+    extraction_config.anonymize = any(config.anonymize for config in configs)
+    extraction_config.stat_quantiles = list()
+    for config in configs:
+        for percentile in config.stat_quantiles:
+            if percentile not in extraction_config.stat_quantiles:
+                extraction_config.stat_quantiles.append(percentile)
+    extraction_config.group_by = list()
+    for config in configs:
+        for key in config.group_by:
+            if key not in extraction_config.group_by:
+                extraction_config.group_by.append(key)
+    # sketches can only be shared between configs with the same accuracy, so the most accurate one is used while reading the logs
+    extraction_config.quantile_sketch_accuracy = min((config.quantile_sketch_accuracy for config in configs if config.stat_quantiles), default = extraction_config.quantile_sketch_accuracy)
+
+    # the stats of each fight are normalized while reading the logs, so all configs use the durations of the first one
+    for config in configs[1:]:
+        for stat in config.stats_to_compute:
+            if config.duration_for_averages[stat] != extraction_config.duration_for_averages[stat]:
+                print("duration_for_averages of "+stat+" differs between the configs. Using "+extraction_config.duration_for_averages[stat]+" for all of them.")
+    return extraction_config
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+#    stats_store.py keeps the stats per fight of all players in a memory mapped temporary file instead of in memory.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import tempfile
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+# types of the stored values, so they are read back as they were written
+FLOAT = 0
+INT = 1
+BOOL = 2
+
+
+
+# get the column of each value in the stats of a player in one fight
+# Input:
+# config = the config used for top stats computation
+# Output:
+# layout = dictionary of key -> column index, or key -> dictionary of key -> column index for nested values like 'duration_present' or squad buffs
+# number of columns
+def get_stats_layout(config):
+    layout = {}
+    num_columns = 0
+    for key, value in list(config.empty_stats.items()) + [('group', 0)]:
+        if isinstance(value, dict):
+            layout[key] = {sub_key: num_columns + i for i, sub_key in enumerate(value)}
+            num_columns += len(value)
+        else:
+            layout[key] = num_columns
+            num_columns += 1
+    return layout, num_columns
+
+
+
+# This class stores the stats per fight of all players in rows of a memory mapped temporary file.
+# Only the pages that are currently read or written are kept in memory by the operating system.
+class StatsStore:
+    # Input:
+    # config = the config used for top stats computation
+    # capacity = number of rows to allocate at first; the file grows when more are needed
+    def __init__(self, config, capacity = 1024):
+        self.layout, self.num_columns = get_stats_layout(config)
+        self.values_file = tempfile.TemporaryFile()
+        self.types_file = tempfile.TemporaryFile()
+        self.num_rows = 0
+        self.capacity = 0
+        self.resize(capacity)
+
+
+    # grow the files to hold capacity rows
+    def resize(self, capacity):
+        self.values_file.truncate(capacity * self.num_columns * 8)
+        self.types_file.truncate(capacity * self.num_columns)
+        # plain array views of the memory maps are faster to index
+        self.values = np.memmap(self.values_file, dtype = np.float64, mode = 'r+', shape = (capacity, self.num_columns)).view(np.ndarray)
+        self.types = np.memmap(self.types_file, dtype = np.int8, mode = 'r+', shape = (capacity, self.num_columns)).view(np.ndarray)
+        self.capacity = capacity
+
+
+    # write the stats of a player in one fight to a new row
+    # Input:
+    # stats = dictionary with the same keys as config.empty_stats and 'group'
+    # Output:
+    # index of the row
+    def append(self, stats):
+        if self.num_rows == self.capacity:
+            self.resize(2 * self.capacity)
+        values = np.zeros(self.num_columns)
+        types = np.zeros(self.num_columns, dtype = np.int8)
+        self.encode(stats, self.layout, values, types)
+        row = self.num_rows
+        self.values[row] = values
+        self.types[row] = types
+        self.num_rows += 1
+        return row
+
+
+    # put the values of stats into the columns given by layout
+    def encode(self, stats, layout, values, types):
+        for key, column in layout.items():
+            if isinstance(column, dict):
+                self.encode(stats[key], column, values, types)
+                continue
+            value = stats[key]
+            if isinstance(value, bool):
+                types[column] = BOOL
+            elif isinstance(value, int):
+                types[column] = INT
+            elif isinstance(value, float):
+                types[column] = FLOAT
+            else:
+                raise TypeError("Can't store "+key+" = "+str(value)+" in the stats store")
+            values[column] = value
+
+
+    # convert a stored value back to the type it was written with
+    def decode_value(self, value, value_type):
+        if value_type == INT:
+            return int(value)
+        if value_type == BOOL:
+            return bool(value)
+        return value
+
+
+    # put the values of a row into a dictionary in the format given by layout
+    def decode(self, values, types, layout):
+        stats = {}
+        for key, column in layout.items():
+            if isinstance(column, dict):
+                stats[key] = self.decode(values, types, column)
+            else:
+                stats[key] = self.decode_value(values[column], types[column])
+        return stats
+
+
+    # read one value
+    # Input:
+    # row = index of the row
+    # column = index of the column
+    def get(self, row, column):
+        return self.decode_value(self.values[row, column].item(), self.types[row, column])
+
+
+    # read all values of a row
+    # Input:
+    # row = index of the row
+    # layout = layout of the values to read, default all
+    # Output:
+    # dictionary in the same format as given to append
+    def read(self, row, layout = None):
+        if layout is None:
+            layout = self.layout
+        return self.decode(self.values[row].tolist(), self.types[row].tolist(), layout)
+
+
+    # read all values of several rows at once
+    # Input:
+    # rows = list of row indices
+    # Output:
+    # list of dictionaries in the same format as given to append, one per row
+    def read_rows(self, rows):
+        values = self.values[rows].tolist()
+        types = self.types[rows].tolist()
+        return [self.decode(row_values, row_types, self.layout) for row_values, row_types in zip(values, types)]
+
+
+    # read one column of several rows at once
+    # Input:
+    # rows = list of row indices
+    # column = index of the column
+    # Output:
+    # list of values, one per row
+    def read_column(self, rows, column):
+        values = self.values[rows, column].tolist()
+        types = self.types[rows, column].tolist()
+        return [self.decode_value(value, value_type) for value, value_type in zip(values, types)]
+
+
+
+# Read only view of the stats of a player in one fight stored in a StatsStore. Can be used like the dictionary it was created from.
+class StoredStats(Mapping):
+    __slots__ = ('store', 'row', 'layout')
+
+    def __init__(self, store, row, layout):
+        self.store = store
+        self.row = row
+        self.layout = layout
+
+    def __getitem__(self, key):
+        column = self.layout[key]
+        if isinstance(column, dict):
+            return StoredStats(self.store, self.row, column)
+        return self.store.get(self.row, column)
+
+    def __iter__(self):
+        return iter(self.layout)
+
+    def __len__(self):
+        return len(self.layout)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    # read all values into a dictionary
+    def to_dict(self):
+        return self.store.read(self.row, self.layout)
+
+    # copies and pickles are plain dictionaries
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+
+
+# Dictionary of fight number -> stats of a player in this fight, with the stats kept in a StatsStore.
+# Can be used as Player.stats_per_fight. The stats of a fight are written to the store when they are assigned and can't be changed afterwards.
+class StoredStatsPerFight(MutableMapping):
+    # Input:
+    # store = the StatsStore to write to
+    def __init__(self, store):
+        self.store = store
+        self.rows = {}          # fight number -> row in store
+
+    def __getitem__(self, fight_number):
+        return StoredStats(self.store, self.rows[fight_number], self.store.layout)
+
+    def __setitem__(self, fight_number, stats):
+        if isinstance(stats, StoredStats) and stats.store is self.store and stats.layout is self.store.layout:
+            self.rows[fight_number] = stats.row
+        else:
+            self.rows[fight_number] = self.store.append(stats)
+
+    def __delitem__(self, fight_number):
+        # the row stays in the store, it is just not used anymore
+        del self.rows[fight_number]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, fight_number):
+        return fight_number in self.rows
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    # read the stats of all fights into a dictionary of fight number -> dictionary of stats, with one read of the store
+    def to_dict(self):
+        return dict(zip(self.rows, self.store.read_rows(list(self.rows.values()))))
+
+    # read one value of the stats of all fights, with one read of the store
+    # Input:
+    # key = key of a value that isn't nested, e.g. 'group'
+    # Output:
+    # dictionary of fight number -> value
+    def get_values(self, key):
+        return dict(zip(self.rows, self.store.read_column(list(self.rows.values()), self.store.layout[key])))
+
+    # copies and pickles are plain dictionaries
+    def __reduce__(self):
+        return (dict, (self.to_dict(),))
+
+
+
+# get stats that may be kept in a stats store as plain dictionaries. Stats in a stats store are read at once instead of value by value.
+# Input:
+# stats = stats per fight (dictionary or StoredStatsPerFight) or stats in one fight (dictionary or StoredStats)
+# Output:
+# stats as dictionary
+def read_stats(stats):
+    return stats.to_dict() if hasattr(stats, 'to_dict') else stats
+
+
+
+# get one value of the stats of a player in all fights
+# Input:
+# stats_per_fight = stats per fight of a player (dictionary or StoredStatsPerFight)
+# key = key of a value that isn't nested, e.g. 'group'
+# Output:
+# dictionary of fight number -> value
+def get_values_per_fight(stats_per_fight, key):
+    if isinstance(stats_per_fight, StoredStatsPerFight):
+        return stats_per_fight.get_values(key)
+    return {fight_number: player_stats[key] for fight_number, player_stats in stats_per_fight.items()}
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+#    target_damage.py computes how much damage each squad member did to each enemy target, and when the squad focused single targets.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+
+
+# get the cumulative damage of all squad members on all targets in one array
+# Input:
+# players_json = the 'players' list of a log
+# num_targets = number of entries in the 'targets' list of the log
+# Output:
+# indices of the squad members in players_json
+# numpy array of shape (number of squad members, number of targets, number of seconds + 1) with the damage done until each second,
+# as in 'targetDamage1S' of the first phase
+def get_squad_target_damage(players_json, num_targets):
+    squad_indices = list()
+    target_damage = list()
+    for i, player_json in enumerate(players_json):
+        if player_json['notInSquad'] or len(player_json.get('targetDamage1S', [])) != num_targets:
+            continue
+        squad_indices.append(i)
+        target_damage.append([target_phases[0] for target_phases in player_json['targetDamage1S']])
+    lengths = set(len(damage) for player_damage in target_damage for damage in player_damage)
+    num_samples = min(lengths, default = 0)
+    # all arrays of a log should have the same length, but don't rely on it
+    if len(lengths) > 1:
+        target_damage = [[damage[:num_samples] for damage in player_damage] for player_damage in target_damage]
+    damage = np.array(target_damage, dtype = np.int64).reshape(len(target_damage), num_targets, num_samples)
+    return squad_indices, damage
+
+
+
+# get the damage of the whole squad in each window of a fixed length
+# Input:
+# damage_per_second = numpy array of shape (number of targets, number of seconds)
+# window = length of the windows in s
+# Output:
+# numpy array of shape (number of targets, number of windows) with the damage in the windows starting at each second
+def get_window_damage(damage_per_second, window):
+    window = max(min(window, damage_per_second.shape[1]), 1)
+    cumulative_damage = np.concatenate((np.zeros((damage_per_second.shape[0], 1), dtype = np.int64), np.cumsum(damage_per_second, axis = 1)), axis = 1)
+    return cumulative_damage[:, window:] - cumulative_damage[:, :-window]
+
+
+
+# find the windows in which the squad focused one target, i.e. the target took at least the given share of all damage done by the squad.
+# Consecutive windows focusing the same target are merged.
+# Input:
+# damage_per_second = numpy array of shape (number of targets, number of seconds)
+# window = length of the windows in s
+# min_share = percentage of the squad damage one target has to take
+# Output:
+# list of dictionaries with 'target' = index of the target, 'start' and 'end' = time in s, 'damage' = damage on the target, 'share' = percentage of all squad damage
+def get_focus_fire_windows(damage_per_second, window, min_share):
+    if damage_per_second.size == 0:
+        return []
+    window_damage = get_window_damage(damage_per_second, window)
+    window = damage_per_second.shape[1] - window_damage.shape[1] + 1
+    total_damage = window_damage.sum(axis = 0)
+    focused_target = window_damage.argmax(axis = 0)
+    focused = window_damage.max(axis = 0) * 100 >= min_share * np.maximum(total_damage, 1)
+    focused &= total_damage > 0
+    # each run of window starts with the same focused target becomes one focus fire window
+    focused_target = np.where(focused, focused_target, -1)
+    run_starts = np.flatnonzero(np.diff(focused_target, prepend = -1) != 0)
+    run_ends = np.append(run_starts[1:], len(focused_target))
+
+    cumulative_damage = np.concatenate((np.zeros((damage_per_second.shape[0], 1), dtype = np.int64), np.cumsum(damage_per_second, axis = 1)), axis = 1)
+    cumulative_total = cumulative_damage.sum(axis = 0)
+    focus_fire_windows = list()
+    for start, run_end in zip(run_starts.tolist(), run_ends.tolist()):
+        target = int(focused_target[start])
+        if target < 0:
+            continue
+        end = run_end - 1 + window
+        damage = int(cumulative_damage[target, end] - cumulative_damage[target, start])
+        focus_fire_windows.append({'target': target, 'start': start, 'end': end, 'damage': damage,
+                                   'share': round(100 * damage / int(cumulative_total[end] - cumulative_total[start]), 2)})
+    return focus_fire_windows
+
+
+
+# get the highest damage each target took from the squad in one window
+# Input:
+# damage_per_second = numpy array of shape (number of targets, number of seconds)
+# window = length of the windows in s
+# Output:
+# list with one dictionary per target with 'damage' = highest damage in one window, 'start' = start of this window in s
+def get_bursts(damage_per_second, window):
+    if damage_per_second.size == 0:
+        return [{'damage': 0, 'start': 0} for _ in range(damage_per_second.shape[0])]
+    window_damage = get_window_damage(damage_per_second, window)
+    starts = window_damage.argmax(axis = 1)
+    return [{'damage': int(window_damage[target, start]), 'start': int(start)} for target, start in enumerate(starts.tolist())]
+
+
+
+# compute the damage of each squad member on each target, the damage per second on each target and the focus fire windows in one fight
+# Input:
+# fight_json = json object including one fight
+# fight = the Fight. fight.target_damage is set.
+# config = the config used for top stats computation
+# Output:
+# dictionary of index in players_json -> list of the damage of this player on each target
+def compute_fight_target_damage(fight_json, fight, config):
+    targets_json = fight_json['targets']
+    squad_indices, damage = get_squad_target_damage(fight_json['players'], len(targets_json))
+    # all reductions are done on the stacked array of all squad members
+    damage_matrix = damage[:, :, -1] if damage.shape[2] > 0 else np.zeros(damage.shape[:2], dtype = np.int64)
+    damage_per_second = np.diff(damage.sum(axis = 0), axis = 1)
+    fight.target_damage = {'targets': [target.get('name', "") for target in targets_json],
+                           'total': damage_matrix.sum(axis = 0).tolist(),
+                           'damage_per_second': damage_per_second.tolist(),
+                           'focus_fire_windows': get_focus_fire_windows(damage_per_second, config.focus_fire_window, config.focus_fire_share),
+                           'bursts': get_bursts(damage_per_second, config.focus_fire_window)}
+    return dict(zip(squad_indices, damage_matrix.tolist()))
+
+
+
+# get the damage matrix of each fight, with one row for each squad member and one column for each target
+# Input:
+# fights = list of Fights
+# players = list of Players, in the order in which they are written to the output
+# Output:
+# list with one entry per fight that wasn't skipped: dictionary with
+#   'fight' = fight number, 'targets' = target names, 'players' = indices in players, 'damage' = damage of each of these players on each target
+def get_damage_matrices(fights, players):
+    damage_matrices = list()
+    for fight_number, fight in enumerate(fights):
+        if fight.skipped or not fight.target_damage:
+            continue
+        player_indices = [i for i, player in enumerate(players) if fight_number in player.target_damage_per_fight]
+        damage_matrices.append({'fight': fight_number, 'targets': fight.target_damage['targets'], 'players': player_indices,
+                                'damage': [players[i].target_damage_per_fight[fight_number] for i in player_indices]})
+    return damage_matrices
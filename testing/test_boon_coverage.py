@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import numpy as np
+from boon_coverage import *
+
+class TestBoonCoverage(unittest.TestCase):
+    def test_get_squad_buff_timeline(self):
+        players_json = [{'notInSquad': False, 'buffUptimes': [{'id': 1122, 'states': [[0, 0], [500, 2], [2000, 0]]}]},
+                        {'notInSquad': False, 'buffUptimes': [{'id': 717, 'states': [[0, 1]]}, {'id': 1122, 'states': [[1000, 1], [3500, 0]]}]},
+                        # not in squad, not counted
+                        {'notInSquad': True, 'buffUptimes': [{'id': 1122, 'states': [[0, 5]]}]},
+                        # never had the buff
+                        {'notInSquad': False, 'buffUptimes': []}]
+        members_with_buff, stacks, squad_size = get_squad_buff_timeline(players_json, '1122', 4)
+        self.assertEqual(squad_size, 3)
+        self.assertEqual(members_with_buff.tolist(), [0.5, 2, 1, 0.5])
+        self.assertEqual(stacks.tolist(), [1, 3, 1, 0.5])
+
+        coverage = get_buff_coverage(members_with_buff, stacks, squad_size, 50)
+        self.assertEqual(coverage['coverage'], [16.7, 66.7, 33.3, 16.7])
+        self.assertEqual(coverage['time_below_threshold'], 3)
+        self.assertEqual(coverage['longest_below_threshold'], 2)
+        self.assertEqual(coverage['percentage_below_threshold'], 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
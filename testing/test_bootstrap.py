@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import warnings
+import numpy as np
+from stat_classes import Config, Fight, Player
+from bootstrap import *
+
+class TestBootstrap(unittest.TestCase):
+    def test_get_ranks(self):
+        values = np.array([[5., 7., 1.], [3., 3., 9.]])
+        missing = np.array([[False, False, False], [False, False, True]])
+        np.testing.assert_array_equal(get_ranks(values, True, missing), [[1, 0, 2], [0, 1, 2]])
+        np.testing.assert_array_equal(get_ranks(values, False, missing), [[1, 2, 0], [0, 1, 2]])
+
+    def test_get_intervals_without_values(self):
+        values = np.array([[1., np.nan, np.nan], [3., np.nan, 2.], [5., np.nan, 4.]])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            intervals = get_intervals(values, 100)
+        np.testing.assert_array_equal(intervals, [[1., np.nan, 2.], [5., np.nan, 4.]])
+
+    def test_compute_bootstrap(self):
+        config = Config()
+        config.stats_to_compute = ['dmg']
+        config.num_players_listed = {'dmg': 2}
+        config.bootstrap_draws = 200
+        fights = [Fight(duration = 10, allies = 5), Fight(duration = 20, allies = 5), Fight(skipped = True)]
+        players = [Player("Acc.1", "Char 1", "Firebrand"), Player("Acc.2", "Char 2", "Scourge")]
+        # player 0 always does 100 damage per second, player 1 between 10 and 20
+        players[0].stats_per_fight = {0: {'present_in_fight': True, 'duration_present': {'dmg': 10}, 'dmg': 1000},
+                                      1: {'present_in_fight': True, 'duration_present': {'dmg': 20}, 'dmg': 2000},
+                                      2: {'present_in_fight': True, 'duration_present': {'dmg': 10}, 'dmg': 100000}}
+        players[1].stats_per_fight = {0: {'present_in_fight': True, 'duration_present': {'dmg': 10}, 'dmg': 100},
+                                      1: {'present_in_fight': True, 'duration_present': {'dmg': 20}, 'dmg': 400}}
+        compute_bootstrap(players, fights, config)
+
+        self.assertEqual(players[0].bootstrap['dmg']['average_ci'], [100., 100.])
+        self.assertEqual(players[0].bootstrap['dmg']['average_rank_probabilities'], [100., 0.])
+        self.assertEqual(players[1].bootstrap['dmg']['total_rank_ci'], [2, 2])
+        lower, upper = players[1].bootstrap['dmg']['average_ci']
+        self.assertTrue(10 <= lower <= upper <= 20)
+        # the skipped fight is never drawn
+        self.assertLessEqual(players[0].bootstrap['dmg']['total_ci'][1], 4000)
+
+    def test_get_contributions_of_squad_buffs(self):
+        config = Config()
+        config.squad_buff_abbrev = {'Stability': 'stab'}
+        rows = [{'duration_present': {'stab': 10}, 'stab': {'gen': 2., 'uptime': 50.}},
+                {'duration_present': {'stab': 20}, 'stab': {'gen': -1, 'uptime': -1}},
+                {'duration_present': {'stab': 0}, 'stab': {'gen': -1, 'uptime': -1}}]
+        contribution, normalization = get_contributions(rows, np.full(3, 5.), 'stab', config)
+        # fights without generation data count for the normalization of the average, like in compute_avg_values
+        np.testing.assert_array_equal(contribution, [2., 0., 0.])
+        np.testing.assert_array_equal(normalization, [10., 20., 0.])
+
+
+if __name__ == '__main__':
+    unittest.main()
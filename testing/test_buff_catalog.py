@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import os
+import unittest
+import tempfile
+from unittest import mock
+from buff_catalog import *
+from stat_classes import Config
+
+class TestBuffCatalog(unittest.TestCase):
+    def test_save_and_load_buff_catalog(self):
+        config = Config()
+        config.buff_catalog_file = "buff_catalog.json"
+        config.squad_buff_abbrev = {'Stability': 'stab', 'Might': 'might'}
+        config.squad_buff_ids = {'stab': '1122', 'might': '740'}
+        config.buffs_stacking_intensity = {'stab', 'might'}
+
+        with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as log:
+            with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': directory, 'LOCALAPPDATA': directory}):
+                # relative paths are in the user cache directory, not next to the scripts
+                self.assertEqual(get_buff_catalog_path(config), os.path.join(directory, cache_directory_name, "buff_catalog.json"))
+                catalog = load_buff_catalog(config, log)
+                self.assertEqual(catalog, {})
+                self.assertTrue(update_buff_catalog(catalog, config))
+                save_buff_catalog(catalog, config, log)
+
+                new_config = Config()
+                new_config.buff_catalog_file = "buff_catalog.json"
+                new_config.squad_buff_abbrev = config.squad_buff_abbrev
+                apply_buff_catalog(load_buff_catalog(new_config, log), new_config)
+                self.assertEqual(new_config.squad_buff_ids, config.squad_buff_ids)
+                self.assertEqual(new_config.buffs_stacking_intensity, {'stab', 'might'})
+
+            # absolute paths are used as they are
+            config.buff_catalog_file = os.path.join(directory, "catalog.json")
+            self.assertEqual(get_buff_catalog_path(config), config.buff_catalog_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
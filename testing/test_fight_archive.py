@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import tempfile
+from fight_archive import *
+
+class TestFightArchive(unittest.TestCase):
+    def test_write_and_load_fight_archive(self):
+        fight_json = {"fightName": "Detailed WvW - Eternal Battlegrounds",
+                      "timeStartStd": "2023-04-01 20:00:00 +02:00",
+                      "timeEndStd": "2023-04-01 20:02:10 +02:00",
+                      "duration": "02m 10s 123ms",
+                      "skillMap": {"s1": {"name": "Skill 1"}},
+                      "mechanics": [{"name": "not kept"}],
+                      "targets": [{"name": "Enemy 1", "enemyPlayer": True, "defenses": [{"deadCount": 2, "downCount": 3}], "damage1S": [[0, 1]]}],
+                      "players": [{"name": "Char "+str(i), "hasCommanderTag": i == 0, "account": "Acc."+str(i), "profession": "Firebrand", "notInSquad": False, "group": 1,
+                                   "damage1S": [list(range(0, 1000*i, 100))],
+                                   "combatReplayData": {"positions": [[1.5*j, 2.25] for j in range(20)], "dead": [[1000, 2000]], "down": []},
+                                   "dpsAll": [{"damage": 12, "dps": 0.5}],
+                                   "rotation": [{"id": 1}]} for i in range(3)]}
+
+        with tempfile.TemporaryDirectory() as directory:
+            archive_path = path.join(directory, "fight.npz")
+            write_fight_archive(fight_json, archive_path, 1234)
+
+            header = read_fight_archive_header(archive_path)
+            self.assertEqual(header['file_size'], 1234)
+            self.assertEqual(header['accounts'], ["Acc.0", "Acc.1", "Acc.2"])
+            # the header only contains what is needed for skipping the fight, the archived json all other target entries
+            self.assertEqual(header['targets'], [{"name": "Enemy 1", "enemyPlayer": True, "defenses": [{"deadCount": 2}]}])
+
+            archived_json = load_fight_archive(archive_path)
+            self.assertNotIn('mechanics', archived_json)
+            self.assertEqual(archived_json['skillMap'], fight_json['skillMap'])
+            self.assertEqual(archived_json['targets'], [{"name": "Enemy 1", "enemyPlayer": True, "defenses": [{"deadCount": 2, "downCount": 3}]}])
+            for player, archived_player in zip(fight_json['players'], archived_json['players']):
+                self.assertNotIn('rotation', archived_player)
+                for key in ['damage1S', 'combatReplayData', 'dpsAll', 'group']:
+                    self.assertEqual(archived_player[key], player[key])
+            # ints stay ints and floats stay floats
+            self.assertIs(type(archived_json['players'][2]['damage1S'][0][1]), int)
+            self.assertIs(type(archived_json['players'][0]['combatReplayData']['positions'][0][0]), float)
+
+            archived_json = load_fight_archive(archive_path, ['account', 'dpsAll'])
+            self.assertEqual(archived_json['players'][1], {"account": "Acc.1", "dpsAll": [{"damage": 12, "dps": 0.5}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import io
+import json
+import unittest
+from stat_classes import Config, Fight, Player
+from fight_stream import *
+
+class TestFightStream(unittest.TestCase):
+    def test_write_fight_to_stream(self):
+        config = Config()
+        config.stats_to_compute = ['dmg_total']
+        fights = [Fight(duration = 10, allies = 2, heatmaps = {'map': [1, 2]}), Fight(skipped = True)]
+        players = [Player("Acc.1", "Char 1", "Firebrand"), Player("Acc.2", "Char 2", "Scourge")]
+        players[0].stats_per_fight = {0: {'group': 1, 'dmg_total': 300}}
+        players[1].stats_per_fight = {0: {'group': 2, 'dmg_total': 500}}
+
+        fight_stream = io.StringIO()
+        write_fight_to_stream(fight_stream, 0, fights[0], players, {'dmg_total': [(1, 500, 1), (0, 300, 2)]}, config)
+        write_fight_to_stream(fight_stream, 1, fights[1], players, {}, config, anonymize = True)
+        write_aggregates_to_stream(fight_stream, "config", {'num_used_fights': 1}, {}, players, {'top_total_players': {'dmg_total': [1, 0]}})
+        # the players of a config are anonymized with the names from the list of all players
+        anonymous_names = {("Acc.2", "Char 2", "Scourge"): ("Account 1", "Anon 1")}
+        write_aggregates_to_stream(fight_stream, "config", {'num_used_fights': 1}, {}, players[1:], {}, anonymous_names)
+        entries = [json.loads(line) for line in fight_stream.getvalue().splitlines()]
+
+        self.assertEqual([entry['type'] for entry in entries], ['fight', 'fight', 'aggregates', 'aggregates'])
+        self.assertNotIn('heatmaps', entries[0]['fight'])
+        self.assertEqual(entries[0]['players'][1], {'account': "Acc.2", 'name': "Char 2", 'profession': "Scourge", 'group': 2, 'stats': {'dmg_total': 500}})
+        self.assertEqual(entries[0]['top_players']['dmg_total'][0], {'account': "Acc.2", 'name': "Char 2", 'profession': "Scourge", 'value': 500, 'rank': 1})
+        # nobody was present in the skipped fight
+        self.assertTrue(entries[1]['fight']['skipped'])
+        self.assertEqual(entries[1]['players'], [])
+        self.assertEqual(get_stream_player(players, 1, True), {'account': "Account 1", 'name': "Anon 1", 'profession': "Scourge"})
+        self.assertEqual(entries[2]['top_total_players'], {'dmg_total': [1, 0]})
+        self.assertEqual((entries[3]['players'][0]['account'], entries[3]['players'][0]['name']), ("Account 1", "Anon 1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+from stat_classes import Config, Fight, Player
+from group_stats import *
+from stats_store import StatsStore, StoredStatsPerFight
+
+class TestGroupStats(unittest.TestCase):
+    def test_get_group_stats(self):
+        config = Config()
+        config.stats_to_compute = ['dmg', 'spike_dmg']
+        config.group_by = ['account', 'group', 'guild']
+        fights = [Fight(duration = 10, allies = 5), Fight(duration = 20, allies = 5), Fight(skipped = True)]
+        players = [Player("Acc.1", "Char 1", "Firebrand", guild = "A"), Player("Acc.1", "Char 2", "Scourge", guild = "B"), Player("Acc.2", "Char 3", "Scourge", guild = "B")]
+        players[0].stats_per_fight = {0: {'present_in_fight': True, 'group': 1, 'duration_present': {'dmg': 10, 'spike_dmg': 10}, 'dmg': 1000, 'spike_dmg': 300},
+                                      2: {'present_in_fight': True, 'group': 1, 'duration_present': {'dmg': 10, 'spike_dmg': 10}, 'dmg': 100000, 'spike_dmg': 100000}}
+        players[1].stats_per_fight = {1: {'present_in_fight': True, 'group': 2, 'duration_present': {'dmg': 20, 'spike_dmg': 20}, 'dmg': 5000, 'spike_dmg': 100}}
+        players[2].stats_per_fight = {0: {'present_in_fight': True, 'group': 2, 'duration_present': {'dmg': 10, 'spike_dmg': 10}, 'dmg': 200, 'spike_dmg': 50},
+                                      1: {'present_in_fight': True, 'group': 1, 'duration_present': {'dmg': 20, 'spike_dmg': 20}, 'dmg': 400, 'spike_dmg': 70}}
+        group_stats = get_group_stats(players, fights, config)
+
+        # characters of the same account are added up, the skipped fight is not
+        self.assertEqual(group_stats['account'][0], {'account': "Acc.1", 'num_players': 2, 'num_fights': 2,
+                                                     'total': {'dmg': 6000, 'spike_dmg': 300}, 'average': {'dmg': 200, 'spike_dmg': 200}})
+        self.assertEqual(group_stats['account'][1]['average'], {'dmg': 20, 'spike_dmg': 60})
+        # subgroups are taken from each fight
+        self.assertEqual([(group['group'], group['num_players'], group['total']['dmg']) for group in group_stats['group']], [("1", 2, 1400), ("2", 2, 5200)])
+        self.assertEqual([group['guild'] for group in group_stats['guild']], ["A", "B"])
+
+        # stats kept in a stats store give the same result
+        config.empty_stats = {'present_in_fight': False, 'dmg': -1, 'spike_dmg': -1, 'duration_present': {'dmg': 0, 'spike_dmg': 0}}
+        store = StatsStore(config)
+        for player in players:
+            stats_per_fight = StoredStatsPerFight(store)
+            stats_per_fight.update(player.stats_per_fight)
+            player.stats_per_fight = stats_per_fight
+        self.assertEqual(get_group_stats(players, fights, config), group_stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,11 @@ import sys
 from os import path
 sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
 
+import os
+import json
 import unittest
 import importlib
+import tempfile
 from io_helper import *
 from stat_classes import *
 
@@ -56,6 +59,25 @@ class TestIoHelper(unittest.TestCase):
         self.assertEqual(profession_length, 12)
 
 
+    def test_write_to_json_without_analyses(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        config = fill_config(parser_config, None, ['dmg_total'])
+        player = Player("Acc.1", "Char 1", "Firebrand")
+        player.initialize(config)
+        player.stats_per_fight = {0: {'dmg_total': 1000}}
+        fights = [Fight(duration = 60, allies = 1)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, "top_stats.json")
+            write_to_json({}, {}, fights, [player], {}, {}, {}, {}, config.stat_names, config.stat_descriptions, output_file, config = config)
+            with open(output_file) as json_file:
+                json_dict = json.load(json_file)
+        # analyses that are not configured don't add empty fields
+        self.assertFalse({'cohesion', 'cohesion_per_fight', 'window_stats', 'bootstrap', 'quantiles', 'guild', 'top_rank_histogram'} & set(json_dict['players'][0]))
+        self.assertFalse({'cohesion', 'boon_coverage'} & set(json_dict['fights'][0]))
+        self.assertEqual(json_dict['players'][0]['stats_per_fight'], {'0': {'dmg_total': 1000}})
+
+
     def test_get_total_fight_duration_in_hms(self):
         fight_duration = "11743"
         total_fight_duration = get_total_fight_duration_in_hms(fight_duration)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import importlib
+from json_helper import *
+from stat_classes import *
+
+class TestJsonHelper(unittest.TestCase):
+    def get_config(self, stats):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        return fill_config(parser_config, None, stats)
+
+
+    def test_get_extraction_plan_damage_only(self):
+        plan = get_extraction_plan(self.get_config(['dmg_total']))
+        self.assertEqual(plan.player_json_fields, {'account', 'name', 'profession', 'notInSquad', 'hasCommanderTag', 'group', 'dpsAll'})
+        self.assertEqual(plan.durations, {'total'})
+        self.assertEqual(plan.buffs, set())
+        self.assertFalse(plan.needs_tag_positions)
+
+
+    def test_get_extraction_plan_buffs(self):
+        plan = get_extraction_plan(self.get_config(['stab', 'explosive_temper']))
+        # squad buffs need the generation and the uptime, self buffs only whether they were present
+        self.assertEqual(plan.buffs, {'stab', 'explosive_temper'})
+        self.assertTrue({'squadBuffs', 'buffUptimes', 'selfBuffs'} <= plan.player_json_fields)
+        self.assertNotIn('dpsAll', plan.player_json_fields)
+
+
+    def test_get_extraction_plan_distance(self):
+        plan = get_extraction_plan(self.get_config(['dist']))
+        self.assertEqual(plan.durations, {'total', 'not_running_back'})
+        self.assertTrue({'combatReplayData', 'statsAll'} <= plan.player_json_fields)
+        self.assertTrue(plan.needs_tag_positions)
+
+
+if __name__ == '__main__':
+    unittest.main()
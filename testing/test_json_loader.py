@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import json
+import gzip
+import tempfile
+from json_loader import *
+
+class TestJsonLoader(unittest.TestCase):
+    def test_get_json_decoder(self):
+        name, decode = get_json_decoder('json')
+        self.assertEqual(name, 'json')
+        self.assertEqual(decode(b'{"a": [1, 2]}'), {'a': [1, 2]})
+        self.assertEqual(decode(memoryview(b'[1, 2]')), [1, 2])
+
+        # unknown backends fall back to the available ones
+        name, decode = get_json_decoder('unknown')
+        self.assertIn(name, json_decoders)
+        self.assertEqual(decode(b'{"a": 1}'), {'a': 1})
+
+
+    def test_get_fight_header(self):
+        fight_json = {"fightName": "Detailed WvW - Eternal Battlegrounds",
+                      "timeStartStd": "2023-04-01 20:00:00 +02:00",
+                      "timeEndStd": "2023-04-01 20:02:10 +02:00",
+                      "duration": "02m 10s 123ms",
+                      "targets": [{"name": "Enemy 1", "enemyPlayer": True, "defenses": [{"deadCount": 2}]},
+                                  {"name": "Enemy 2 äö", "enemyPlayer": True, "defenses": [{"deadCount": 0}]},
+                                  {"name": "Arrow Cart", "enemyPlayer": False}],
+                      "players": [{"name": "Char "+str(i), "hasCommanderTag": i == 0, "account": "Acc."+str(i)} for i in range(5)],
+                      "phases": [{"name": "Full Fight", "targets": [0, 1]}]}
+        header = get_fight_header(json.dumps(fight_json).encode('utf-8'), True)
+        self.assertEqual(header['duration'], "02m 10s 123ms")
+        self.assertEqual(header['time_start'], "2023-04-01 20:00:00 +02:00")
+        self.assertEqual(header['time_end'], "2023-04-01 20:02:10 +02:00")
+        self.assertEqual(header['allies'], 5)
+        self.assertEqual(header['targets'], fight_json['targets'])
+        self.assertEqual(header['accounts'], ["Acc."+str(i) for i in range(5)])
+        self.assertFalse(header['has_healing_extension'])
+        self.assertFalse(header['has_combat_replay'])
+
+        # the used extensions and the combat replay come at the end of the log
+        fight_json['combatReplayMetaData'] = {"inchToPixel": 0.02}
+        fight_json['usedExtensions'] = [{"name": "Healing Stats", "version": "2.1"}]
+        header = get_fight_header(json.dumps(fight_json).encode('utf-8'), True)
+        self.assertTrue(header['has_healing_extension'])
+        self.assertTrue(header['has_combat_replay'])
+
+
+    def test_get_fight_fingerprint(self):
+        fight_json = {"fightName": "Detailed WvW - Eternal Battlegrounds",
+                      "recordedBy": "Char 0",
+                      "timeStartStd": "2023-04-01 20:00:00 +02:00",
+                      "timeEndStd": "2023-04-01 20:02:10 +02:00",
+                      "duration": "02m 10s 123ms",
+                      "targets": [{"name": "Enemy 1", "enemyPlayer": True}],
+                      "players": [{"name": "Char "+str(i), "hasCommanderTag": False, "account": "Acc."+str(i)} for i in range(5)]}
+        fingerprint = get_fight_fingerprint(get_fight_header(json.dumps(fight_json).encode('utf-8'), True))
+
+        # the order of the players doesn't matter
+        fight_json['players'].reverse()
+        self.assertEqual(get_fight_fingerprint(get_fight_header(json.dumps(fight_json).encode('utf-8'), True)), fingerprint)
+
+        # a different recorder means a different log
+        fight_json['recordedBy'] = "Char 1"
+        self.assertNotEqual(get_fight_fingerprint(get_fight_header(json.dumps(fight_json).encode('utf-8'), True)), fingerprint)
+
+
+    def test_get_fight_header_without_targets(self):
+        fight_json = {"timeStartStd": "2023-04-01 20:00:00 +02:00",
+                      "timeEndStd": "2023-04-01 20:02:10 +02:00",
+                      "duration": "02m 10s 123ms",
+                      "players": [{"name": "Char "+str(i), "hasCommanderTag": i == 0, "account": "Acc."+str(i)} for i in range(5)],
+                      "phases": [{"name": "Full Fight", "targets": [0, 1]}]}
+        # without a targets list of objects, the whole file has to be decoded
+        self.assertIsNone(get_fight_header(json.dumps(fight_json).encode('utf-8')))
+
+
+    def test_read_log_files_ahead(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_files = list()
+            for i in range(5):
+                filename = "fight_"+str(i)+(".json.gz" if i == 2 else ".json")
+                file_path = path.join(directory, filename)
+                content = json.dumps({"fight": i}).encode('utf-8')
+                if i == 2:
+                    with gzip.open(file_path, 'wb') as f:
+                        f.write(content)
+                else:
+                    with open(file_path, 'wb') as f:
+                        f.write(content)
+                log_files.append((filename, file_path))
+            log_files.append(("fight_5.npz", path.join(directory, "fight_5.npz")))
+
+            # with a limit smaller than each file, only one file is read ahead at a time
+            for max_bytes in [0, 1, 1000]:
+                read_files = list(read_log_files_ahead(log_files, max_bytes))
+                self.assertEqual([(filename, file_path) for filename, file_path, _ in read_files], log_files)
+                for i, (_, file_path, data) in enumerate(read_files):
+                    if i == 5:
+                        # archives are never read ahead
+                        self.assertIsNone(data)
+                        continue
+                    if max_bytes == 0:
+                        self.assertIsNone(data)
+                    with open_log_file(file_path, data) as content:
+                        self.assertEqual(json.loads(bytes(content)), {"fight": i})
+
+
+if __name__ == '__main__':
+    unittest.main()
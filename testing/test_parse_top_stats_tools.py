@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import importlib
+import types
+from parse_top_stats_tools import *
+from stat_classes import *
+
+class TestParseTopStatsTools(unittest.TestCase):
+    def test_increase_top_x_reached(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        config = fill_config(parser_config, None, ['dmg_total'])
+        config.num_players_considered_top['dmg_total'] = 2
+        config.max_num_players_considered_top = 3
+
+        players = list()
+        for i in range(5):
+            player = Player("acc"+str(i), "name"+str(i), "Firebrand")
+            player.initialize(config)
+            players.append(player)
+
+        # players 1 and 2 share rank 2, player 3 has rank 4, player 4 didn't do any damage
+        sorted_list = [(0, 300), (1, 200), (2, 200), (3, 100), (4, 0)]
+        increase_top_x_reached(players, sorted_list, config, 'dmg_total', 0)
+        self.assertEqual([player.top_rank_histogram['dmg_total'] for player in players],
+                         [[1, 0, 0], [0, 1, 0], [0, 1, 0], [0, 0, 0], [0, 0, 0]])
+        self.assertEqual([player.consistency_stats['dmg_total'] for player in players], [1, 1, 1, 0, 0])
+        self.assertEqual([get_times_top(player, 'dmg_total', 1) for player in players], [1, 0, 0, 0, 0])
+
+
+    def test_get_profile_data(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        configs = [fill_config(parser_config, None, ['dmg_total']), fill_config(parser_config, None, ['deaths', 'dmg_total'])]
+        configs[0].min_allied_players = 2
+        configs[1].min_allied_players = 3
+        # the logs are read with everything needed by both configs
+        extraction_config = fill_extraction_config([parser_config, parser_config], configs, None)
+        self.assertEqual(extraction_config.stats_to_compute, ['dmg_total', 'deaths'])
+        self.assertEqual(extraction_config.min_allied_players, 2)
+
+        fights = [Fight(duration = 60, allies = 3, enemies = 20), Fight(duration = 60, allies = 2, enemies = 20)]
+        players = [Player("Acc.1", "Char 1", "Firebrand"), Player("Acc.2", "Char 2", "Scourge")]
+        players[0].stats_per_fight = {0: {'dmg_total': 1000, 'deaths': 0}, 1: {'dmg_total': 2000, 'deaths': 1}}
+        players[1].stats_per_fight = {1: {'dmg_total': 500, 'deaths': 0}}
+        with open(os.devnull, 'w') as log:
+            profile_players_0, profile_fights_0 = get_profile_data(players, fights, configs[0], log)
+            profile_players_1, profile_fights_1 = get_profile_data(players, fights, configs[1], log)
+
+        self.assertEqual([fight.skipped for fight in profile_fights_0], [False, False])
+        self.assertEqual([len(player.stats_per_fight) for player in profile_players_0], [2, 1])
+        # the second config skips the fight with two allies, and the player only present in it
+        self.assertEqual([fight.skipped for fight in profile_fights_1], [False, True])
+        self.assertEqual([player.account for player in profile_players_1], ["Acc.1"])
+        self.assertEqual(list(profile_players_1[0].stats_per_fight), [0])
+        self.assertEqual(profile_fights_1[1].allies, 2)
+        # the stats read from the logs are shared, not changed
+        self.assertFalse(fights[1].skipped)
+        self.assertIs(profile_players_1[0].stats_per_fight[0], players[0].stats_per_fight[0])
+
+
+    def test_fill_extraction_config(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        # a config that doesn't know one of the stats of the other one
+        short_parser_config = types.SimpleNamespace(**vars(parser_config))
+        short_parser_config.stat_names = {stat: name for stat, name in parser_config.stat_names.items() if stat != 'deaths'}
+        configs = [fill_config(short_parser_config, None, ['dmg_total']), fill_config(parser_config, None, ['deaths'])]
+        configs[0].skip_duplicate_logs = False
+        configs[1].low_memory = True
+        configs[0].read_ahead_megabytes = 500
+        configs[1].max_num_players_considered_top = 12
+        configs[1].duration_for_averages = dict(configs[1].duration_for_averages, deaths = 'active')
+
+        extraction_config = fill_extraction_config([short_parser_config, parser_config], configs, None)
+        self.assertEqual(extraction_config.stats_to_compute, ['dmg_total', 'deaths'])
+        self.assertEqual(extraction_config.duration_for_averages['deaths'], 'active')
+        self.assertEqual(extraction_config.empty_stats['deaths'], -1)
+        self.assertTrue(extraction_config.skip_duplicate_logs)
+        self.assertTrue(extraction_config.low_memory)
+        self.assertEqual(extraction_config.read_ahead_megabytes, 500)
+        self.assertEqual(extraction_config.max_num_players_considered_top, 12)
+        # the config modules are not changed
+        self.assertNotIn('deaths', short_parser_config.stat_names)
+
+
+    def test_anonymize_players(self):
+        players = [Player("Acc.1", "Char 1", "Firebrand"), Player("Acc.1", "Char 2", "Scourge"), Player("Acc.2", "Char 3", "Scourge")]
+        anonymous_names = get_anonymous_names(players)
+        # a config only keeping some of the players uses the same names
+        profile_players = [Player("Acc.1", "Char 2", "Scourge"), Player("Acc.2", "Char 3", "Scourge")]
+        anonymize_players(profile_players, anonymous_names)
+        self.assertEqual([(player.account, player.name) for player in profile_players], [("Account 1", "Anon 1"), ("Account 2", "Anon 2")])
+
+
+    def test_check_duplicate_log(self):
+        header = {'time_start': "2023-04-01 20:00:00 +02:00", 'time_end': "2023-04-01 20:02:10 +02:00", 'fight_name': "Detailed WvW - Eternal Battlegrounds",
+                  'recorded_by': "Char 0", 'accounts': ["Acc.0", "Acc.1"], 'has_healing_extension': False, 'has_combat_replay': True}
+        fight_files = {}
+        with open(os.devnull, 'w') as log:
+            self.assertEqual(check_duplicate_log(header, 1000, "a.json", 0, fight_files, log), (False, None))
+            # the same fight in a larger log without combat replay, with the players in a different order
+            self.assertEqual(check_duplicate_log(dict(header, accounts = ["Acc.1", "Acc.0"], has_combat_replay = False), 2000, "b.json", 1, fight_files, log), (True, None))
+            self.assertEqual(check_duplicate_log(dict(header, recorded_by = "Char 1"), 1000, "c.json", 1, fight_files, log), (False, None))
+            # a log with healing addon data replaces the first one, even if it is read later
+            self.assertEqual(check_duplicate_log(dict(header, has_healing_extension = True), 900, "d.json", 2, fight_files, log), (False, 0))
+            self.assertEqual(check_duplicate_log(header, 5000, "e.json", 2, fight_files, log), (True, None))
+        self.assertEqual(sorted((filename, fight_number) for _, filename, fight_number in fight_files.values()), [("c.json", 1), ("d.json", 0)])
+
+
+    def test_remove_fight_stats(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        config = fill_config(parser_config, None, ['dmg_total'])
+        config.stat_quantiles = [50]
+        player = Player("Acc.1", "Char 1", "Firebrand")
+        player.initialize(config)
+        for fight_number, damage in [(0, 1000), (1, 3000)]:
+            player.stats_per_fight[fight_number] = {'dmg_total': damage, 'duration_present': {'dmg_total': 10}}
+            player.cohesion_per_fight[fight_number] = {'distance': 100}
+            add_fight_to_sketches(player.quantile_sketches, player.stats_per_fight[fight_number], config)
+
+        remove_fight_stats([player], 0, config)
+        self.assertEqual(list(player.stats_per_fight), [1])
+        self.assertEqual(list(player.cohesion_per_fight), [1])
+        self.assertEqual(player.quantile_sketches['dmg_total'].count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
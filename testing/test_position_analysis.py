@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import numpy as np
+from position_analysis import *
+
+class TestPositionAnalysis(unittest.TestCase):
+    def test_get_squad_cohesion(self):
+        players_json = [{'notInSquad': False, 'combatReplayData': {'positions': [[0, 0], [0, 0], [0, 0], [0, 0]], 'dead': [], 'start': 0}},
+                        {'notInSquad': False, 'combatReplayData': {'positions': [[2, 0], [2, 0], [2, 0], [10, 0]], 'dead': [], 'start': 0}},
+                        # not in squad, not used for the squad center
+                        {'notInSquad': True, 'combatReplayData': {'positions': [[100, 100]] * 4, 'dead': [], 'start': 0}},
+                        # dead in the second half of the fight
+                        {'notInSquad': False, 'combatReplayData': {'positions': [[1, 3], [1, 3], [1, 3], [1, 3]], 'dead': [[300, 600]], 'start': 0}}]
+        squad_indices, squad_positions = get_squad_positions(players_json, 150)
+        self.assertEqual(squad_indices, [0, 1, 3])
+        self.assertTrue(np.isnan(squad_positions[2, 2:]).all())
+
+        # squad center is (1, 1) in the first two samples and (1, 0) or (5, 0) afterwards, distances are scaled by 1 / inch_to_pixel = 2
+        fight_cohesion, player_cohesion = get_squad_cohesion(squad_positions, 150, 0.5, 5)
+        distances = [[2 * np.sqrt(2)] * 2 + [2, 10], [2 * np.sqrt(2)] * 2 + [2, 10], [4, 4]]
+        for cohesion, player_distances in zip(player_cohesion, distances):
+            self.assertAlmostEqual(cohesion['dist_to_center'], round(np.mean(player_distances), 2))
+            self.assertAlmostEqual(cohesion['time_with_positions'], len(player_distances) * 0.15)
+        self.assertEqual([cohesion['time_outside_blob'] for cohesion in player_cohesion], [0.15, 0.15, 0])
+        self.assertAlmostEqual(fight_cohesion['percentage_in_blob'], round(100 * 8 / 10, 2))
+        self.assertAlmostEqual(fight_cohesion['spread'], round(np.mean([(4 * np.sqrt(2) + 4) / 3] * 2 + [2, 10]), 2))
+
+
+    def test_heatmaps(self):
+        heatmap = get_heatmap(np.array([[150., 50.], [180., 20.], [320., -10.]]), 100)
+        self.assertEqual(heatmap['origin'].tolist(), [1, -1])
+        self.assertEqual(heatmap['counts'].tolist(), [[0, 2], [0, 0], [1, 0]])
+
+        other_heatmap = get_heatmap(np.array([[-50., 50.]]), 100)
+        total_heatmap = add_heatmaps(heatmap, other_heatmap)
+        self.assertEqual(total_heatmap['origin'].tolist(), [-1, -1])
+        self.assertEqual(total_heatmap['counts'].tolist(), [[0, 1], [0, 0], [0, 2], [0, 0], [1, 0]])
+        self.assertIs(add_heatmaps(heatmap, get_heatmap([], 100)), heatmap)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import numpy as np
+from quantile_sketch import *
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantiles(self):
+        values = np.random.default_rng(0).lognormal(5, 2, 1000)
+        sketch = QuantileSketch(0.01)
+        for value in values:
+            sketch.add(value)
+        for quantile in [0.1, 0.5, 0.9]:
+            expected = np.percentile(values, quantile * 100, method = 'lower')
+            self.assertLessEqual(abs(sketch.get_quantile(quantile) - expected), 0.01 * expected + 1e-9)
+        self.assertIsNone(QuantileSketch().get_quantile(0.5))
+
+    def test_merge(self):
+        sketches = [QuantileSketch(), QuantileSketch(), QuantileSketch()]
+        for i, value in enumerate([0, 5, 10, 20, 0, 40, 80, 160]):
+            sketches[i % 2].add(value)
+            sketches[2].add(value)
+        sketches[0].merge(sketches[1])
+        self.assertEqual(sketches[0].count, 8)
+        self.assertEqual(sketches[0].zero_count, 2)
+        self.assertEqual(sketches[0].buckets, sketches[2].buckets)
+        self.assertEqual(sketches[0].get_quantile(0.1), 0.)
+        with self.assertRaises(ValueError):
+            sketches[0].merge(QuantileSketch(0.05))
+
+    def test_constant_size(self):
+        sketch = QuantileSketch(0.01)
+        for exponent in range(-50, 250):
+            sketch.add(10. ** (exponent / 10))
+        self.assertLessEqual(len(sketch.buckets), max_num_buckets)
+        self.assertEqual(sketch.count, 300)
+        # high quantiles are still accurate
+        self.assertAlmostEqual(sketch.get_quantile(1.) / 10 ** 24.9, 1, delta = 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
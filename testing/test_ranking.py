@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+from ranking import *
+from stat_classes import *
+
+class TestRanking(unittest.TestCase):
+    def get_players(self, stat, totals, consistencies):
+        players = list()
+        for i in range(len(totals)):
+            player = Player("acc"+str(i), "name"+str(i), "Firebrand")
+            player.total_stats = {stat: totals[i]}
+            player.average_stats = {stat: totals[i] / 10.}
+            player.consistency_stats = {stat: consistencies[i]}
+            player.portion_top_stats = {stat: consistencies[i] / 4.}
+            player.attendance_percentage = {stat: 100}
+            player.num_fights_present = {stat: 4}
+            player.duration_present = {stat: 10}
+            players.append(player)
+        return players
+
+
+    def test_get_sorted(self):
+        totals = [300, 500, 300, 100, 500]
+        consistencies = [2, 1, 3, 0, 1]
+        players = self.get_players('dmg_total', totals, consistencies)
+        ranking = StatRanking(players, 'dmg_total', False)
+        # high values are good, ties are broken by the next key and then by the higher index
+        self.assertEqual(ranking.get_sorted(StatType.TOTAL), [(4, 500), (1, 500), (2, 300), (0, 300), (3, 100)])
+        self.assertEqual([i for i, _ in ranking.get_sorted(StatType.CONSISTENT)], [2, 0, 4, 1, 3])
+
+        # low values are good for deaths
+        players = self.get_players('deaths', totals, consistencies)
+        ranking = StatRanking(players, 'deaths', False)
+        self.assertEqual([i for i, _ in ranking.get_sorted(StatType.AVERAGE)], [3, 0, 2, 1, 4])
+
+
+    def test_get_xls_order(self):
+        players = self.get_players('dmg_total', [300, 500, 300, 100, 500], [2, 1, 3, 0, 1])
+        ranking = StatRanking(players, 'dmg_total', False)
+        order = ranking.get_xls_order([3, 0, 1, 2], ['total', 'times_top'], [False, True])
+        self.assertEqual(list(order), [2, 1, 3, 0])
+        self.assertIsNone(ranking.get_xls_order([3, 0], ['name'], [True]))
+
+
+if __name__ == '__main__':
+    unittest.main()
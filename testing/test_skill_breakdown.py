@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+from stat_classes import Fight, Player
+from skill_breakdown import *
+
+class TestSkillBreakdown(unittest.TestCase):
+    def test_skill_index(self):
+        fight_json = {'skillMap': {'s1': {'name': "Skill 1"}, 's2': {'name': "Skill 2"}}, 'buffMap': {'b3': {'name': "Burning"}},
+                      'players': [{'notInSquad': False, 'totalDamageDist': [[{'id': 1, 'totalDamage': 100, 'hits': 2, 'crit': 1, 'indirectDamage': False},
+                                                                             {'id': 3, 'totalDamage': 300, 'hits': 6, 'crit': 0, 'indirectDamage': True}]]},
+                                  {'notInSquad': True, 'totalDamageDist': [[{'id': 2, 'totalDamage': 1000, 'hits': 1, 'crit': 1, 'indirectDamage': False}]]},
+                                  {'notInSquad': False, 'totalDamageDist': [[{'id': 2, 'totalDamage': 50, 'hits': 1, 'crit': 1, 'indirectDamage': False}]]}]}
+        fights = [Fight(), Fight(), Fight(skipped = True)]
+        skill_damage_per_player = compute_fight_skill_damage(fight_json, fights[0])
+        self.assertEqual(skill_damage_per_player, {0: {'s1': [100, 2, 1], 'b3': [300, 6, 0]}, 2: {'s2': [50, 1, 1]}})
+        self.assertEqual(fights[0].skill_names, {'s1': "Skill 1", 's2': "Skill 2", 'b3': "Burning"})
+
+        # two characters of the same account and profession are added up, skipped fights are not
+        players = [Player("Acc.1", "Char 1", "Firebrand"), Player("Acc.1", "Char 2", "Firebrand"), Player("Acc.2", "Char 3", "Scourge")]
+        players[0].skill_damage_per_fight = {0: skill_damage_per_player[0], 2: {'s2': [10000, 1, 1]}}
+        players[1].skill_damage_per_fight = {1: {'s1': [250, 5, 5]}}
+        players[2].skill_damage_per_fight = {0: skill_damage_per_player[2]}
+        skill_index = SkillIndex(players, fights)
+        self.assertEqual(skill_index.get_top_skills("Acc.1", "Firebrand"), [{'skill': 's1', 'name': "Skill 1", 'damage': 350, 'hits': 7, 'crit': 6},
+                                                                            {'skill': 'b3', 'name': "Burning", 'damage': 300, 'hits': 6, 'crit': 0}])
+        self.assertEqual([skill['skill'] for skill in skill_index.get_top_skills("Acc.2", "Scourge", 1)], ['s2'])
+        self.assertEqual(skill_index.get_top_skills("Acc.2", "Firebrand"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import os
+import unittest
+import importlib
+import pickle
+import tempfile
+from snapshot import *
+from stat_classes import *
+
+class TestSnapshot(unittest.TestCase):
+    def test_snapshot_round_trip(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        config = fill_config(parser_config, None, ['dmg_total', 'deaths'])
+        config.num_players_considered_top['dmg_total'] = 1
+        config.max_num_players_considered_top = 3
+        config.duration_for_averages['dmg_total'] = 'active'
+
+        players = list()
+        for i in range(2):
+            player = Player("Acc."+str(i), "Char "+str(i), "Firebrand")
+            player.initialize(config)
+            player.stats_per_fight = {0: {'dmg_total': 1000 * (i+1)}}
+            player.total_stats['dmg_total'] = 1000 * (i+1)
+            players.append(player)
+        players[0].top_rank_histogram['dmg_total'] = [1, 0, 2]
+        players[1].top_rank_histogram['dmg_total'] = [2, 1, 0]
+        fights = [Fight(duration = 60, allies = 2), Fight(skipped = True)]
+
+        with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as log:
+            snapshot_filename = os.path.join(directory, "top_stats.pickle")
+            write_snapshot(players, fights, True, False, config, snapshot_filename)
+            snapshot = read_snapshot(snapshot_filename, log)
+            self.assertEqual(get_snapshot_stats(snapshot, ['deaths', 'heal_total'], log), ['deaths'])
+
+            # the stats are recomputed with the settings of the current config, but the fields used while parsing come from the snapshot
+            new_config = fill_config(parser_config, None, get_snapshot_stats(snapshot, None, log))
+            new_config.num_players_considered_top['dmg_total'] = 2
+            restored_players, restored_fights, found_healing, found_barrier = restore_snapshot(snapshot, new_config, log)
+            self.assertEqual(new_config.stats_to_compute, ['dmg_total', 'deaths'])
+            self.assertEqual(new_config.max_num_players_considered_top, 3)
+            self.assertEqual(new_config.duration_for_averages['dmg_total'], 'active')
+            self.assertEqual([player.account for player in restored_players], ["Acc.0", "Acc.1"])
+            self.assertEqual(restored_players[1].stats_per_fight, {0: {'dmg_total': 2000}})
+            self.assertEqual([player.consistency_stats['dmg_total'] for player in restored_players], [1, 3])
+            self.assertEqual([fight.skipped for fight in restored_fights], [False, True])
+            self.assertEqual((found_healing, found_barrier), (True, False))
+
+            # snapshots of other versions are not used
+            snapshot['version'] = snapshot_version - 1
+            with open(snapshot_filename, 'wb') as snapshot_file:
+                pickle.dump(snapshot, snapshot_file)
+            self.assertIsNone(read_snapshot(snapshot_filename, log))
+            self.assertIsNone(read_snapshot(os.path.join(directory, "missing.pickle"), log))
+
+
+if __name__ == '__main__':
+    unittest.main()
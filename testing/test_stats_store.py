@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import importlib
+import pickle
+from stats_store import *
+from stat_classes import *
+
+class TestStatsStore(unittest.TestCase):
+    def test_stored_stats_per_fight(self):
+        parser_config = importlib.import_module("parser_configs.parser_config_detailed" , package=None)
+        config = fill_config(parser_config, None, ['dmg_total', 'deaths', 'stab'])
+        store = StatsStore(config, capacity = 1)
+
+        stats_per_fight = StoredStatsPerFight(store)
+        for fight_number in range(3):
+            stats = {key: value for key, value in config.empty_stats.items()}
+            stats['duration_present'] = {'dmg_total': 60, 'deaths': 60, 'stab': 59.5}
+            stats['dmg_total'] = 1000 * fight_number
+            stats['deaths'] = 0.5
+            stats['stab'] = {'gen': 1.25, 'uptime': 80}
+            stats['group'] = 2
+            stats['present_in_fight'] = True
+            stats_per_fight[fight_number] = stats
+
+        self.assertEqual(len(stats_per_fight), 3)
+        self.assertEqual(store.num_rows, 3)
+        self.assertNotIn(3, stats_per_fight)
+        self.assertEqual([stats['dmg_total'] for stats in stats_per_fight.values()], [0, 1000, 2000])
+        self.assertIs(type(stats_per_fight[1]['dmg_total']), int)
+        self.assertIs(type(stats_per_fight[1]['deaths']), float)
+        self.assertIs(stats_per_fight[1]['present_in_fight'], True)
+        self.assertEqual(stats_per_fight[2]['stab'], {'gen': 1.25, 'uptime': 80})
+        self.assertEqual(stats_per_fight[2]['duration_present']['stab'], 59.5)
+
+        # all fights are read at once
+        self.assertEqual(read_stats(stats_per_fight), {fight_number: stats_per_fight[fight_number].to_dict() for fight_number in range(3)})
+        self.assertEqual(get_values_per_fight(stats_per_fight, 'dmg_total'), {0: 0, 1: 1000, 2: 2000})
+        self.assertIs(type(get_values_per_fight(stats_per_fight, 'group')[0]), int)
+
+        # stored stats can't be changed
+        with self.assertRaises(TypeError):
+            stats_per_fight[0]['dmg_total'] = 5
+
+        # pickles are plain dictionaries
+        unpickled = pickle.loads(pickle.dumps(stats_per_fight))
+        self.assertIs(type(unpickled), dict)
+        self.assertEqual(unpickled[2], stats_per_fight[2].to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
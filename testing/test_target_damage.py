@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import numpy as np
+from stat_classes import Config, Fight, Player
+from target_damage import *
+
+class TestTargetDamage(unittest.TestCase):
+    def test_compute_fight_target_damage(self):
+        fight_json = {'targets': [{'name': "a"}, {'name': "b"}],
+                      'players': [{'notInSquad': False, 'targetDamage1S': [[[0, 10, 20, 30, 40]], [[0, 0, 0, 0, 50]]]},
+                                  # not in squad, not counted
+                                  {'notInSquad': True, 'targetDamage1S': [[[0, 99, 99, 99, 99]], [[0, 0, 0, 0, 0]]]},
+                                  {'notInSquad': False, 'targetDamage1S': [[[0, 5, 10, 10, 10]], [[0, 0, 0, 20, 40]]]}]}
+        config = Config()
+        config.focus_fire_window = 2
+        config.focus_fire_share = 60
+        fight = Fight()
+        damage_per_player = compute_fight_target_damage(fight_json, fight, config)
+        self.assertEqual(damage_per_player, {0: [40, 50], 2: [10, 40]})
+        self.assertEqual(fight.target_damage['total'], [50, 90])
+        self.assertEqual(fight.target_damage['damage_per_second'], [[15, 15, 10, 10], [0, 0, 20, 70]])
+        # target a takes all damage in the first two seconds, target b 90 of 110 in the last two
+        self.assertEqual(fight.target_damage['focus_fire_windows'], [{'target': 0, 'start': 0, 'end': 2, 'damage': 30, 'share': 100.0},
+                                                                     {'target': 1, 'start': 2, 'end': 4, 'damage': 90, 'share': 81.82}])
+        self.assertEqual(fight.target_damage['bursts'], [{'damage': 30, 'start': 0}, {'damage': 90, 'start': 2}])
+
+        players = [Player("a", "a", "Guardian"), Player("b", "b", "Guardian")]
+        players[1].target_damage_per_fight[0] = damage_per_player[0]
+        self.assertEqual(get_damage_matrices([fight], players), [{'fight': 0, 'targets': ["a", "b"], 'players': [1], 'damage': [[40, 50]]}])
+
+
+    def test_empty_fight(self):
+        fight = Fight()
+        self.assertEqual(compute_fight_target_damage({'targets': [{'name': "a"}], 'players': []}, fight, Config()), {})
+        self.assertEqual(fight.target_damage['focus_fire_windows'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
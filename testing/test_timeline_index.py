@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+
+import sys
+from os import path
+sys.path.append( path.dirname( path.dirname( path.abspath(__file__) ) ) )
+
+import unittest
+import numpy as np
+from stat_classes import Config, Fight
+from timeline_index import *
+
+class TestTimelineIndex(unittest.TestCase):
+    def test_get_window_stats(self):
+        index = TimelineIndex({'dmg_total': np.array([0, 10, 30, 60]), 'heal_players': np.array([0, 5])})
+        self.assertEqual(index.get_window('dmg_total', 1, 3), 50)
+        # windows are clipped to the fight
+        self.assertEqual(index.get_window_stats(-5, 30), {'dmg_total': 60, 'heal_players': 5})
+        self.assertEqual(index.get_window_stats(2, 1), {'dmg_total': 0, 'heal_players': 0})
+
+
+    def test_get_player_window_stats(self):
+        players_json = [{'name': "a", 'hasCommanderTag': True, 'combatReplayData': {'down': [[1500, 2000]], 'dead': [[2000, 4000]]},
+                         'damage1S': [[0, 10, 30, 60, 100]], 'powerDamage1S': [[0, 10, 20, 30, 40]]},
+                        {'name': "b", 'hasCommanderTag': False, 'targetDamage1S': [[[0, 1, 2, 3, 4]], [[0, 10, 20, 30, 40]]]}]
+        config = Config()
+        config.time_windows = {'start': (0, 1), 'until_tag_death': (0, 'tag_death'), 'after_tag_death': ('tag_death', None)}
+        fight = Fight(duration = 4)
+        window_bounds = get_window_bounds(players_json, fight, config)
+        self.assertEqual(window_bounds, {'start': (0, 1), 'until_tag_death': (0, 2.0), 'after_tag_death': (2.0, 4)})
+
+        window_stats = get_player_window_stats(players_json[0], fight, window_bounds, ['dmg_total', 'condi_dmg_total', 'dmg_players'])
+        self.assertEqual(window_stats['until_tag_death'], {'dmg_total': 30, 'condi_dmg_total': 10})
+        self.assertEqual(window_stats['after_tag_death'], {'dmg_total': 70, 'condi_dmg_total': 50})
+        window_stats = get_player_window_stats(players_json[1], fight, window_bounds, ['dmg_total', 'dmg_players'])
+        self.assertEqual(window_stats['start'], {'dmg_players': 11})
+
+
+if __name__ == '__main__':
+    unittest.main()
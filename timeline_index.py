@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+#    timeline_index.py computes stats of players restricted to time windows of a fight from their cumulative per second values.
+#    Copyright (C) 2021 Freya Fleckenstein
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import numpy as np
+
+from json_helper import get_first_down_and_death_time, player_json_fields_for_timeline_stat
+
+# Bounds of time windows are given in s from the start of the fight, or as
+# 'tag_death': time when the commander died; if there is no unique commander or they didn't die, the end of the fight
+# None: end of the fight
+
+
+
+# sum up the cumulative per second values of one entry of the player json over all targets or allies, using the first phase
+# Input:
+# per_target_values = list with one entry per target or ally, as e.g. 'targetDamage1S'
+# Output:
+# numpy array with the sum for each second
+def get_summed_per_second(per_target_values):
+    if len(per_target_values) == 0:
+        return None
+    values = [phases[0] for phases in per_target_values]
+    num_samples = min(len(value) for value in values)
+    return np.array([value[:num_samples] for value in values], dtype = np.int64).sum(axis = 0)
+
+
+
+# get the cumulative per second values of a stat for one player, as found in the 1S entries of the json
+# Input:
+# player_json = json data of one player
+# stat = one of player_json_fields_for_timeline_stat
+# fight = the Fight, with the players running the healing addon
+# Output:
+# numpy array with the value up to each second, or None if it can't be found in the log
+def get_cumulative_values(player_json, stat, fight):
+    if stat == 'dmg_total' and player_json.get('damage1S'):
+        return np.asarray(player_json['damage1S'][0], dtype = np.int64)
+    if stat == 'power_dmg_total' and player_json.get('powerDamage1S'):
+        return np.asarray(player_json['powerDamage1S'][0], dtype = np.int64)
+    if stat == 'condi_dmg_total':
+        damage = get_cumulative_values(player_json, 'dmg_total', fight)
+        power_damage = get_cumulative_values(player_json, 'power_dmg_total', fight)
+        if damage is None or power_damage is None:
+            return None
+        num_samples = min(len(damage), len(power_damage))
+        return damage[:num_samples] - power_damage[:num_samples]
+    if stat == 'dmg_players':
+        return get_summed_per_second(player_json.get('targetDamage1S', []))
+    if stat == 'power_dmg_players':
+        return get_summed_per_second(player_json.get('targetPowerDamage1S', []))
+    if stat == 'condi_dmg_players':
+        return get_summed_per_second(player_json.get('targetConditionDamage1S', []))
+    # healing and barrier are only logged for players running the healing addon
+    if stat == 'heal_players' and player_json['name'] in fight.players_running_healing_addon:
+        return get_summed_per_second(player_json.get('extHealingStats', {}).get('alliedHealing1S', []))
+    if stat == 'barrier' and player_json['name'] in fight.players_running_healing_addon:
+        return get_summed_per_second(player_json.get('extBarrierStats', {}).get('alliedBarrier1S', []))
+    return None
+
+
+
+# This class keeps the cumulative per second values of several stats of one player in one array, so the value of a stat in any time window
+# is the difference of two entries.
+class TimelineIndex:
+    # Input:
+    # cumulative_values = dictionary of stat -> numpy array with the value up to each second, starting with 0 at second 0
+    def __init__(self, cumulative_values):
+        self.stats = list(cumulative_values.keys())
+        self.rows = {stat: row for row, stat in enumerate(self.stats)}
+        self.num_seconds = max((len(values) - 1 for values in cumulative_values.values()), default = 0)
+        self.cumulative = np.zeros((len(self.stats), self.num_seconds + 1), dtype = np.int64)
+        for row, values in enumerate(cumulative_values.values()):
+            self.cumulative[row, :len(values)] = values
+            # nothing happens after the last second of a shorter array
+            if len(values) > 0:
+                self.cumulative[row, len(values):] = values[-1]
+
+
+    # clip a time to the seconds in the index
+    def get_sample(self, time):
+        return min(max(int(time), 0), self.num_seconds)
+
+
+    # get the value of a stat in the time window [start, end)
+    # Input:
+    # stat = one of self.stats
+    # start, end = bounds of the window in s
+    def get_window(self, stat, start, end):
+        start, end = self.get_sample(start), self.get_sample(end)
+        if end <= start:
+            return 0
+        return int(self.cumulative[self.rows[stat], end] - self.cumulative[self.rows[stat], start])
+
+
+    # get the values of all stats in the time window [start, end)
+    # Output:
+    # dictionary of stat -> value
+    def get_window_stats(self, start, end):
+        start, end = self.get_sample(start), self.get_sample(end)
+        if end <= start:
+            return {stat: 0 for stat in self.stats}
+        return dict(zip(self.stats, (self.cumulative[:, end] - self.cumulative[:, start]).tolist()))
+
+
+
+# get the stats of the config that can be computed for time windows
+# Input:
+# config = the config used for top stats computation
+def get_timeline_stats(config):
+    return [stat for stat in config.stats_to_compute if stat in player_json_fields_for_timeline_stat]
+
+
+
+# get the time in s when the commander died
+# Input:
+# players_json = the 'players' list of a log
+# Output:
+# time of death, or None if there is no unique commander or they didn't die
+def get_tag_death_time(players_json):
+    commanders = [player_json for player_json in players_json if player_json['hasCommanderTag']]
+    if len(commanders) != 1 or 'combatReplayData' not in commanders[0]:
+        return None
+    _, death_time = get_first_down_and_death_time(commanders[0])
+    return death_time if death_time >= 0 else None
+
+
+
+# get the bounds of all configured time windows in one fight
+# Input:
+# players_json = the 'players' list of a log
+# fight = the Fight, with its duration
+# config = the config used for top stats computation
+# Output:
+# dictionary of window name -> (start, end) in s
+def get_window_bounds(players_json, fight, config):
+    tag_death_time = None
+    if any(bound == 'tag_death' for bounds in config.time_windows.values() for bound in bounds):
+        tag_death_time = get_tag_death_time(players_json)
+    named_bounds = {None: fight.duration, 'tag_death': tag_death_time if tag_death_time is not None else fight.duration}
+    return {name: tuple(named_bounds[bound] if bound in named_bounds else bound for bound in bounds) for name, bounds in config.time_windows.items()}
+
+
+
+# compute the stats of one player in all configured time windows of a fight
+# Input:
+# player_json = json data of one player
+# fight = the Fight
+# window_bounds = bounds of the windows as returned by get_window_bounds
+# stats = stats to compute, as returned by get_timeline_stats
+# Output:
+# dictionary of window name -> stat -> value; stats that can't be found in the log are left out
+def get_player_window_stats(player_json, fight, window_bounds, stats):
+    cumulative_values = dict()
+    for stat in stats:
+        values = get_cumulative_values(player_json, stat, fight)
+        if values is not None:
+            cumulative_values[stat] = values
+    index = TimelineIndex(cumulative_values)
+    return {name: index.get_window_stats(start, end) for name, (start, end) in window_bounds.items()}
+
+
+
+# add up the stats in each time window over all fights of each player
+# Input:
+# players = list of Players, player.window_stats is set
+def compute_player_window_stats(players):
+    for player in players:
+        player.window_stats = dict()
+        for fight_window_stats in player.window_stats_per_fight.values():
+            for name, stats in fight_window_stats.items():
+                window_stats = player.window_stats.setdefault(name, dict())
+                for stat, value in stats.items():
+                    window_stats[stat] = window_stats.get(stat, 0) + value